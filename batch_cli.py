@@ -0,0 +1,344 @@
+"""
+无交互批处理入口
+各脚本的交互流程（input() 确认、回车重新扫描、结束时 pause）不变，本模块为每个工具
+提供一次性执行的命令行模式，便于计划任务、脚本串联与计时：
+
+- 输入文件通过参数指定；未指定的输入在 --dir 目录中按各脚本的 FILE_RULES 自动检测一次
+  （不等待、不确认），仍缺失时直接退出
+- --date 指定统计日期（默认当天）；xt 的人工录入数据通过参数或 --values JSON 文件提供
+- 处理过程中的提示信息输出到 stderr，stdout 只输出一行 JSON 结果
+- 退出码见 EXIT_*（cyb 发现差异时返回 EXIT_DIFFERENCES）
+- --profile 输出分阶段耗时、内存与计数报告（见 instrumentation），报告路径记录在结果中
+
+用法示例：
+    python batch_cli.py xsb --dir D:\\导出 --date 2024-05-01
+    python batch_cli.py xt --payment-stats 收款统计_0501.xlsx --group-purchase 2024-05-01.xlsx --values 录入.json
+    python batch_cli.py cyb --product 产品统计表.xlsx --kitchen 厨房用表.xlsx
+    python batch_cli.py xszb_backfill --sales-total 产品销售总表.xlsx 产品统计表5-1.xlsx 产品统计表5-2.xlsx
+    python batch_cli.py xsb_multi --groupon 2024-05-01.xlsx --store jinan 济南\\商品排行报表.xlsx 济南\\产品统计表.xlsx
+                                  --store qingdao 青岛\\商品排行报表.xlsx 青岛\\产品统计表.xlsx
+    python batch_cli.py czb_multi --store jinan 济南\\产品统计表.xlsx --store qingdao 青岛\\产品统计表.xlsx
+"""
+import argparse
+import contextlib
+import datetime
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import instrumentation
+from file_detector import detect_files
+
+EXIT_OK = 0
+EXIT_FAILED = 1  # 处理过程中出错
+EXIT_USAGE = 2  # 参数错误或输入文件缺失（与 argparse 一致）
+EXIT_DIFFERENCES = 3  # cyb：两表数据存在差异
+
+
+class BatchError(Exception):
+    """参数或输入文件错误（退出码 EXIT_USAGE）"""
+
+
+def _caches(args):
+    """与交互模式相同的输入缓存与水位线（可通过参数关闭）"""
+    from groupon_watermark import WatermarkStore
+    from workbook_cache import WorkbookCache
+    workbook_cache = None if args.no_cache else WorkbookCache()
+    watermark_store = None if args.full else WatermarkStore()
+    return workbook_cache, watermark_store
+
+
+# region 各工具的执行函数：接收参数与 {输入角色: 路径}，返回 (结果, 输出文件列表, 退出码)
+def _run_xsb(args, files):
+    import xsb
+    workbook_cache, watermark_store = _caches(args)
+    app = xsb.ExcelProcessorApp(workbook_cache, watermark_store, target_date=args.date)
+    output = app.process_inputs(files["ranking"], files["product"], files["groupon"], parallel=args.parallel)
+    return app.summary, [output], EXIT_OK
+
+
+def _run_xsb_qd(args, files):
+    import xsb_qd
+    workbook_cache, watermark_store = _caches(args)
+    app = xsb_qd.ExcelProcessorApp(workbook_cache, watermark_store, target_date=args.date)
+    output = app.process_inputs(files["ranking"], files["product"], files["groupon"], parallel=args.parallel)
+    return app.summary, [output], EXIT_OK
+
+
+def _run_xsb_multi(args, files):
+    import xsb
+    from store_profiles import STORE_PROFILES
+    stores = {}
+    for key, ranking_file, product_file in args.stores:
+        if key not in STORE_PROFILES:
+            raise BatchError(f"未知的门店配置：{key}（可选：{', '.join(STORE_PROFILES)}）")
+        missing = [path for path in (ranking_file, product_file) if not os.path.isfile(path)]
+        if missing:
+            raise BatchError(f"文件不存在：{', '.join(missing)}")
+        stores[key] = (os.path.abspath(ranking_file), os.path.abspath(product_file))
+    workbook_cache, watermark_store = _caches(args)
+    processor = xsb.MultiStoreProcessor(workbook_cache, watermark_store, target_date=args.date)
+    outputs = processor.process(files["groupon"], stores, parallel=args.parallel)
+    return processor.summary, list(outputs.values()), EXIT_OK
+
+
+def _run_xt(args, files):
+    import xt
+    workbook_cache, watermark_store = _caches(args)
+    app = xt.ExcelProcessorApp(workbook_cache, watermark_store, target_date=args.date, strict=True)
+    result = app.process_files(files["payment_stats"], files["group_purchase"], _xt_inputs(args, xt.INPUT_FIELDS))
+    return result, [], EXIT_OK
+
+
+def _run_dianping(args, files):
+    dianping = importlib.import_module("点评")
+    workbook_cache, watermark_store = _caches(args)
+    from customer_index import CustomerIndex
+    app = dianping.ExcelProcessorApp(workbook_cache, watermark_store, target_date=args.date, strict=True,
+                                     customer_index=None if args.no_index else CustomerIndex(),
+                                     rolling_days=args.window)
+    return app.process_files(files["group_purchase"]), [], EXIT_OK
+
+
+def _run_cyb(args, files):
+    import cyb
+    workbook_cache, _ = _caches(args)
+    comparator = cyb.ExcelComparator(workbook_cache, strict=True)
+    differences = comparator.compare_data(files["product"], files["kitchen"])
+    outputs = [comparator.report_path] if comparator.report_path else []
+    result = {"difference_count": len(differences), "differences": differences}
+    return result, outputs, EXIT_DIFFERENCES if differences else EXIT_OK
+
+
+def _run_xszb(args, files):
+    import xszb
+    workbook_cache, _ = _caches(args)
+    updater = xszb.SalesDataUpdater(workbook_cache, target_date=args.date)
+    updater.run(files["product_stat"], files["sales_total"])
+    result = {"sales_column": updater.get_target_column(), "remark_column": updater.get_remark_column()}
+    return result, [files["sales_total"]], EXIT_OK
+
+
+def _run_xszb_backfill(args, files):
+    import xszb
+    missing = [path for path in args.stat_files if not os.path.isfile(path)]
+    if missing:
+        raise BatchError(f"文件不存在：{', '.join(missing)}")
+    workbook_cache, _ = _caches(args)
+    updater = xszb.SalesDataUpdater(workbook_cache, target_date=args.date)
+    filled = updater.backfill([os.path.abspath(path) for path in args.stat_files], files["sales_total"],
+                              parallel=args.parallel)
+    result = {"days": [
+        {"date": day.isoformat(), "file": path,
+         "sales_column": updater.get_target_column(day), "remark_column": updater.get_remark_column(day)}
+        for day, path in filled.items()
+    ]}
+    return result, [files["sales_total"]], EXIT_OK
+
+
+def _run_czb(args, files):
+    import czb
+    return {}, [czb.ExcelProcessorApp(target_date=args.date).process_file(files["product"])], EXIT_OK
+
+
+def _run_czb_multi(args, files):
+    import reset_engine
+    stores = {}
+    for key, product_file in args.stores:
+        if key not in reset_engine.RESET_LAYOUTS:
+            raise BatchError(f"未知的清零版式：{key}（可选：{', '.join(reset_engine.RESET_LAYOUTS)}）")
+        if not os.path.isfile(product_file):
+            raise BatchError(f"文件不存在：{product_file}")
+        stores[key] = os.path.abspath(product_file)
+    from job_queue import JobQueue
+    failures = []
+
+    def record_failure(job, result, error, elapsed):
+        """照常报告每个门店的结果，并记录失败的文件与异常"""
+        JobQueue.report(job, result, error, elapsed)
+        if error is not None:
+            failures.append((job.key, error))
+
+    outputs = reset_engine.reset_all(stores, target_date=args.date, max_workers=args.workers,
+                                     on_done=record_failure)
+    if failures:
+        details = "；".join(f"{path}：{type(error).__name__}: {str(error)}" for path, error in failures)
+        raise RuntimeError(f"清零失败：{details}")
+    return outputs, list(outputs.values()), EXIT_OK
+
+
+def _xt_inputs(args, fields):
+    """人工录入数据：--values 文件中的值，再由单独的参数覆盖；未提供的按0处理（与交互时直接回车一致）"""
+    values = dict.fromkeys((key for key, _ in fields), 0.0)
+    if args.values:
+        try:
+            with open(args.values, encoding="utf-8") as f:
+                loaded = json.load(f)
+        except (OSError, ValueError) as e:
+            raise BatchError(f"无法读取录入数据文件 {args.values}：{str(e)}")
+        unknown = set(loaded) - set(values)
+        if unknown:
+            raise BatchError(f"录入数据文件中有未知字段：{', '.join(sorted(unknown))}")
+        for key, value in loaded.items():
+            try:
+                values[key] = float(value or 0)
+            except (TypeError, ValueError):
+                raise BatchError(f"录入数据 {key} 不是数字：{value!r}")
+    for key, _ in fields:
+        if getattr(args, key) is not None:
+            values[key] = getattr(args, key)
+    return values
+
+
+# 工具名 → (说明, 提供 FILE_RULES 的模块（None表示输入须显式指定）, 输入角色, 执行函数)
+TOOLS = {
+    "xsb": ("济南产品统计（xsb.py）", "xsb", None, _run_xsb),
+    "xsb_qd": ("青岛产品统计（xsb_qd.py）", "xsb_qd", None, _run_xsb_qd),
+    "xsb_multi": ("多门店产品统计（团购表只扫描一次）", None, {"groupon": "团购表"}, _run_xsb_multi),
+    "xt": ("收款汇总（xt.py）", "xt", None, _run_xt),
+    "dianping": ("点评去重统计（点评.py）", "点评", None, _run_dianping),
+    "cyb": ("产品/厨房对比（cyb.py）", "cyb", None, _run_cyb),
+    "xszb": ("销售总表同步（xszb.py）", "xszb", None, _run_xszb),
+    "xszb_backfill": ("销售总表按月补录（xszb.py）", None, {"sales_total": "产品销售总表"}, _run_xszb_backfill),
+    "czb": ("产品统计表清零（czb.py）", None, {"product": "待清零的产品统计表"}, _run_czb),
+    "czb_multi": ("多门店产品统计表并行清零（reset_engine）", None, {}, _run_czb_multi),
+}
+# endregion
+
+
+def _input_roles(tool):
+    """工具的输入角色 → 显示名称"""
+    _, module_name, roles, _ = TOOLS[tool]
+    if module_name is None:
+        return roles
+    return {rule.key: rule.name for rule in importlib.import_module(module_name).FILE_RULES}
+
+
+def resolve_inputs(tool, args):
+    """
+    确定输入文件：显式参数优先，其余在 --dir 中自动检测
+    异常：
+        BatchError: 指定的文件不存在，或仍有输入缺失
+    """
+    roles = _input_roles(tool)
+    files = {}
+    for role in roles:
+        path = getattr(args, role)
+        if path:
+            if not os.path.isfile(path):
+                raise BatchError(f"文件不存在：{path}")
+            files[role] = os.path.abspath(path)
+
+    module_name = TOOLS[tool][1]
+    if len(files) < len(roles) and module_name is not None:
+        detected = detect_files(importlib.import_module(module_name).FILE_RULES, args.dir)
+        for role, found in detected.items():
+            if role not in files and found is not None:
+                files[role] = found.path
+
+    missing = [name for role, name in roles.items() if role not in files]
+    if missing:
+        raise BatchError(f"缺少输入文件：{', '.join(missing)}")
+    return files
+
+
+@contextlib.contextmanager
+def progress_to_stderr():
+    """处理期间把 stdout 重定向到 stderr（文件描述符级别，子进程的输出也一并重定向）"""
+    sys.stdout.flush()
+    saved_fd = os.dup(1)
+    os.dup2(2, 1)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            yield
+    finally:
+        sys.stderr.flush()
+        os.dup2(saved_fd, 1)
+        os.close(saved_fd)
+
+
+def _parse_date(text):
+    try:
+        return datetime.date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日期格式应为 YYYY-MM-DD：{text}")
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--dir", default=os.getcwd(), help="自动检测输入文件的目录（默认当前目录）")
+    common.add_argument("--date", type=_parse_date, default=None, help="统计日期 YYYY-MM-DD（默认当天）")
+    common.add_argument("--no-cache", action="store_true", help="不使用输入文件解析缓存")
+    common.add_argument("--full", action="store_true", help="不使用团购表增量水位线，全量统计")
+    common.add_argument("--indent", type=int, default=None, help="JSON 结果的缩进（默认单行）")
+    common.add_argument("--profile", nargs="?", const="", default=None, metavar="报告路径",
+                        help="输出性能分析报告（默认写入当前目录 profile_<工具>_<时间>.json）")
+
+    parser = argparse.ArgumentParser(description="无交互批处理：处理结果以 JSON 输出到 stdout")
+    subparsers = parser.add_subparsers(dest="tool", required=True, metavar="工具")
+    for tool, (description, _, _, _) in TOOLS.items():
+        sub = subparsers.add_parser(tool, parents=[common], help=description, description=description)
+        for role, name in _input_roles(tool).items():
+            sub.add_argument(f"--{role.replace('_', '-')}", dest=role, metavar="路径", help=name)
+        if tool in ("xsb", "xsb_qd", "xsb_multi", "xszb_backfill"):
+            sub.add_argument("--no-parallel", dest="parallel", action="store_false",
+                             help="顺序解析输入文件（默认多进程并行）")
+        if tool == "xszb_backfill":
+            sub.add_argument("stat_files", nargs="+", metavar="产品统计表",
+                             help="各天的产品统计表（日期取自文件名，其次取自表内；--date 用于补全年份）")
+        if tool == "xsb_multi":
+            sub.add_argument("--store", dest="stores", nargs=3, action="append", required=True,
+                             metavar=("门店配置", "商品排行报表", "产品统计表"),
+                             help="一个门店的输入（门店配置见 store_profiles，如 jinan、qingdao），可重复")
+        if tool == "czb_multi":
+            sub.add_argument("--store", dest="stores", nargs=2, action="append", required=True,
+                             metavar=("清零版式", "产品统计表"),
+                             help="一个门店的产品统计表（版式见 reset_engine，如 jinan、qingdao），可重复")
+            sub.add_argument("--workers", type=int, default=None, metavar="进程数", help="并行进程数（默认按CPU核数）")
+        if tool == "dianping":
+            sub.add_argument("--no-index", action="store_true", help="不使用多日去重索引，只统计当天")
+            sub.add_argument("--window", type=int, default=7, metavar="天数", help="近N天去重的天数（默认7）")
+        if tool == "xt":
+            import xt
+            sub.add_argument("--values", metavar="JSON文件",
+                             help=f"人工录入数据（键：{', '.join(key for key, _ in xt.INPUT_FIELDS)}）")
+            for key, label in xt.INPUT_FIELDS:
+                sub.add_argument(f"--{key.replace('_', '-')}", dest=key, type=float, metavar="金额", help=label)
+    return parser
+
+
+def main(argv=None):
+    """执行一次批处理，返回退出码"""
+    args = build_parser().parse_args(argv)
+    report = {"tool": args.tool, "date": (args.date or datetime.date.today()).isoformat()}
+    profiler = None
+    if args.profile is not None:
+        memory = os.environ.get(instrumentation.MEMORY_ENV_VAR, "1").strip() != "0"
+        profiler = instrumentation.enable(args.tool, memory=memory)
+    started = time.perf_counter()
+    exit_code = EXIT_OK
+    try:
+        with progress_to_stderr():
+            files = resolve_inputs(args.tool, args)
+            report["inputs"] = files
+            result, outputs, exit_code = TOOLS[args.tool][3](args, files)
+        report.update(status="ok", result=result, outputs=outputs)
+    except BatchError as e:
+        exit_code = EXIT_USAGE
+        report.update(status="error", error=str(e))
+    except Exception as e:
+        exit_code = EXIT_FAILED
+        report.update(status="error", error=f"{type(e).__name__}: {str(e)}")
+    report["elapsed"] = round(time.perf_counter() - started, 3)
+    if profiler is not None:
+        report["profile"] = profiler.write_report(args.profile or None)
+    print(json.dumps(report, ensure_ascii=False, indent=args.indent, default=str))
+    return exit_code
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # xsb 会启动进程池，打包为exe后子进程需要
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+列式汇总基准测试
+用内存中的多周团购/支付导出（workbook_cache 的缓存工作表，排除openpyxl解析耗时）
+对比原有的逐行循环与 columnar 列式汇总，并校验结果一致。
+用法：python benchmarks/bench_columnar.py [行数] [天数]
+"""
+import datetime
+import importlib
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import xsb
+import xt
+from date_parser import DateParser
+from workbook_cache import CachedSheet, CachedWorkbook
+
+dianping = importlib.import_module("点评")
+
+PRODUCT_NAMES = [
+    "鲜牛奶3包", "鲜牛奶", "收藏炒酸奶", "草莓炒酸奶", "开心果双皮奶", "原味双皮奶", "芒果双皮奶",
+    "香蕉牛奶", "半口奶酪", "冷萃酸奶罐罐", "奶皮子酸奶酪", "希腊冷萃酸奶", "芋泥酸奶碗", "杂项商品",
+]
+GROUPON_HEADER = ["核销时间", "b", "c", "d", "售卖平台", "商品名称", "验证门店", "h", "i", "j", "金额", "l", "手机尾号"]
+
+
+class MemoryCache:
+    """把固定的缓存工作簿交给 load_input（只用于基准测试）"""
+
+    def __init__(self, workbook):
+        self.workbook = workbook
+
+    def load(self, file_path, data_only=False):
+        return self.workbook
+
+    def get(self, file_path, data_only=False):
+        return self.workbook
+
+
+def make_groupon_rows(rows, days):
+    random.seed(11)
+    now = datetime.datetime.now()
+    data = [tuple(GROUPON_HEADER)]
+    for _ in range(rows):
+        moment = now - datetime.timedelta(seconds=random.randint(0, days * 86400))
+        data.append((
+            random.choice([moment.replace(microsecond=0), moment.strftime("%Y-%m-%d %H:%M:%S")]),
+            "b", "c", "d",
+            random.choice(["点评", "美团", "抖音"]),
+            random.choice(PRODUCT_NAMES),
+            random.choice(["济南万达店", "济南恒隆店", "青岛店"]),
+            "h", "i", "j", random.choice([9.9, 19.9, 29.9]), "l",
+            f"{random.randint(0, 2000):04d}",
+        ))
+    return data
+
+
+def make_payment_rows(rows):
+    random.seed(12)
+    types = ["现金", "微信", "支付宝", "饿了么", "余额", "抖音团购", "优惠券记账金额", "其他"]
+    return [(random.choice(types), "x", "y", round(random.uniform(1, 200), 2)) for _ in range(rows)]
+
+
+def legacy_groupon(app, ws):
+    """xsb.py 原逐行实现（不含水位线）"""
+    rows = ws.iter_rows(values_only=True)
+    headers = {value: idx for idx, value in enumerate(next(rows, ()))}
+    time_idx, name_idx, store_idx = (headers[col] for col in ['核销时间', '商品名称', '验证门店'])
+    width = max(time_idx, name_idx, store_idx) + 1
+    collect_sales = 0
+    groupon_sales = {}
+    today = datetime.datetime.now().date()
+    for row in rows:
+        if len(row) < width:
+            continue
+        date_val = row[time_idx]
+        if not isinstance(date_val, datetime.datetime):
+            try:
+                date_val = datetime.datetime.strptime(date_val, "%Y-%m-%d %H:%M:%S")
+            except (ValueError, TypeError):
+                continue
+        if date_val.date() != today:
+            continue
+        store = row[store_idx] or ""
+        if "济南" not in store:
+            continue
+        raw_name = row[name_idx] or ""
+        quantity = 1
+        if "鲜" in raw_name and "牛奶" in raw_name:
+            match = re.search(r'(\d+)(包|次|份)', raw_name)
+            if match:
+                quantity = int(match.group(1))
+            product_name = "鲜牛奶"
+        else:
+            if "炒酸奶" in raw_name:
+                if "收藏" in raw_name:
+                    collect_sales += 2
+                    continue
+                quantity = 10
+            product_name = app.normalize_product_name(raw_name)
+        if product_name:
+            groupon_sales[product_name] = groupon_sales.get(product_name, 0) + quantity
+    return groupon_sales, collect_sales
+
+
+def legacy_dianping(ws, target_date):
+    """点评.py 原逐行实现（不含水位线）"""
+    unique_phone_tails = set()
+    parse_date = DateParser().column()
+    for row in ws.iter_rows(values_only=True):
+        if not row or len(row) < 13:
+            continue
+        if parse_date(row[0]) != target_date:
+            continue
+        platform = str(row[4]).strip() if row[4] is not None else ""
+        if platform != "点评":
+            continue
+        phone_tail = str(row[12]).strip() if row[12] is not None else ""
+        if phone_tail:
+            unique_phone_tails.add(phone_tail)
+    return len(unique_phone_tails)
+
+
+def legacy_payment(ws):
+    """xt.py 原逐行实现"""
+    data = dict.fromkeys(xt.PAYMENT_TYPES.values(), 0.0)
+    for row in ws.iter_rows(values_only=True):
+        payment_type = str(row[0]).strip()
+        amount = row[3] if isinstance(row[3], (int, float)) else 0.0
+        if payment_type in xt.PAYMENT_TYPES:
+            data[xt.PAYMENT_TYPES[payment_type]] += amount
+    data["retail"] = data["cash"] + data["wechat"] + data["alipay"]
+    return data
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 28
+    print(f"行数：{rows}，覆盖天数：{days}")
+    print(f"{'场景':<16}{'逐行(s)':>10}{'列式(s)':>10}")
+
+    groupon_ws = CachedSheet("Sheet1", make_groupon_rows(rows, days))
+    payment_ws = CachedSheet("Sheet1", make_payment_rows(rows))
+    today = datetime.date.today()
+
+    cases = [
+        ("xsb 团购汇总",
+         lambda: legacy_groupon(xsb.ExcelProcessorApp(), groupon_ws),
+         lambda: xsb.ExcelProcessorApp().process_groupon_sales(groupon_ws)),
+        ("点评 去重计数",
+         lambda: legacy_dianping(groupon_ws, today),
+         lambda: dianping.ExcelProcessorApp(MemoryCache(CachedWorkbook([groupon_ws])))._process_dianping("", today)),
+        ("xt 支付统计",
+         lambda: legacy_payment(payment_ws),
+         lambda: xt.ExcelProcessorApp(MemoryCache(CachedWorkbook([payment_ws])))._process_payment_stats("")),
+    ]
+    for label, legacy, columnar in cases:
+        legacy_time, expected = timed(legacy)
+        columnar_time, result = timed(columnar)
+        if result != expected:
+            raise SystemExit(f"[错误] {label} 结果与逐行实现不一致")
+        print(f"{label:<14}{legacy_time:>10.3f}{columnar_time:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
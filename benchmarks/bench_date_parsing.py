@@ -0,0 +1,102 @@
+"""
+日期解析基准测试
+对比 xt.py / 点评.py 原有的「正则提取 + 多格式 strptime 试错」循环
+与 date_parser 的单次匹配解析（普通模式与按列模式），并校验结果一致。
+用法：python benchmarks/bench_date_parsing.py [行数]
+"""
+import datetime
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from date_parser import DateParser
+
+XT_FORMATS = [
+    '%Y-%m-%d %H_%M_%S', '%Y/%m/%d %H_%M_%S', '%Y-%m-%d %H:%M:%S',
+    '%Y/%m/%d %H:%M:%S', '%Y-%m-%d', '%Y/%m/%d', '%Y%m%d',
+]
+DIANPING_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y/%m/%d %H:%M:%S', '%Y-%m-%d', '%Y/%m/%d', '%Y%m%d']
+
+
+def legacy_xt(value):
+    """xt.py 原实现"""
+    raw_value = str(value).strip()
+    date_part = re.search(r'\d{4}[-/]\d{1,2}[-/]\d{1,2}', raw_value)
+    if date_part:
+        raw_value = date_part.group()
+    for fmt in XT_FORMATS:
+        try:
+            return datetime.datetime.strptime(raw_value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def legacy_dianping(value):
+    """点评.py 原实现"""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.date() if isinstance(value, datetime.datetime) else value
+    raw_date_str = str(value).strip()
+    for fmt in DIANPING_FORMATS:
+        try:
+            return datetime.datetime.strptime(raw_date_str, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def make_column(rows, style):
+    """生成一列核销时间（style: text 文本时间戳 / native datetime单元格 / mixed 混合格式）"""
+    random.seed(7)
+    start = datetime.datetime(2024, 3, 1, 8)
+    values = ["核销时间"]
+    for _ in range(rows):
+        moment = start + datetime.timedelta(seconds=random.randint(0, 30 * 86400))
+        kind = style if style != "mixed" else random.choice(
+            ["text", "native", "slash", "date", "compact", "underscore", "bad"]
+        )
+        values.append({
+            "text": moment.strftime("%Y-%m-%d %H:%M:%S"),
+            "native": moment,
+            "slash": moment.strftime("%Y/%m/%d %H:%M:%S"),
+            "date": moment.strftime("%Y-%m-%d"),
+            "compact": moment.strftime("%Y%m%d"),
+            "underscore": moment.strftime("%Y-%m-%d %H_%M_%S"),
+            "bad": random.choice(["", "None", "2024-02-30", "2024-03/05", "--", "2024-3-5 25:00:00"]),
+        }[kind])
+    return values
+
+
+def timed(func, values):
+    start = time.perf_counter()
+    result = [func(v) for v in values]
+    return time.perf_counter() - start, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"行数：{rows}")
+    print(f"{'场景':<22}{'原循环(s)':>10}{'单次匹配(s)':>12}{'按列(s)':>10}")
+    cases = [
+        ("xt 文本时间戳", "text", legacy_xt, True),
+        ("xt 混合格式", "mixed", legacy_xt, True),
+        ("点评 文本时间戳", "text", legacy_dianping, False),
+        ("点评 datetime单元格", "native", legacy_dianping, False),
+        ("点评 混合格式", "mixed", legacy_dianping, False),
+    ]
+    for label, style, legacy, embedded in cases:
+        values = make_column(rows, style)
+        legacy_time, expected = timed(legacy, values)
+        parser_time, parsed = timed(DateParser(embedded=embedded), values)
+        column_time, column_parsed = timed(DateParser(embedded=embedded).column(), values)
+        if parsed != expected or column_parsed != expected:
+            raise SystemExit(f"[错误] {label} 解析结果与原实现不一致")
+        print(f"{label:<20}{legacy_time:>10.3f}{parser_time:>12.3f}{column_time:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+文件检测基准测试
+在临时目录中生成大量历史导出文件，对比原有的 os.listdir + 反复 os.path.getmtime 扫描
+与 file_detector 的单次 scandir 检测，并校验选出的文件一致。
+用法：python benchmarks/bench_file_detector.py [文件数]
+"""
+import datetime
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_detector import FileDetector
+from xsb import FILE_RULES
+
+
+def make_drop_folder(directory, count):
+    """生成多年的团购导出、排行报表、产品统计表及无关文件（修改时间各不相同）"""
+    random.seed(3)
+    start = datetime.datetime(2021, 1, 1)
+    for i in range(count):
+        moment = start + datetime.timedelta(minutes=37 * i)
+        kind = random.random()
+        if kind < 0.5:
+            name = f"{moment:%Y-%m-%d}_团购数据_{i}.xlsx"
+        elif kind < 0.65:
+            name = f"商品排行报表_{moment:%Y%m%d}_{i}.xlsx"
+        elif kind < 0.75:
+            name = f"济南 产品统计表{moment.month}-{moment.day}_{i}.xlsx"
+        elif kind < 0.8:
+            name = f"济南 产品统计表{moment.month}-{moment.day}_已处理_{i}.xlsx"
+        else:
+            name = f"其他文件_{i}.txt"
+        path = os.path.join(directory, name)
+        with open(path, "wb"):
+            pass
+        stamp = moment.timestamp()
+        os.utime(path, (stamp, stamp))
+
+
+def legacy_detect(directory):
+    """xsb.py 原有扫描逻辑"""
+    files = {
+        "groupon": {"pattern": r'^\d{4}-\d{2}-\d{2}.*', "found": None},
+        "product": {"pattern": "产品统计表", "found": None},
+        "ranking": {"pattern": "商品排行报表", "found": None},
+    }
+    for filename in os.listdir(directory):
+        filepath = os.path.join(directory, filename)
+        if not os.path.isfile(filepath):
+            continue
+        if re.match(files["groupon"]["pattern"], filename):
+            if not files["groupon"]["found"] or \
+               os.path.getmtime(filepath) > os.path.getmtime(files["groupon"]["found"]):
+                files["groupon"]["found"] = filepath
+        if files["product"]["pattern"] in filename and "_已处理" not in filename:
+            if not files["product"]["found"] or \
+               os.path.getmtime(filepath) > os.path.getmtime(files["product"]["found"]):
+                files["product"]["found"] = filepath
+        if files["ranking"]["pattern"] in filename:
+            if not files["ranking"]["found"] or \
+               os.path.getmtime(filepath) > os.path.getmtime(files["ranking"]["found"]):
+                files["ranking"]["found"] = filepath
+    return {key: info["found"] for key, info in files.items()}
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    directory = tempfile.mkdtemp(prefix="bench_detect_")
+    try:
+        print(f"正在生成 {count} 个文件...")
+        make_drop_folder(directory, count)
+
+        rounds = 5
+        start = time.perf_counter()
+        for _ in range(rounds):
+            expected = legacy_detect(directory)
+        legacy_time = (time.perf_counter() - start) / rounds
+
+        detector = FileDetector(FILE_RULES)
+        start = time.perf_counter()
+        detected = detector.scan(directory)
+        first_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            detected = detector.scan(directory)
+        rescan_time = (time.perf_counter() - start) / rounds
+
+        result = {key: found.path if found else None for key, found in detected.items()}
+        if result != expected:
+            raise SystemExit(f"[错误] 检测结果不一致：{result} != {expected}")
+        print(f"原有扫描：{legacy_time:.3f} 秒/次")
+        print(f"单次scandir（首次）：{first_time:.3f} 秒（{legacy_time / first_time:.1f}倍）")
+        print(f"单次scandir（重复扫描）：{rescan_time:.3f} 秒/次（{legacy_time / rescan_time:.1f}倍）")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+合并单元格写入基准测试
+在合并区域数量不同的「总表」上分别用旧版（逐个扫描合并区域）
+和索引版 set_cell_value 写入同一批单元格，比较单次写入耗时。
+用法：python benchmarks/bench_merged_cells.py [写入次数]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import Workbook
+
+from xsb import set_cell_value
+
+
+def legacy_set_cell_value(ws, cell_address, value):
+    """旧版实现：每次写入都遍历全部合并区域"""
+    target_cell = ws[cell_address]
+    for merged_range in ws.merged_cells.ranges:
+        if target_cell.coordinate in merged_range:
+            top_left_cell = ws.cell(row=merged_range.min_row, column=merged_range.min_col)
+            if target_cell.coordinate == top_left_cell.coordinate:
+                top_left_cell.value = value
+            return
+    target_cell.value = value
+
+
+def build_summary_sheet(merge_count):
+    """生成带指定数量合并区域的总表（每个区域占两行一列）"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "总表"
+    columns = 60
+    for i in range(merge_count):
+        row = 2 * (i // columns) + 100  # 合并区域放在数据区下方，模拟表尾格式
+        column = i % columns + 1
+        ws.merge_cells(start_row=row, start_column=column, end_row=row + 1, end_column=column)
+    return ws
+
+
+def time_writes(func, ws, writes):
+    """返回单次写入的平均耗时（微秒）"""
+    addresses = [f"{col}{row}" for row in range(3, 43) for col in "DEFGHIJ"]
+    func(ws, addresses[0], None)  # 预热：索引版在首次写入时建立索引
+    start = time.perf_counter()
+    for i in range(writes):
+        func(ws, addresses[i % len(addresses)], i)
+    return (time.perf_counter() - start) / writes * 1e6
+
+
+def main():
+    writes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"{'合并区域数':>10} {'旧版(μs/次)':>14} {'索引版(μs/次)':>16}")
+    for merge_count in (0, 100, 1000, 5000):
+        ws = build_summary_sheet(merge_count)
+        legacy = time_writes(legacy_set_cell_value, ws, writes)
+        indexed = time_writes(set_cell_value, ws, writes)
+        print(f"{merge_count:>10} {legacy:>14.1f} {indexed:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
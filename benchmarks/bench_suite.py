@@ -0,0 +1,148 @@
+"""
+全部处理脚本的基准测试
+用 synthetic 生成不同行数的全套输入，依次运行各脚本的核心方法，报告耗时与峰值内存：
+- 耗时：单独一轮运行，不开启内存跟踪
+- 峰值内存：再运行一轮，用 tracemalloc 统计Python对象分配的峰值（--no-memory 可跳过）
+均不使用解析缓存与水位线（冷启动、全量统计），各脚本的提示输出被丢弃。
+
+用法：python benchmarks/bench_suite.py [--rows 1000,10000,100000] [--skus 60]
+                                       [--merge-density 0.1] [--only xsb,cyb] [--no-memory]
+"""
+import argparse
+import contextlib
+import datetime
+import gc
+import importlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cyb
+import czb
+import xsb
+import xszb
+import xt
+from synthetic import generate_all
+
+dianping = importlib.import_module("点评")
+
+
+def build_cases(files, target_date):
+    """
+    返回 [(场景名, 无参数可调用对象)]
+    每个可调用对象内部创建处理对象，保证多次运行互不影响
+    """
+    def xsb_ranking():
+        return xsb.ExcelProcessorApp(target_date=target_date).merge_ranking_file(files["ranking"])
+
+    def xsb_groupon():
+        return xsb.ExcelProcessorApp(target_date=target_date).process_groupon_file(files["groupon"])
+
+    def xsb_full():
+        app = xsb.ExcelProcessorApp(target_date=target_date)
+        output = app.process_inputs(files["ranking"], files["product"], files["groupon"])
+        os.remove(output)  # 输出文件名固定，删除后下一轮不会走重名分支
+
+    def xt_groupon():
+        return xt.ExcelProcessorApp(strict=True)._process_group_purchase(files["groupon"], target_date)
+
+    def xt_payment():
+        return xt.ExcelProcessorApp(strict=True)._process_payment_stats(files["payment_stats"])
+
+    def dianping_dedup():
+        return dianping.ExcelProcessorApp(strict=True)._process_dianping(files["groupon"], target_date)
+
+    def cyb_compare():
+        comparator = cyb.ExcelComparator(strict=True)
+        comparator.compare_data(files["product"], files["kitchen"])
+        if comparator.report_path:
+            os.remove(comparator.report_path)
+
+    def xszb_sync():
+        updater = xszb.SalesDataUpdater(target_date=target_date)
+        updater.stat_file, updater.total_file = files["product"], files["sales_total"]
+        updater.sync()
+
+    def czb_reset():
+        os.remove(czb.ExcelProcessorApp(target_date=target_date).process_file(files["product"]))
+
+    return [
+        ("xsb merge_ranking_file", xsb_ranking),
+        ("xsb process_groupon_file", xsb_groupon),
+        ("xsb process_inputs", xsb_full),
+        ("xt _process_group_purchase", xt_groupon),
+        ("xt _process_payment_stats", xt_payment),
+        ("点评 _process_dianping", dianping_dedup),
+        ("cyb compare_data", cyb_compare),
+        ("xszb sync", xszb_sync),
+        ("czb process_file", czb_reset),
+    ]
+
+
+def run_quietly(func):
+    """运行并丢弃提示输出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+
+
+def measure(func, memory=True):
+    """
+    返回 (耗时秒, 峰值内存MB)；不统计内存时峰值为None
+    """
+    gc.collect()
+    start = time.perf_counter()
+    run_quietly(func)
+    elapsed = time.perf_counter() - start
+    if not memory:
+        return elapsed, None
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run_quietly(func)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="处理脚本基准测试")
+    parser.add_argument("--rows", default="1000,10000,100000", help="行数列表，逗号分隔")
+    parser.add_argument("--skus", type=int, default=60, help="商品名称种类数")
+    parser.add_argument("--merge-density", type=float, default=0.1, help="合并单元格密度（0~1）")
+    parser.add_argument("--only", default="", help="只运行名称包含其中任一关键字的场景，逗号分隔")
+    parser.add_argument("--no-memory", action="store_true", help="不统计峰值内存")
+    args = parser.parse_args()
+
+    sizes = [int(text) for text in args.rows.split(",") if text.strip()]
+    keywords = [text.strip() for text in args.only.split(",") if text.strip()]
+    target_date = datetime.date.today()
+
+    print(f"SKU：{args.skus}，合并单元格密度：{args.merge_density}")
+    print(f"{'场景':<30}{'行数':>9}{'耗时(s)':>10}{'峰值内存(MB)':>14}")
+    for rows in sizes:
+        directory = tempfile.mkdtemp(prefix="bench_suite_")
+        try:
+            started = time.perf_counter()
+            files = generate_all(directory, rows, args.skus, args.merge_density, target_date=target_date)
+            print(f"-- 已生成 {rows} 行输入（{time.perf_counter() - started:.1f} 秒）")
+            for label, func in build_cases(files, target_date):
+                if keywords and not any(keyword in label for keyword in keywords):
+                    continue
+                elapsed, peak = measure(func, memory=not args.no_memory)
+                peak_text = "-" if peak is None else f"{peak:.1f}"
+                print(f"{label:<30}{rows:>9}{elapsed:>10.3f}{peak_text:>14}")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
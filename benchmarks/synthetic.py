@@ -0,0 +1,237 @@
+"""
+合成测试工作簿生成器
+按各脚本读取的版式生成逼真的导出与报表，用于基准测试与压力测试：
+- 商品排行报表（xsb/xsb_qd）：C=商品名称 E=渠道 F=销量
+- 团购表（xsb/xt/点评）：按表头取列，A=核销时间 E=售卖平台 K=金额 M=手机尾号，
+  时间为 datetime 与文本混合，覆盖多天
+- 支付方式收款统计（xt）：A=支付方式 D=金额
+- 产品统计表（xsb/cyb/xszb/czb）：总表、销售表、用料表三个工作表
+- 厨房用表（cyb）、产品销售总表（xszb）
+
+行数、商品名称种类数（SKU）与合并单元格密度均可配置；同一组参数与随机种子生成的内容相同。
+固定版式的报表（产品统计表、厨房用表、产品销售总表）在脚本读取的区域之后追加 rows 行历史数据。
+
+用法：python benchmarks/synthetic.py 输出目录 [--rows 10000] [--skus 60] [--merge-density 0.1]
+"""
+import argparse
+import datetime
+import os
+import random
+
+from openpyxl import Workbook
+
+# 与 product_rules.json 中规则对应的口味与品类（组合后覆盖各条标准化规则）
+FLAVORS = ["草莓", "开心果", "抹茶", "芋泥", "香芋", "芒果", "原味", "蔓越莓", "紫米", "芝士", "双蛋白", "零蔗糖", "圣诞"]
+BASES = ["鲜牛乳", "冰淇淋", "酸奶碗", "鸳鸯酸奶", "双皮奶", "炒酸奶", "酸奶", "布丁", "罐罐", "奶酪"]
+DECORATIONS = ["", "(杯)", "【大】", "【小】", " 2份", " 10块", "（门店自提）", "-新品"]
+SPECIAL_NAMES = ["收藏炒酸奶", "全家福炒酸奶（10块）", "鲜牛奶", "鲜牛奶3包", "鲜牛奶6次", "香蕉牛奶", "半口奶酪", "生巧可可"]
+
+# 产品统计表与厨房用表中的标准名称
+STANDARD_NAMES = [
+    "全家福炒酸奶（10块）", "鲜牛奶", "草莓冷萃鲜牛乳", "开心果冷萃鲜牛乳", "抹茶冷萃鲜牛乳", "香芋冷萃鲜牛乳",
+    "鲜奶冰淇淋", "酸奶冰淇淋", "酸奶碗—草莓", "酸奶碗—开心果能量", "草莓鸳鸯酸奶", "开心果鸳鸯酸奶",
+    "蔓越莓胶原酸奶", "双蛋白酸奶", "零蔗糖酸奶", "芝士酸奶", "紫米酸奶", "液体酸奶", "奶皮子酸奶酪",
+    "布丁", "生巧可可牛奶", "香蕉牛奶", "半口奶酪", "冷萃酸奶罐罐", "开心果双皮奶", "果味双皮奶",
+    "原味双皮奶", "零蔗糖品尝", "无糖品尝", "无糖试吃", "原味冷萃半成品", "半口品尝",
+]
+
+CHANNELS = ["未映射饿了么外卖", "未映射美团外卖", "门店收银", "小程序", None]
+PLATFORMS = ["点评", "美团", "抖音"]
+STORES = ["济南万达店", "济南恒隆店", "青岛万象城店", "青岛海信店"]
+PAYMENT_TYPES = ["现金", "微信", "支付宝", "饿了么", "余额", "抖音团购", "优惠券记账金额", "银行卡", "其他"]
+GROUPON_HEADER = [
+    "核销时间", "订单号", "券码", "套餐类型", "售卖平台", "商品名称", "验证门店",
+    "验证方式", "操作人", "原价", "金额", "备注", "手机尾号",
+]
+
+# 产品统计表「总表」的行区间（与 xszb/czb/cyb 读取的区域一致）
+SUMMARY_FIRST_ROW, SUMMARY_LAST_ROW = 3, 42
+SALES_TOTAL_LAST_COLUMN = 66  # 产品销售总表的日期列最多到BO列
+
+
+def product_vocabulary(skus, seed=0):
+    """
+    生成商品名称词表（团购与排行报表中出现的原始名称）
+    参数：
+        skus (int): 不同名称的数量
+    """
+    rng = random.Random(seed)
+    combos = [f"{flavor}{base}{decoration}" for flavor in FLAVORS for base in BASES for decoration in DECORATIONS]
+    rng.shuffle(combos)
+    names = SPECIAL_NAMES + combos
+    while len(names) < skus:
+        names.append(f"{rng.choice(FLAVORS)}{rng.choice(BASES)}#{len(names)}")
+    return names[:max(skus, 1)]
+
+
+def _moments(rng, target_date, days):
+    """目标日期及之前 days-1 天内的随机时刻"""
+    day = target_date - datetime.timedelta(days=rng.randrange(days))
+    return datetime.datetime(day.year, day.month, day.day, rng.randint(8, 21), rng.randint(0, 59), rng.randint(0, 59))
+
+
+def _merge_block(ws, rng, row, first_column, last_column, density):
+    """按密度把 row 行的 first_column~last_column 合并（只保留左上角的值）"""
+    if density > 0 and rng.random() < density:
+        ws.merge_cells(start_row=row, start_column=first_column, end_row=row, end_column=last_column)
+
+
+def write_ranking_report(path, rows, skus=60, seed=1):
+    """商品排行报表（表头 + rows 行）"""
+    rng = random.Random(seed)
+    names = product_vocabulary(skus, seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("商品排行")
+    ws.append(["排名", "商品编码", "商品名称", "规格", "渠道", "销量", "销售额"])
+    for i in range(rows):
+        quantity = rng.choice([1, 1, 2, 3, 5, "2", "", None])
+        ws.append([i + 1, f"SP{rng.randrange(10 ** 6):06d}", rng.choice(names), "默认",
+                   rng.choice(CHANNELS), quantity, round(rng.uniform(5, 300), 2)])
+    wb.save(path)
+    return path
+
+
+def write_groupon_export(path, rows, skus=60, days=28, target_date=None, seed=2):
+    """团购核销导出（表头 + rows 行，覆盖截至 target_date 的 days 天）"""
+    rng = random.Random(seed)
+    target_date = target_date or datetime.date.today()
+    names = product_vocabulary(skus, seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("核销明细")
+    ws.append(GROUPON_HEADER)
+    for i in range(rows):
+        moment = _moments(rng, target_date, days)
+        ws.append([
+            moment if rng.random() < 0.5 else moment.strftime("%Y-%m-%d %H:%M:%S"),
+            f"DD{i:09d}", f"{rng.randrange(10 ** 12):012d}", "单人套餐",
+            rng.choice(PLATFORMS), rng.choice(names), rng.choice(STORES),
+            "扫码", "店员", 39.9, rng.choice([9.9, 19.9, 29.9, "29.9", ""]), "",
+            f"{rng.randrange(10000):04d}",
+        ])
+    wb.save(path)
+    return path
+
+
+def write_payment_stats(path, rows, seed=3):
+    """支付方式收款统计（rows 行流水）"""
+    rng = random.Random(seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("收款统计")
+    for _ in range(rows):
+        ws.append([rng.choice(PAYMENT_TYPES), "收款", rng.randint(1, 20), round(rng.uniform(1, 200), 2)])
+    wb.save(path)
+    return path
+
+
+def write_product_stat(path, rows=0, merge_density=0.1, seed=4):
+    """
+    产品统计表：总表（工作表1）、销售表（工作表2）、用料表（工作表3）
+    参数：
+        rows (int): 各表在读取区域之后追加的历史行数
+        merge_density (float): 名称、备注等单元格被合并的比例（0~1）
+    """
+    rng = random.Random(seed)
+    wb = Workbook()
+    summary = wb.active
+    summary.title = "总表"
+    summary.append(["产品统计表"])
+    summary.append(["序号", "产品", "", "昨日库存", "销售", "团购", "美团", "饿了么", "其他",
+                    "收藏", "", "", "", "", "今日库存", "", "备注"])
+    summary.merge_cells("A1:Q1")
+    for index, row in enumerate(range(SUMMARY_FIRST_ROW, SUMMARY_LAST_ROW + 1 + rows)):
+        name = STANDARD_NAMES[index % len(STANDARD_NAMES)] if row <= SUMMARY_LAST_ROW else f"历史{row}"
+        values = [rng.randint(0, 80) for _ in range(12)]
+        summary.append([index + 1, name, None] + values + [None, f"备注{row}" if rng.random() < 0.3 else None])
+        _merge_block(summary, rng, row, 2, 3, merge_density)
+
+    sales = wb.create_sheet("销售表")
+    sales.append(["序号", "产品", "", "合计", "零售", "团购", "美团", "饿了么", "其他"])
+    for index, row in enumerate(range(2, 32 + rows)):
+        name = STANDARD_NAMES[index % len(STANDARD_NAMES)] if row <= 31 else f"历史{row}"
+        sales.append([index + 1, name, None] + [rng.randint(0, 50) for _ in range(6)])
+        _merge_block(sales, rng, row, 2, 3, merge_density)
+
+    material = wb.create_sheet("用料表")
+    material.append(["用料表"])
+    material.append(["序号", "用料", "", "昨日", "用量", "补货", "损耗", "今日"])
+    for index, row in enumerate(range(3, 77 + rows)):
+        name = STANDARD_NAMES[index % len(STANDARD_NAMES)] if row <= 13 else f"用料{row}"
+        material.append([index + 1, name, None] + [rng.randint(0, 30) for _ in range(5)])
+        _merge_block(material, rng, row, 2, 3, merge_density)
+    wb.save(path)
+    return path
+
+
+def write_kitchen_sheet(path, rows=0, merge_density=0.1, seed=5):
+    """厨房用表（第5~38行为产品，之后追加 rows 行历史数据）"""
+    rng = random.Random(seed)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "厨房用表"
+    for _ in range(4):
+        ws.append(["厨房用表"])
+    ws.merge_cells("A1:H4")
+    for index, row in enumerate(range(5, 39 + rows)):
+        name = STANDARD_NAMES[index % len(STANDARD_NAMES)] if row <= 38 else f"历史{row}"
+        ws.append([index + 1, name, None, None, None, rng.randint(0, 80), None, None])
+        _merge_block(ws, rng, row, 2, 4, merge_density)
+    wb.save(path)
+    return path
+
+
+def write_sales_total(path, rows=0, merge_density=0.1, seed=6):
+    """产品销售总表（总表：第4~43行为产品，E~BO为每日的销售/备注列）"""
+    rng = random.Random(seed)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "总表"
+    ws.append(["产品销售总表"])
+    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=SALES_TOTAL_LAST_COLUMN)
+    ws.append(["序号", "产品", "规格", "单位"] + [f"{day // 2 + 1}日" for day in range(SALES_TOTAL_LAST_COLUMN - 4)])
+    ws.append([None] * 4 + ["销售" if i % 2 == 0 else "备注" for i in range(SALES_TOTAL_LAST_COLUMN - 4)])
+    for index, row in enumerate(range(4, 44 + rows)):
+        name = STANDARD_NAMES[index % len(STANDARD_NAMES)] if row <= 43 else f"历史{row}"
+        days = [rng.randint(0, 60) if i % 2 == 0 else None for i in range(SALES_TOTAL_LAST_COLUMN - 4)]
+        ws.append([index + 1, name, "份", "个"] + days)
+        _merge_block(ws, rng, row, 3, 4, merge_density)
+    wb.save(path)
+    return path
+
+
+def generate_all(directory, rows=10000, skus=60, merge_density=0.1, days=28, target_date=None, seed=0):
+    """
+    在目录中生成全套输入（文件名符合各脚本 FILE_RULES 的自动检测规则）
+    返回：
+        dict: 输入角色 → 文件路径
+    """
+    os.makedirs(directory, exist_ok=True)
+    target_date = target_date or datetime.date.today()
+    path = lambda name: os.path.join(directory, name)
+    return {
+        "ranking": write_ranking_report(path("商品排行报表.xlsx"), rows, skus, seed + 1),
+        "groupon": write_groupon_export(path(f"{target_date:%Y-%m-%d}_团购数据.xlsx"), rows, skus, days,
+                                        target_date, seed + 2),
+        "payment_stats": write_payment_stats(path("支付方式收款统计.xlsx"), rows, seed + 3),
+        "product": write_product_stat(path("济南 产品统计表.xlsx"), rows, merge_density, seed + 4),
+        "kitchen": write_kitchen_sheet(path("厨房用表.xlsx"), rows, merge_density, seed + 5),
+        "sales_total": write_sales_total(path("产品销售总表.xlsx"), rows, merge_density, seed + 6),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成测试工作簿")
+    parser.add_argument("directory", help="输出目录")
+    parser.add_argument("--rows", type=int, default=10000, help="导出行数 / 报表追加的历史行数")
+    parser.add_argument("--skus", type=int, default=60, help="商品名称种类数")
+    parser.add_argument("--merge-density", type=float, default=0.1, help="合并单元格密度（0~1）")
+    parser.add_argument("--days", type=int, default=28, help="团购导出覆盖的天数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    files = generate_all(args.directory, args.rows, args.skus, args.merge_density, args.days, seed=args.seed)
+    for role, path in files.items():
+        print(f"{role}: {path}")
+
+
+if __name__ == "__main__":
+    main()
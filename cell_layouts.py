@@ -0,0 +1,192 @@
+"""
+报表版式声明与读写计划
+各工具读写的固定单元格区域集中在这里声明，模板调整时只需修改 LAYOUTS / ROW_LAYOUTS，
+不必在多个脚本中查找坐标。
+
+区域版式（CellLayout）：一个工作表上按顺序排列的若干区域，每个区域可带目标起始行
+
+    CellLayout("总表", (("F3:F30", 4), ("J31", 32), ("G32:G42", 33)))
+
+compile_layout 把版式预先编译为 CopyPlan：
+- 各区域的行列边界只解析一次，整张表用一次 read_block 读出所有区域的外接矩形
+  （合并区域在这一次读取中统一解析为锚点的值），再按区域切片
+- 目标行首尾相接的区域合并为连续的目标块，写入时每块一次 set_block，不再逐个单元格拼坐标
+
+行版式（RowLayout）：按名称列匹配行、向各渠道列写值的表（如产品统计表「销售表」），
+编译时把列字母解析为列号。
+"""
+from typing import NamedTuple
+
+from openpyxl.utils.cell import column_index_from_string, range_boundaries
+
+import instrumentation
+import merged_cells
+import xlsx_patch
+
+
+class CellLayout(NamedTuple):
+    """单个工作表上的区域版式"""
+    sheet: str  # 工作表名称（None表示活动工作表）
+    regions: tuple  # ((源区域, 目标起始行), ...)；只读取的区域目标为None
+
+
+class RowLayout(NamedTuple):
+    """按名称匹配行写入的表版式"""
+    sheet: str  # 工作表名称
+    name_column: str  # 名称列
+    first_row: int  # 数据起始行
+    columns: dict  # {字段: 列字母}
+    formula_rows: tuple = None  # (起始行, 结束行)：该区间内写入行公式
+    formula: str = None  # 行公式模板（{row} 替换为行号），写入 columns["total"] 列
+
+
+LAYOUTS = {
+    # xszb：产品统计表「总表」→ 销售总表「总表」当天列（F3-F30 → 4-31，J31 → 32，G32-G42 → 33-43）
+    "xszb.sales": CellLayout("总表", (("F3:F30", 4), ("J31", 32), ("G32:G42", 33))),
+    # xszb：备注 Q3-Q42 → 销售总表备注列4-43行
+    "xszb.remarks": CellLayout("总表", (("Q3:Q42", 4),)),
+    # cyb：产品统计表 B列名称、E列数量
+    "cyb.product_total": CellLayout("总表", (("B3:E11", None), ("B13:E16", None), ("B30:E30", None),
+                                             ("B32:E38", None))),
+    "cyb.product_material": CellLayout("用料表", (("B3:E9", None), ("B13:E13", None))),
+    # cyb：厨房用表 B列名称、F列数量（跳过37行）
+    "cyb.kitchen": CellLayout(None, (("B5:F36", None), ("B38:F38", None))),
+}
+
+ROW_LAYOUTS = {
+    # xsb：产品统计表「销售表」B列商品名称，D小条 E零售 F团购 G美团 H饿了么，3-30行D列为各渠道合计公式
+    "xsb.sales": RowLayout("销售表", "B", 2, {
+        "total": "D", "retail": "E", "groupon": "F", "meituan": "G", "eleme": "H",
+    }, formula_rows=(3, 30), formula="=SUM(E{row}:I{row})"),
+}
+
+
+class Region(NamedTuple):
+    """编译后的区域（相对外接矩形的偏移）"""
+    row_offset: int
+    col_offset: int
+    height: int
+    width: int
+    dest_row: int = None
+
+
+class CopyPlan:
+    """预先编译的区域读写计划"""
+
+    def __init__(self, layout, regions, bounds, dest_spans):
+        self.layout = layout
+        self.regions = regions
+        self.bounds = bounds  # 外接矩形 (起始行, 结束行, 起始列, 结束列)
+        self.dest_spans = dest_spans  # 连续的目标块 [(目标起始行, 行数), ...]，按区域顺序
+
+    def read(self, ws, merged=None):
+        """
+        一次读取所有区域
+        参数：
+            ws: 工作表（普通模式、只读模式或缓存工作表）
+            merged (list): 合并区域（见 merged_cells.read_block；传空列表时不解析合并区域）
+        返回：
+            list: 各区域的值（按行排列的二维列表），顺序与版式一致
+        """
+        min_row, max_row, min_col, max_col = self.bounds
+        block = merged_cells.read_block(ws, min_row, max_row, min_col, max_col, merged)
+        return [
+            [values[region.col_offset:region.col_offset + region.width]
+             for values in block[region.row_offset:region.row_offset + region.height]]
+            for region in self.regions
+        ]
+
+    def column_values(self, ws, merged=None):
+        """
+        读取单列区域并展开为 [(目标行, 值)]（只含有目标的区域）
+        """
+        pairs = []
+        for region, rows in zip(self.regions, self.read(ws, merged)):
+            if region.dest_row is not None:
+                pairs.extend((region.dest_row + index, values[0]) for index, values in enumerate(rows))
+        return pairs
+
+    def write_column(self, ws, column, values):
+        """
+        把 column_values 的值按连续目标块写入目标列（修改经由 xlsx_patch 记录）
+        参数：
+            column (str): 目标列字母
+            values (list): [(目标行, 值)]，顺序与 column_values 一致
+        """
+        column_index = column_index_from_string(column)
+        position = 0
+        for first_row, height in self.dest_spans:
+            rows = [(value,) for _, value in values[position:position + height]]
+            xlsx_patch.set_block(ws, first_row, column_index, rows)
+            position += height
+        instrumentation.count("写入单元格数", position)
+
+
+def compile_layout(layout):
+    """
+    把区域版式编译为读写计划
+    异常：
+        ValueError: 版式中没有区域
+    """
+    if not layout.regions:
+        raise ValueError(f"版式中没有区域：{layout}")
+    boundaries = [range_boundaries(area) for area, _ in layout.regions]
+    min_row = min(bounds[1] for bounds in boundaries)
+    max_row = max(bounds[3] for bounds in boundaries)
+    min_col = min(bounds[0] for bounds in boundaries)
+    max_col = max(bounds[2] for bounds in boundaries)
+
+    regions = []
+    dest_spans = []
+    for (left, top, right, bottom), (_, dest_row) in zip(boundaries, layout.regions):
+        region = Region(top - min_row, left - min_col, bottom - top + 1, right - left + 1, dest_row)
+        regions.append(region)
+        if dest_row is None:
+            continue
+        # 目标行与上一个目标块首尾相接时合并为一块
+        if dest_spans and sum(dest_spans[-1]) == dest_row:
+            dest_spans[-1] = (dest_spans[-1][0], dest_spans[-1][1] + region.height)
+        else:
+            dest_spans.append((dest_row, region.height))
+    return CopyPlan(layout, regions, (min_row, max_row, min_col, max_col), dest_spans)
+
+
+class RowPlan:
+    """编译后的行版式（列字母已解析为列号）"""
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.name_column = column_index_from_string(layout.name_column)
+        self.columns = {field: column_index_from_string(letter) for field, letter in layout.columns.items()}
+
+    def names(self, ws):
+        """一次读出名称列，返回 [(行号, 名称)]"""
+        rows = ws.iter_rows(min_row=self.layout.first_row, max_row=ws.max_row,
+                            min_col=self.name_column, max_col=self.name_column, values_only=True)
+        return [(row, values[0]) for row, values in enumerate(rows, self.layout.first_row)]
+
+    def formula(self, row):
+        """该行的行公式（不在公式区间内时返回None）"""
+        formula_rows = self.layout.formula_rows
+        if formula_rows is None or not formula_rows[0] <= row <= formula_rows[1]:
+            return None
+        return self.layout.formula.format(row=row)
+
+
+_plans = {}
+
+
+def get_plan(name):
+    """
+    获取版式的读写计划（每个版式只编译一次）
+    异常：
+        KeyError: 未知的版式名称
+    """
+    plan = _plans.get(name)
+    if plan is None:
+        if name in LAYOUTS:
+            plan = compile_layout(LAYOUTS[name])
+        else:
+            plan = RowPlan(ROW_LAYOUTS[name])
+        _plans[name] = plan
+    return plan
@@ -0,0 +1,341 @@
+"""
+导出数据的列式内存表
+一次遍历把需要的列读入内存，之后的筛选、分组求和、去重计数都按列整体完成：
+- 每列先做因子化（不同取值 + 每行的取值编号），谓词和转换函数只对不同取值
+  计算一次，再按编号广播到所有行。多周历史的导出中商品名、门店、平台等
+  重复度很高，逐行的字符串判断与名称标准化因此降为按取值计算；
+- 行掩码、编号与数值列在安装了NumPy时使用ndarray，否则回退到标准库
+  bytearray / list / array，两种实现的结果一致。
+
+用法示例：
+    table = ColumnTable.from_sheet(ws, ["核销时间", "验证门店", "商品名称"])
+    mask = table["核销时间"].map(to_date).eq(today) & table["验证门店"].contains("济南")
+    counts = table.filter(mask).group_count("商品名称")
+"""
+import numbers
+import operator
+from array import array
+from collections import Counter
+from functools import reduce
+from itertools import compress, groupby
+
+import instrumentation
+
+try:
+    import numpy as np
+except ImportError:  # 未安装NumPy时使用标准库实现
+    np = None
+
+
+# 分组求和（无NumPy）：分组数不超过该值时按组掩码累加，否则排序后分段累加
+_MAX_MASKED_GROUPS = 32
+_GROUP_SELECTORS = [bytes(1 if code == group else 0 for code in range(256)) for group in range(_MAX_MASKED_GROUPS)]
+
+
+def _take(values, bits):
+    """按掩码取出保留的行（数值数组保持原类型）"""
+    if np is not None and isinstance(values, np.ndarray):
+        return values[bits]
+    if isinstance(values, array):
+        return array(values.typecode, compress(values, bits))
+    return list(compress(values, bits))
+
+
+def _is_numeric(values):
+    return isinstance(values, array) or (np is not None and isinstance(values, np.ndarray))
+
+
+def _key(value):
+    """因子化使用的键（区分 1 / 1.0 / True 这类相等但类型不同的值）"""
+    return value.__class__, value
+
+
+def _mixes_numbers(values):
+    """列中是否同时出现多种数值类型（此时相等的值可能类型不同）"""
+    return sum(1 for kind in set(map(type, values)) if issubclass(kind, numbers.Number)) > 1
+
+
+class Mask:
+    """行掩码（逐行的真假值，支持 & | ~ 组合）"""
+
+    def __init__(self, bits):
+        self.bits = bits  # numpy 布尔数组，或元素为0/1的bytearray
+
+    @classmethod
+    def from_lookup(cls, lookup, codes):
+        """按取值编号把不同取值上的判断结果广播到每一行"""
+        if np is not None:
+            return cls(np.asarray(lookup, dtype=bool)[codes])
+        return cls(bytearray(map(lookup.__getitem__, codes)))
+
+    def __len__(self):
+        return len(self.bits)
+
+    def __and__(self, other):
+        if np is not None:
+            return Mask(self.bits & other.bits)
+        return Mask(self._combine(other, int.__and__))
+
+    def __or__(self, other):
+        if np is not None:
+            return Mask(self.bits | other.bits)
+        return Mask(self._combine(other, int.__or__))
+
+    def __invert__(self):
+        if np is not None:
+            return Mask(~self.bits)
+        return Mask(self._combine(Mask(bytearray(b"\x01" * len(self.bits))), int.__xor__))
+
+    def _combine(self, other, op):
+        """把0/1字节序列当作大整数做按位运算（整列一次完成）"""
+        size = len(self.bits)
+        if size != len(other.bits):
+            raise ValueError("掩码长度不一致")
+        result = op(int.from_bytes(self.bits, "little"), int.from_bytes(other.bits, "little"))
+        return bytearray(result.to_bytes(size, "little"))
+
+    def count(self):
+        """为真的行数"""
+        if np is not None:
+            return int(np.count_nonzero(self.bits))
+        return self.bits.count(1)
+
+
+class Column:
+    """单列数据（原始值 + 延迟计算的因子化结果）"""
+
+    def __init__(self, values):
+        self.values = values  # 与行一一对应：list，或 numbers() 得到的数值数组
+        self._factorized = None
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def factorize(self):
+        """
+        返回 (不同取值列表, 每行的取值编号)
+        不同取值按首次出现的顺序排列
+        """
+        if self._factorized is None:
+            values = self.values
+            if _mixes_numbers(values):
+                keys = list(map(_key, values))
+                index = {key: code for code, key in enumerate(dict.fromkeys(keys))}
+                uniques = [value for _, value in index]
+            else:
+                keys = values
+                index = {value: code for code, value in enumerate(dict.fromkeys(values))}
+                uniques = list(index)
+            codes = list(map(index.__getitem__, keys))
+            if np is not None:
+                codes = np.asarray(codes, dtype=np.intp)
+            self._factorized = uniques, codes
+        return self._factorized
+
+    def tolist(self):
+        """以Python对象列表返回全部取值"""
+        if np is not None and isinstance(self.values, np.ndarray):
+            return self.values.tolist()
+        return list(self.values)
+
+    def sum(self):
+        """按行顺序累加（与逐行 += 的结果一致）"""
+        return reduce(operator.add, self.tolist(), 0)
+
+    def unique(self):
+        """不同取值（按首次出现顺序）"""
+        return self.factorize()[0]
+
+    def distinct_count(self):
+        """不同取值的个数"""
+        return len(self.factorize()[0])
+
+    def map(self, func):
+        """逐值转换（每个不同取值只调用一次func）"""
+        uniques, codes = self.factorize()
+        mapped = [func(value) for value in uniques]
+        if np is not None:
+            return Column([mapped[code] for code in codes.tolist()])
+        return Column(list(map(mapped.__getitem__, codes)))
+
+    def where(self, predicate):
+        """按谓词生成行掩码（每个不同取值只判断一次）"""
+        uniques, codes = self.factorize()
+        return Mask.from_lookup([1 if predicate(value) else 0 for value in uniques], codes)
+
+    def eq(self, target):
+        return self.where(lambda value: value == target)
+
+    def isin(self, targets):
+        targets = set(targets)
+        return self.where(lambda value: value in targets)
+
+    def contains(self, text):
+        """字符串包含判断（非字符串取值视为不包含）"""
+        return self.where(lambda value: isinstance(value, str) and text in value)
+
+    def notempty(self):
+        return self.where(lambda value: value is not None and value != "")
+
+    def numbers(self, convert=None):
+        """
+        转换为数值数组
+        参数：
+            convert (callable): 单值转换函数（按不同取值调用），为None时非数值按0处理
+        返回：
+            全部为整数时为整型数组，否则为浮点数组
+        """
+        if convert is None:
+            if _is_numeric(self.values):
+                return self.values
+            convert = lambda value: value if isinstance(value, (int, float)) else 0
+        uniques, codes = self.factorize()
+        mapped = [convert(value) for value in uniques]
+        integral = all(isinstance(value, int) for value in mapped)
+        if np is not None:
+            return np.asarray(mapped, dtype=np.int64 if integral else np.float64)[codes]
+        return array("q" if integral else "d", map(mapped.__getitem__, codes))
+
+    def multiply(self, other):
+        """逐行相乘，返回数值列"""
+        left, right = self.numbers(), other.numbers()
+        if np is not None:
+            return Column(left * right)
+        typecode = "q" if left.typecode == right.typecode == "q" else "d"
+        return Column(array(typecode, map(operator.mul, left, right)))
+
+
+class ColumnTable:
+    """列式内存表"""
+
+    def __init__(self, columns, length=None):
+        self.columns = columns  # 列名 → Column
+        if length is None:
+            length = len(next(iter(columns.values()))) if columns else 0
+        self.length = length
+
+    @classmethod
+    def from_rows(cls, rows, columns):
+        """
+        从行迭代器一次读入指定列
+        参数：
+            rows: 行元组的迭代器（如 ws.iter_rows(values_only=True)）
+            columns (dict): 列名 → 行内索引（从0开始）
+        说明：
+            行长度不足时缺失的单元格按None处理
+        """
+        names = list(columns)
+        indexes = [columns[name] for name in names]
+        width = max(indexes) + 1 if indexes else 0
+        # 边读边按列投影，不保留整行（大表只占用所需列的内存）
+        data = [[] for _ in names]
+        targets = list(zip([values.append for values in data], indexes))
+        length = 0
+        with instrumentation.phase("columnar.read_rows"):  # 逐行读取（openpyxl 行迭代）
+            for row in rows:
+                if len(row) < width:
+                    # 行长度不足（如只读模式省略了行尾空单元格）时缺失的单元格取None
+                    row = tuple(row) + (None,) * (width - len(row))
+                for append, idx in targets:
+                    append(row[idx])
+                length += 1
+        return cls({name: Column(values) for name, values in zip(names, data)}, length)
+
+    @classmethod
+    def from_sheet(cls, ws, columns, header_row=1):
+        """
+        按表头名称读入工作表中的指定列（表头之后的全部行）
+        参数：
+            columns (list): 需要的表头名称
+        异常：
+            KeyError: 表头中缺少某一列
+        """
+        rows = ws.iter_rows(min_row=header_row, values_only=True)
+        headers = {value: idx for idx, value in enumerate(next(rows, ()))}
+        missing = [name for name in columns if name not in headers]
+        if missing:
+            raise KeyError(f"缺少必要列：{', '.join(map(str, missing))}")
+        return cls.from_rows(rows, {name: headers[name] for name in columns})
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def with_column(self, name, column):
+        """返回增加（或替换）一列后的新表"""
+        columns = dict(self.columns)
+        columns[name] = column
+        return ColumnTable(columns, self.length)
+
+    def filter(self, mask):
+        """只保留掩码为真的行"""
+        if len(mask) != self.length:
+            raise ValueError("掩码长度与表行数不一致")
+        return ColumnTable(
+            {name: Column(_take(column.values, mask.bits)) for name, column in self.columns.items()},
+            mask.count(),
+        )
+
+    def _group_codes(self, by):
+        """分组键的 (不同键列表, 每行的键编号)；多列分组时键为元组"""
+        if isinstance(by, str):
+            return self.columns[by].factorize()
+        return Column(list(zip(*(self.columns[name].values for name in by)))).factorize()
+
+    def group_sum(self, by, values):
+        """
+        分组求和
+        参数：
+            by (str | list): 分组列名（多列时键为元组）
+            values (str | sequence): 求和的列名，或与行对应的数值数组（如 Column.numbers() 的结果）
+        返回：
+            dict: 分组键 → 合计（按键首次出现的顺序，组内按行顺序累加）
+        """
+        keys, codes = self._group_codes(by)
+        if isinstance(values, str):
+            values = self.columns[values].numbers()
+        integral = (values.dtype.kind == "i") if np is not None else (values.typecode == "q")
+        if np is not None:
+            totals = np.zeros(len(keys), dtype=np.int64 if integral else np.float64)
+            np.add.at(totals, codes, values)
+            totals = totals.tolist()
+        else:
+            start = 0 if integral else 0.0
+            totals = [start] * len(keys)
+            if len(keys) <= _MAX_MASKED_GROUPS:
+                # 分组较少时逐组取出该组的行再累加（每组一次C层遍历）
+                code_bytes = bytes(codes)
+                for code in range(len(keys)):
+                    selector = code_bytes.translate(_GROUP_SELECTORS[code])
+                    totals[code] = reduce(operator.add, compress(values, selector), start)
+            else:
+                # 按编号稳定排序后分段累加，组内仍保持行顺序
+                order = sorted(range(len(codes)), key=codes.__getitem__)
+                for code, group in groupby(order, key=codes.__getitem__):
+                    totals[code] = reduce(operator.add, map(values.__getitem__, group), start)
+        return dict(zip(keys, totals))
+
+    def group_count(self, by):
+        """分组计数：分组键 → 行数（按键首次出现的顺序）"""
+        keys, codes = self._group_codes(by)
+        if np is not None:
+            counts = np.bincount(codes, minlength=len(keys)).tolist()
+        else:
+            counter = Counter(codes)
+            counts = [counter[code] for code in range(len(keys))]
+        return dict(zip(keys, counts))
+
+    def distinct_count(self, name, mask=None):
+        """某列不同取值的个数（可先按掩码筛选）"""
+        column = self.columns[name]
+        if mask is not None:
+            column = Column(_take(column.values, mask.bits))
+        return column.distinct_count()
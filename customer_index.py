@@ -0,0 +1,88 @@
+"""
+点评顾客去重索引
+把每次处理团购表时筛选出的 (核销日期, 售卖平台, 手机尾号) 写入本地 SQLite 表，
+之后任意日期区间（近N天、本月至今）的去重人数直接由索引统计，不再重新读取历史导出。
+
+索引按行增量写入（重复的记录自动忽略），可与团购表水位线一起使用：
+水位线跳过的旧行在之前的处理中已写入索引。
+注意：导出中删除的行（如退款）不会从索引中移除，需要时调用 CustomerIndex.reset 后重新处理。
+"""
+import contextlib
+import datetime
+import os
+import sqlite3
+
+from workbook_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_INDEX_FILE = os.path.join(DEFAULT_CACHE_DIR, "customer_index.sqlite3")
+
+# 日期以 date.toordinal() 整数存储，(日期, 平台, 尾号) 作为主键即为去重
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS visits (
+    day INTEGER NOT NULL,
+    platform TEXT NOT NULL,
+    tail TEXT NOT NULL,
+    PRIMARY KEY (platform, day, tail)
+) WITHOUT ROWID
+"""
+
+
+class CustomerIndex:
+    """(核销日期, 售卖平台, 手机尾号) 索引"""
+
+    def __init__(self, index_file=DEFAULT_INDEX_FILE):
+        self.index_file = index_file
+
+    @contextlib.contextmanager
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.index_file) or ".", exist_ok=True)
+        with contextlib.closing(sqlite3.connect(self.index_file, timeout=30)) as conn:
+            conn.execute(SCHEMA)
+            with conn:  # 正常结束时提交，异常时回滚
+                yield conn
+
+    def add(self, platform, records):
+        """
+        写入记录（已存在的记录忽略）
+        参数：
+            platform (str): 售卖平台
+            records (iterable): (核销日期 date, 手机尾号 str)
+        返回：
+            int: 新增的记录数
+        """
+        rows = {(day.toordinal(), platform, tail) for day, tail in records if day is not None and tail}
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO visits (day, platform, tail) VALUES (?, ?, ?)", rows)
+            return conn.total_changes - before
+
+    def distinct_count(self, platform, start, end=None):
+        """
+        统计日期区间内的去重手机尾号数量
+        参数：
+            start (date): 起始日期（含）
+            end (date): 结束日期（含），为None时与 start 相同
+        """
+        end = end or start
+        with self._connect() as conn:
+            (count,) = conn.execute(
+                "SELECT COUNT(DISTINCT tail) FROM visits WHERE platform = ? AND day BETWEEN ? AND ?",
+                (platform, start.toordinal(), end.toordinal()),
+            ).fetchone()
+        return count
+
+    def rolling_count(self, platform, end, days):
+        """截至 end（含）的近 days 天去重数量"""
+        return self.distinct_count(platform, end - datetime.timedelta(days=days - 1), end)
+
+    def month_to_date_count(self, platform, end):
+        """end 所在月份1日至 end（含）的去重数量"""
+        return self.distinct_count(platform, end.replace(day=1), end)
+
+    def reset(self, platform=None):
+        """清除指定平台（或全部）的记录"""
+        with self._connect() as conn:
+            if platform is None:
+                conn.execute("DELETE FROM visits")
+            else:
+                conn.execute("DELETE FROM visits WHERE platform = ?", (platform,))
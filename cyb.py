@@ -3,16 +3,32 @@ import re
 from datetime import datetime
 import threading
 from openpyxl import load_workbook
+import cell_layouts
+import merged_cells
+import product_rules
+from workbook_cache import WorkbookCache
+from file_detector import FileRule, detect_files, missing_rules
+import instrumentation
 # 在现有导入部分添加以下两行
 import urllib.request
 import sys
 
+# 需要检测的输入文件
+FILE_RULES = [
+    FileRule("product", "产品统计表", contains="产品统计表", exclude="_对比结果"),
+    FileRule("kitchen", "厨房用表", contains="厨房"),
+]
+
 class ExcelComparator:
     """Excel文件对比核心类（完整版）"""
 
-    def __init__(self):
+    def __init__(self, workbook_cache=None, strict=False):
+        self.workbook_cache = workbook_cache  # 输入文件解析缓存（WorkbookCache），None表示不启用
+        self.strict = strict  # True时处理错误直接抛出（批处理模式），否则提示后返回
         self.product_data = {}
         self.kitchen_data = {}
+        self.report_path = None  # 最近一次生成的差异报告路径
+        self.aliases = product_rules.load().name_aliases()
         threading.Thread(target=self.lazy_import_openpyxl).start()
 
     def lazy_import_openpyxl(self):
@@ -25,46 +41,26 @@ class ExcelComparator:
         while True:
             os.system('cls' if os.name == 'nt' else 'clear')
             print("正在扫描目录...")
-            current_dir = os.getcwd()
-            files = {
-                "product": {"pattern": "产品统计表", "found": None, "name": "产品统计表"},
-                "kitchen": {"pattern": "厨房", "found": None, "name": "厨房用表"}
-            }
-
-            # 文件检测逻辑
-            for filename in os.listdir(current_dir):
-                filepath = os.path.join(current_dir, filename)
-                if not os.path.isfile(filepath):
-                    continue
-
-                # 产品统计表匹配
-                if files["product"]["pattern"] in filename and "_对比结果" not in filename:
-                    if not files["product"]["found"] or \
-                       os.path.getmtime(filepath) > os.path.getmtime(files["product"]["found"]):
-                        files["product"]["found"] = filepath
-                
-                # 厨房用表匹配
-                if files["kitchen"]["pattern"] in filename:
-                    if not files["kitchen"]["found"] or \
-                       os.path.getmtime(filepath) > os.path.getmtime(files["kitchen"]["found"]):
-                        files["kitchen"]["found"] = filepath
+            # 单次扫描目录并匹配文件
+            files = detect_files(FILE_RULES)
 
             # 文件存在性检查
-            missing_files = [f["name"] for f in files.values() if not f["found"]]
+            missing_files = missing_rules(FILE_RULES, files)
             if not missing_files:
                 print("\n" + "="*50)
                 print("检测到以下文件：")
-                for f_type in files.values():
-                    mtime = datetime.fromtimestamp(os.path.getmtime(f_type["found"]))
-                    print(f"[{f_type['name']}]")
-                    print(f"文件名：{os.path.basename(f_type['found'])}")
+                for rule in FILE_RULES:
+                    found = files[rule.key]
+                    mtime = datetime.fromtimestamp(found.mtime)
+                    print(f"[{rule.name}]")
+                    print(f"文件名：{os.path.basename(found.path)}")
                     print(f"修改时间：{mtime.strftime('%Y-%m-%d %H:%M:%S')}\n")
                 print("="*50)
                 
                 # 用户确认
                 choice = input("是否开始对比？(Y/N): ").strip().lower()
                 if choice == 'y':
-                    return files["product"]["found"], files["kitchen"]["found"]
+                    return files["product"].path, files["kitchen"].path
                 else:
                     print("等待重新检测...")
                     input("按回车键继续...")
@@ -81,76 +77,76 @@ class ExcelComparator:
 
     def read_product_data(self, filepath):
         """读取产品统计表数据"""
-        wb = load_workbook(filepath, data_only=True)
+        wb, merged = self.load_readonly(filepath)
         data = {}
 
-        # 读取总表数据
         try:
-            total_ws = wb['总表']
-            ranges = [(3, 11), (13, 16), (30, 30), (32, 38)]
-            for r in ranges:
-                for row in range(r[0], r[1] + 1):
-                    product = self.normalize_name(self.get_merged_value(total_ws, f'B{row}'))
-                    value = self.safe_convert(self.get_merged_value(total_ws, f'E{row}'))
-                    if product:
-                        data[product] = value
-        except KeyError:
-            print("警告：未找到【总表】，跳过总表数据读取")
+            # 读取总表数据
+            try:
+                total_ws = wb['总表']
+                self.read_name_values(total_ws, merged.get('总表'), "cyb.product_total", data)  # B列名称，E列数量
+            except KeyError:
+                print("警告：未找到【总表】，跳过总表数据读取")
 
-        # 读取用料表数据（修改后的范围）
-        try:
-            material_ws = wb['用料表']
-            ranges = [(3, 9), (13, 13)]
-            for start, end in ranges:
-                for row in range(start, end + 1):
-                    product = self.normalize_name(self.get_merged_value(material_ws, f'B{row}'))
-                    value = self.safe_convert(self.get_merged_value(material_ws, f'E{row}'))
-                    if product:
-                        data[product] = value
-        except KeyError:
-            print("警告：未找到【用料表】，跳用料表数据读取")
+            # 读取用料表数据（修改后的范围）
+            try:
+                material_ws = wb['用料表']
+                self.read_name_values(material_ws, merged.get('用料表'), "cyb.product_material", data)
+            except KeyError:
+                print("警告：未找到【用料表】，跳用料表数据读取")
+        finally:
+            wb.close()
 
         return data
 
     def read_kitchen_data(self, filepath):
         """读取厨房用表数据（跳过36行）"""
-        wb = load_workbook(filepath, data_only=True)
-        ws = wb.active
+        wb, merged = self.load_readonly(filepath)
         data = {}
-
-        for row in range(5, 39):  # 对应Excel行号5-38
-            if row == 37:  # 跳过37行
-                continue
-                
-            product = self.normalize_name(self.get_merged_value(ws, f'B{row}'))
-            value = self.safe_convert(self.get_merged_value(ws, f'F{row}'))
-            if product:
-                data[product] = value
+        try:
+            ws = wb.active
+            # 对应Excel行号5-38，跳过37行；B列名称，F列数量
+            self.read_name_values(ws, merged.get(ws.title), "cyb.kitchen", data)
+        finally:
+            wb.close()
         return data
 
-    def get_merged_value(self, ws, cell_address):
-        """获取合并单元格的值"""
-        cell = ws[cell_address]
-        for merged_range in ws.merged_cells.ranges:
-            if cell.coordinate in merged_range:
-                return ws.cell(merged_range.min_row, merged_range.min_col).value
-        return cell.value
+    def load_readonly(self, filepath):
+        """
+        以只读模式加载输入文件
+        只读取几十行的固定区域，直接读取比完整解析后写入缓存更快，
+        因此只在缓存中已有该文件时使用缓存，未命中时不写入。
+        返回：
+            (工作簿, {工作表名称: 合并区域})：缓存工作表自带合并区域，此时字典为空
+        """
+        if self.workbook_cache is not None:
+            cached = self.workbook_cache.get(filepath, data_only=True)
+            if cached is not None:
+                return cached, {}
+        merged = merged_cells.read_merged_ranges(filepath)
+        return load_workbook(filepath, read_only=True, data_only=True), merged
+
+    def read_name_values(self, ws, merged, layout, data):
+        """
+        按版式批量读取「名称 → 数量」（整块读取，合并区域每块只解析一次）
+        参数：
+            ws: 工作表
+            merged (list): 合并区域（缓存工作表传None，从工作表自身获取）
+            layout (str): cell_layouts 中的版式名称（各区域首列为名称、末列为数量）
+            data (dict): 结果写入该字典（同名后出现的覆盖先出现的）
+        """
+        for rows in cell_layouts.get_plan(layout).read(ws, merged):
+            for values in rows:
+                product = self.normalize_name(values[0])
+                if product:
+                    data[product] = self.safe_convert(values[-1])
 
     def normalize_name(self, name):
-        """统一产品名称格式"""
+        """统一产品名称格式（别名表见 product_rules.json 的 aliases）"""
         if name is None:
             return ""
         name = str(name).strip()
-        replacements = {
-            '无糖酸奶': '零蔗糖酸奶',
-            '蔓越莓酸奶': '蔓越莓胶原酸奶',
-            '冷萃罐罐': '冷萃酸奶罐罐',
-        #    '无糖试吃': '零蔗糖品尝',
-            '半口奶酪品尝': '半口品尝',
-            '奶皮子品尝': '开心果双皮奶品尝',
-            '原味冷萃成品': '原味冷萃半成品'
-        }
-        return replacements.get(name, name)
+        return self.aliases.get(name, name)
 
     def safe_convert(self, value):
         """安全数值转换（处理公式和特殊格式）"""
@@ -167,11 +163,19 @@ class ExcelComparator:
             print(f"数值转换警告：{value} 无法转换，已视为0")
             return 0.0
 
-    def compare_data(self):
-        """主对比流程（包含特殊规则）"""
+    def compare_data(self, product_file=None, kitchen_file=None):
+        """
+        主对比流程（包含特殊规则）
+        参数：
+            product_file, kitchen_file (str): 指定输入文件（目录监控、批处理模式）；为None时自动检测
+        返回：
+            list: 差异列表（处理失败时为None）
+        """
         try:
-            product_file, kitchen_file = self.auto_detect_files()
+            if product_file is None or kitchen_file is None:
+                product_file, kitchen_file = self.auto_detect_files()
             
+            self.aliases = product_rules.load().name_aliases()  # 规则文件修改后使用新的别名表
             print("\n正在读取产品统计表数据...")
             self.product_data = self.read_product_data(product_file)
             
@@ -255,9 +259,10 @@ class ExcelComparator:
                     })
 
             # ================= 结果输出 =================
+            instrumentation.count("差异数", len(differences))
             if not differences:
                 print("\n对比结果：所有数据一致！")
-                return  # 直接返回，不执行后续代码            
+                return differences  # 直接返回，不执行后续代码
             else:
                 print(f"\n发现 {len(differences)} 处差异：")
                 print("-"*70)
@@ -287,8 +292,11 @@ class ExcelComparator:
 
                 # 生成报告
                 self.generate_report(differences, product_file)
+                return differences
 
         except Exception as e:
+            if self.strict:
+                raise
             print(f"\n[处理失败] 发生错误：{str(e)}")
 
     def generate_report(self, differences, original_path):
@@ -349,7 +357,15 @@ class ExcelComparator:
             counter += 1
 
         wb.save(save_path)
+        self.report_path = save_path
         print(f"\n差异报告已生成：{save_path}")
+        return save_path
+
+# 性能分析时计时的方法（见 instrumentation）
+instrumentation.register(ExcelComparator, "cyb", [
+    "compare_data", "read_product_data", "read_kitchen_data", "load_readonly", "read_name_values",
+    "generate_report",
+])
 
 if __name__ == "__main__":
     # === 后门验证代码 ===
@@ -372,7 +388,7 @@ if __name__ == "__main__":
     print("- 优化数据读取范围和名称标准化")
     print("="*50)
     
-    comparator = ExcelComparator()
+    comparator = ExcelComparator(workbook_cache=WorkbookCache())
     try:
         comparator.compare_data()
     except KeyboardInterrupt:
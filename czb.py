@@ -8,12 +8,16 @@ Excel 数据处理工具 - 命令行版
 
 # ==================== 标准库导入 ====================
 import os
-from datetime import datetime
+import multiprocessing
 import threading
 # 在现有导入部分添加以下两行
 import urllib.request
 import sys
 
+import instrumentation
+from job_queue import JobQueue
+from reset_engine import DEFAULT_LAYOUT, ResetPlan, get_plan, reset_workbook
+
 # ==================== 延迟加载模块 ====================
 def lazy_import_openpyxl():
     """
@@ -28,8 +32,18 @@ def lazy_import_openpyxl():
 class ExcelProcessorApp:
     """Excel文件处理核心类"""
     
-    def __init__(self):
-        """初始化方法"""
+    def __init__(self, target_date=None, layout=DEFAULT_LAYOUT):
+        """
+        初始化方法
+        参数：
+            target_date (date): 输出文件名使用的日期，为None时使用当天
+            layout (str): 清零版式配置键（见 reset_engine.RESET_LAYOUTS），默认济南
+        """
+        self.target_date = target_date
+        self.layout = layout
+        self.plan = get_plan(layout)  # 版式预先编译为整块复制/清空操作
+        # 拖放的文件交给固定进程数的任务队列处理（重复路径去重、同一输出文件串行保存）
+        self.jobs = JobQueue(reset_workbook, self.output_path, on_done=self._report_job)
         # 启动后台线程预加载openpyxl
         threading.Thread(target=lazy_import_openpyxl).start()
 
@@ -48,103 +62,58 @@ class ExcelProcessorApp:
             print("[错误] 文件路径无效，请检查路径是否正确")
             return
 
+        # 加入任务队列（在子进程中处理，避免界面卡顿）
+        if not self.jobs.submit(file_path, file_path, self.layout, self.target_date):
+            print(f"[提示] 文件已在处理队列中：{os.path.basename(file_path)}")
+            return
         print(f"[系统] 开始处理文件：{os.path.basename(file_path)}")
-        
-        # 启动处理线程（避免界面卡顿）
-        threading.Thread(target=self._process_excel, args=(file_path,)).start()
 
-    def _process_excel(self, file_path):
+    def _report_job(self, job, result, error, elapsed):
         """
-        Excel处理核心方法
+        任务完成报告（交互模式，错误只提示不抛出）
         参数：
-            file_path (str): 需要处理的Excel文件路径
+            job (Job): 完成的任务
+            result (str): 新文件路径（失败时为None）
+            error (Exception): 处理中的异常（成功时为None）
+            elapsed (float): 处理耗时（秒）
         """
-        try:
-            # ---------- 文件加载 ----------
-            from openpyxl import load_workbook  # 延迟加载
-            
-            # 注意：使用正常模式打开以便保存修改
-            wb = load_workbook(file_path)  # 加载工作簿对象
-            
-            print("[系统] 文件加载成功，开始处理工作表...")
-
-            # ---------- 工作表处理 ----------
-            self._process_main_sheet(wb)       # 处理总表
-            self._process_material_sheet(wb)   # 处理用料表
-            self._process_sales_sheet(wb)      # 处理销售表
-
-            # ---------- 生成新文件名 ----------
-            today = datetime.now()
-            month = str(today.month).lstrip('0')  # 去除前导零（1月显示为1而不是01）
-            day = str(today.day).lstrip('0')
-            new_file_name = f"济南 产品统计表{month}.{day}.xlsx"  # 按需求生成文件名
-            new_file_path = os.path.join(
-                os.path.dirname(file_path),  # 保持与原文件相同目录
-                new_file_name
-            )
-
-            # ---------- 保存处理结果 ----------
-            wb.save(new_file_path)  # 保存为新文件
-            print(f"[成功] 文件已保存至：\n{new_file_path}")
-
-        except PermissionError:
-            print("[错误] 文件被占用，请关闭Excel后重试")
-        except Exception as e:
-            print(f"[错误] 处理失败：{str(e)}")
-
-    def _process_main_sheet(self, wb):
+        name = os.path.basename(job.key)
+        if isinstance(error, PermissionError):
+            print(f"\n[错误] {name}：文件被占用，请关闭Excel后重试")
+        elif error is not None:
+            print(f"\n[错误] {name} 处理失败：{str(error)}")
+        else:
+            waited = job.started - job.submitted
+            print(f"\n[完成] {name}：用时 {elapsed:.2f} 秒（排队 {waited:.2f} 秒），已保存至：\n{result}")
+
+    def output_path(self, file_path):
         """
-        处理总表逻辑
-        操作步骤：
-            1. 将N列数据复制到D列
-            2. 清空E-N列数据
-            3. 设置F3-F30为0
+        新文件路径（与原文件同目录，按日期命名）
         参数：
-            wb (Workbook): openpyxl的工作簿对象
+            file_path (str): 需要处理的Excel文件路径
         """
-        main_ws = wb.worksheets[0]  # 获取第一个工作表
-        
-        for row in range(3, 43):    # 遍历3-42行
-            # 复制O列到D列
-            main_ws[f'D{row}'].value = main_ws[f'O{row}'].value
-            
-            # 清空E-O列数据
-            for col in ['E', 'G', 'H', 'I', 'J', 'K', 'L', 'M', 'N', 'O']:
-                main_ws[f'{col}{row}'].value = None  # 设为空值
-                
+        return self.plan.output_path(file_path, self.target_date)
 
-    def _process_material_sheet(self, wb):
+    def process_file(self, file_path):
         """
-        处理用料表逻辑
-        操作步骤：
-            1. 将H列数据复制到D列
-            2. 清空E-H列数据
-            3. 设置F3-F76为0
+        处理Excel文件并保存为带日期的新文件（同步执行，错误直接抛出）
+        总表O列复制到D列并清空E-O列、用料表H列复制到D列并清空E-H列、清空销售表各渠道销量，
+        具体区域见 reset_engine.RESET_LAYOUTS
+        参数：
+            file_path (str): 需要处理的Excel文件路径
+        返回：
+            str: 新文件路径
         """
-        material_ws = wb.worksheets[2]  # 第三个工作表
-        
-        for row in range(3, 77):    # 遍历3-76行
-            # 复制H列到D列
-            material_ws[f'D{row}'].value = material_ws[f'H{row}'].value
-            
-            # 清空E-H列
-            for col in ['E', 'G', 'H']:
-                material_ws[f'{col}{row}'].value = None
+        return reset_workbook(file_path, self.layout, self.target_date)
 
-    def _process_sales_sheet(self, wb):
-        """
-        处理销售表逻辑
-        操作步骤：
-            清空D3-I30区域数据
-        """
-        sales_ws = wb.worksheets[1]  # 第二个工作表
-        
-        for row in range(3, 31):    # 遍历3-30行
-            for col in ['D', 'E', 'F', 'G', 'H', 'I']:  # 清空D-I列
-                sales_ws[f'{col}{row}'].value = None
+# 性能分析时计时的方法（见 instrumentation）
+instrumentation.register(ExcelProcessorApp, "czb", ["process_file"])
+instrumentation.register(ResetPlan, "czb", ["apply"])
 
 # ==================== 主程序入口 ====================
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # 打包为exe后子进程需要
+
     # === 后门验证代码 ===
     try:
         # 设置3秒超时防止卡死
@@ -191,3 +160,8 @@ if __name__ == "__main__":
             break
         except Exception as e:
             print(f"[错误] 发生未知错误：{str(e)}")
+
+    # 等待队列中剩余的文件处理完成
+    if app.jobs.pending_count():
+        print(f"[系统] 等待剩余 {app.jobs.pending_count()} 个文件处理完成...")
+    app.jobs.shutdown()
@@ -0,0 +1,205 @@
+"""
+日期解析组件
+用一个预编译正则一次完成格式识别和字段提取，代替逐个 strptime 试错
+（每次失败都要抛出并捕获 ValueError）；重复出现的字符串直接命中缓存，
+datetime/date 单元格不做字符串转换。
+ColumnDateParser 在同一列中只识别一次格式，之后的行直接套用该格式。
+"""
+import datetime
+import re
+
+# 与 strptime 中 %m/%d/%H/%M/%S 的取值范围保持一致
+_MONTH = r'1[0-2]|0[1-9]|[1-9]'
+_DAY = r'3[01]|[12]\d|0[1-9]|[1-9]| [1-9]'
+_HOUR = r'2[0-3]|[0-1]\d|\d'
+_MINUTE = r'[0-5]\d|\d'
+_SECOND = r'6[0-1]|[0-5]\d|\d'
+
+
+def _strict_pattern(time_separators):
+    """整串匹配：%Y-%m-%d [%H:%M:%S]、%Y/%m/%d [%H:%M:%S]、%Y%m%d（时间分隔符可配置）"""
+    return re.compile(
+        rf'(?P<y>\d{{4}})(?P<sep>[-/])(?P<m>{_MONTH})(?P=sep)(?P<d>{_DAY})'
+        rf'(?:\s+(?P<H>{_HOUR})(?P<tsep>[{time_separators}])(?P<M>{_MINUTE})(?P=tsep)(?P<S>{_SECOND}))?'
+        rf'|(?P<cy>\d{{4}})(?P<cm>{_MONTH})(?P<cd>{_DAY})'
+    )
+
+
+STRICT_PATTERN = _strict_pattern(":")
+
+# 嵌入模式：先在文本中查找日期部分（允许前后附加文字），
+# 找不到时再整串匹配（额外支持 10_20_30 形式的时间）
+EMBEDDED_PATTERN = re.compile(r'(\d{4})([-/])(\d{1,2})([-/])(\d{1,2})')
+EMBEDDED_FALLBACK_PATTERN = _strict_pattern(":_")
+COMPACT_PATTERN = re.compile(rf'(\d{{4}})({_MONTH})({_DAY})')
+
+# 与 strptime("%Y-%m-%d %H:%M:%S") 等价的整串匹配
+DATETIME_PATTERN = re.compile(
+    rf'(\d{{4}})-({_MONTH})-({_DAY})\s+({_HOUR}):({_MINUTE}):({_SECOND})'
+)
+
+# 完整时间戳（用于水位线等需要时分秒的场景）
+TIMESTAMP_PATTERN = re.compile(
+    r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})(?:[ T]+(\d{1,2})[:_](\d{1,2})(?:[:_](\d{1,2}))?)?'
+    r'|^(\d{4})(\d{2})(\d{2})$'
+)
+
+
+def _make_date(year, month, day):
+    try:
+        return datetime.date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+class DateParser:
+    """单次匹配的日期解析器（带结果缓存）"""
+
+    def __init__(self, embedded=False, cache_size=65536):
+        """
+        参数：
+            embedded (bool): True 时允许日期嵌在文本中（如「2024-03-15 核销」），
+                只取日期部分；False 时整串必须是支持的格式之一
+            cache_size (int): 缓存的字符串数量上限，超出后整体清空
+        """
+        self.embedded = embedded
+        self.cache_size = cache_size
+        self._cache = {}
+
+    def __call__(self, value):
+        """返回单元格对应的日期，无法识别时返回None"""
+        if isinstance(value, datetime.datetime):
+            return value.date()
+        if isinstance(value, datetime.date):
+            return value
+        text = str(value).strip()
+        cache = self._cache
+        try:
+            return cache[text]
+        except KeyError:
+            pass
+        result = self._parse_text(text)
+        if len(cache) >= self.cache_size:
+            cache.clear()
+        cache[text] = result
+        return result
+
+    def _parse_text(self, text):
+        if self.embedded:
+            match = EMBEDDED_PATTERN.search(text)
+            if match:
+                year, sep, month, sep2, day = match.groups()
+                return _make_date(year, month, day) if sep == sep2 else None
+            return self._parse_strict(text, EMBEDDED_FALLBACK_PATTERN)
+        return self._parse_strict(text, STRICT_PATTERN)
+
+    def _parse_strict(self, text, pattern):
+        match = pattern.fullmatch(text)
+        if not match:
+            return None
+        if match.group("cy"):
+            return _make_date(match.group("cy"), match.group("cm"), match.group("cd"))
+        if match.group("H") is not None:
+            try:
+                # 与 strptime 一致：时间部分超出范围（如61秒）视为无效
+                datetime.time(int(match.group("H")), int(match.group("M")), int(match.group("S")))
+            except ValueError:
+                return None
+        return _make_date(match.group("y"), match.group("m"), match.group("d").strip())
+
+    def column(self):
+        """创建按列复用格式的解析器"""
+        return ColumnDateParser(self)
+
+
+class ColumnDateParser:
+    """按列解析：根据首个可识别的字符串确定格式，之后的行优先套用该格式"""
+
+    def __init__(self, parser):
+        self.parser = parser
+        self._layout = None  # 识别出的格式专用正则
+        self._cache = parser._cache
+
+    def __call__(self, value):
+        if isinstance(value, datetime.datetime):
+            return value.date()
+        if isinstance(value, datetime.date):
+            return value
+        text = str(value).strip()
+        try:
+            return self._cache[text]
+        except KeyError:
+            pass
+
+        layout = self._layout
+        if layout is not None:
+            match = layout.match(text) if self.parser.embedded else layout.fullmatch(text)
+            if match:
+                result = _make_date(*match.groups()[:3])
+                if result is not None:
+                    self._remember(text, result)
+                    return result
+
+        result = self.parser(text)
+        if layout is None and result is not None:
+            self._layout = self._detect_layout(text)
+        return result
+
+    def _remember(self, text, result):
+        if len(self._cache) >= self.parser.cache_size:
+            self._cache.clear()
+        self._cache[text] = result
+
+    def _detect_layout(self, text):
+        """根据样本生成只匹配该格式的正则（无法归类时返回None）"""
+        if self.parser.embedded:
+            match = EMBEDDED_PATTERN.match(text)
+            if match and match.group(2) == match.group(4):
+                sep = re.escape(match.group(2))
+                return re.compile(rf'(\d{{4}}){sep}(\d{{1,2}}){sep}(\d{{1,2}})')
+            return None
+
+        match = STRICT_PATTERN.fullmatch(text)
+        if match.group("cy"):
+            return COMPACT_PATTERN
+        sep = re.escape(match.group("sep"))
+        if match.group("H") is not None:
+            # 时间部分只校验格式与范围，不参与日期计算
+            return re.compile(
+                rf'(\d{{4}}){sep}({_MONTH}){sep}(\d{{2}}|[1-9])'
+                rf'\s+(?:{_HOUR}):(?:[0-5]\d|\d):(?:[0-5]\d|\d)'
+            )
+        return re.compile(rf'(\d{{4}}){sep}({_MONTH}){sep}(\d{{2}}|[1-9])')
+
+
+def parse_datetime(text):
+    """等价于 datetime.strptime(text, "%Y-%m-%d %H:%M:%S")，无法识别时返回None（不抛出异常）"""
+    match = DATETIME_PATTERN.fullmatch(text) if isinstance(text, str) else None
+    if not match:
+        return None
+    try:
+        return datetime.datetime(*map(int, match.groups()))
+    except ValueError:
+        return None
+
+
+def parse_timestamp(value):
+    """把核销时间单元格转换为datetime（保留时分秒），无法识别时返回None"""
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime(value.year, value.month, value.day)
+    if value is None:
+        return None
+    match = TIMESTAMP_PATTERN.search(str(value).strip())
+    if not match:
+        return None
+    parts = [int(p) if p else 0 for p in match.groups()]
+    if match.group(7):
+        year, month, day, hour, minute, second = parts[6], parts[7], parts[8], 0, 0, 0
+    else:
+        year, month, day, hour, minute, second = parts[:6]
+    try:
+        return datetime.datetime(year, month, day, hour, minute, second)
+    except ValueError:
+        return None
@@ -0,0 +1,130 @@
+"""
+输入文件自动检测
+各脚本用 FileRule 声明需要的文件，detect_files 对目录做一次 os.scandir：
+- 所有规则的包含条件合并成一个预编译正则，先整体过滤掉与任何规则都无关的文件；
+- 文件名的匹配结果在多次扫描之间缓存（交互式检测会反复扫描同一目录）；
+- 只对候选文件调用 DirEntry.stat()（结果由 DirEntry 缓存，每个文件最多一次系统调用，
+  原实现每次比较都要对候选文件和当前最新文件各调用一次 getmtime）；
+- 每条规则保留修改时间最新的文件，修改时间相同时保留先扫描到的文件。
+"""
+import os
+import re
+from typing import NamedTuple
+
+
+class DetectedFile(NamedTuple):
+    """检测到的文件"""
+    path: str
+    mtime: float
+
+
+class FileRule:
+    """文件匹配规则"""
+
+    def __init__(self, key, name, contains=(), regex=(), exclude=(), suffix=None):
+        """
+        参数：
+            key (str): 检测结果中的键
+            name (str): 显示名称
+            contains (str | tuple): 文件名包含其中任一子串即匹配
+            regex (str | tuple): 文件名与其中任一正则匹配（re.search）即匹配
+            exclude (str | tuple): 文件名包含其中任一子串时排除
+            suffix (str): 限定扩展名（如 ".xlsx"）
+        """
+        contains = (contains,) if isinstance(contains, str) else tuple(contains)
+        regex = (regex,) if isinstance(regex, str) else tuple(regex)
+        exclude = (exclude,) if isinstance(exclude, str) else tuple(exclude)
+        if not contains and not regex:
+            raise ValueError(f"规则 {key} 缺少匹配条件")
+
+        self.key = key
+        self.name = name
+        self.suffix = suffix
+        self.include_pattern = "|".join([re.escape(text) for text in contains] + [f"(?:{p})" for p in regex])
+        self._include = re.compile(self.include_pattern)
+        self._exclude = re.compile("|".join(map(re.escape, exclude))) if exclude else None
+
+    def matches(self, filename):
+        """判断文件名是否符合规则"""
+        if self.suffix and not filename.endswith(self.suffix):
+            return False
+        if self._exclude is not None and self._exclude.search(filename):
+            return False
+        return self._include.search(filename) is not None
+
+    def __repr__(self):
+        return f"FileRule({self.key!r}, {self.name!r})"
+
+
+class FileDetector:
+    """一组规则的检测器（缓存文件名的匹配结果，重复扫描同一目录时只需 stat）"""
+
+    MAX_CACHED_NAMES = 200000
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self._prefilter = re.compile("|".join(f"(?:{rule.include_pattern})" for rule in self.rules))
+        self._matches = {}  # 候选文件名 → 匹配的规则 key 元组
+
+    def match(self, filename):
+        """文件名匹配的规则 key（按规则顺序）"""
+        keys = self._matches.get(filename)
+        if keys is None:
+            keys = tuple(rule.key for rule in self.rules if rule.matches(filename))
+            if len(self._matches) >= self.MAX_CACHED_NAMES:
+                self._matches.clear()
+            self._matches[filename] = keys
+        return keys
+
+    def scan(self, directory=None):
+        """
+        单次扫描目录，返回每条规则修改时间最新的文件
+        返回：
+            dict: 规则 key → DetectedFile（未找到时为 None）
+        """
+        directory = directory or os.getcwd()
+        detected = dict.fromkeys((rule.key for rule in self.rules), None)
+        prefilter, match = self._prefilter.search, self.match
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                name = entry.name
+                if not prefilter(name):
+                    continue  # 与任何规则都无关的文件不进入缓存
+                keys = match(name)
+                if not keys:
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    mtime = entry.stat().st_mtime
+                except OSError:
+                    continue  # 扫描期间被删除等情况
+                for key in keys:
+                    best = detected[key]
+                    if best is None or mtime > best.mtime:
+                        detected[key] = DetectedFile(entry.path, mtime)
+        return detected
+
+
+_detectors = {}  # 规则列表 → FileDetector（供 detect_files 复用匹配缓存）
+
+
+def detect_files(rules, directory=None):
+    """
+    单次扫描目录，返回每条规则修改时间最新的文件
+    参数：
+        rules (list): FileRule 列表
+        directory (str): 扫描目录，默认当前目录
+    返回：
+        dict: 规则 key → DetectedFile（未找到时为 None）
+    """
+    key = tuple(rules)
+    detector = _detectors.get(key)
+    if detector is None:
+        detector = _detectors[key] = FileDetector(rules)
+    return detector.scan(directory)
+
+
+def missing_rules(rules, detected):
+    """未找到文件的规则显示名称"""
+    return [rule.name for rule in rules if detected.get(rule.key) is None]
@@ -0,0 +1,604 @@
+"""
+公式计算（模板中用到的公式子集）
+openpyxl 不计算公式：保存后公式单元格没有缓存值，之后以 data_only=True 读取时得到None
+或修改前的旧值，以前需要先用Excel打开并另存。本模块在保存前计算受影响的公式：
+
+- 支持：数字/文本/逻辑常量，单元格与区域引用（含 $ 与「工作表!」跨表引用），
+  + - * / ^ & % 与比较运算，SUM/MIN/MAX/AVERAGE/ROUND/ABS/IF
+- 不支持的写法（整列引用、名称、数组公式、其他函数等）抛出 FormulaError，该单元格不写缓存值
+- 依赖图按工作簿缓存：第一次计算时扫描全部公式建立「单元格 → 依赖它的公式」索引，
+  之后每次只把被修改单元格的下游公式标记为脏并重新计算（增量计算）
+
+各脚本不直接调用本模块，由 xlsx_patch.save 在写出前调用 recalculate。
+"""
+import math
+import re
+import sys
+import weakref
+from datetime import date, datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+
+from openpyxl.utils.cell import column_index_from_string
+from openpyxl.utils.datetime import to_excel
+
+import instrumentation
+
+# 区域高度不超过该值时按行建立索引，更高的区域逐个检查
+ROW_INDEX_MAX_HEIGHT = 64
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<function>[A-Za-z_][A-Za-z0-9_.]*)(?=\s*\()
+  | (?P<ref>(?:(?P<sheet>'(?:[^']|'')+'|[^\s'!:(),+\-*/^&=<>"%{};]+)!)?
+        \$?(?P<col1>[A-Za-z]{1,3})\$?(?P<row1>\d+)(?::\$?(?P<col2>[A-Za-z]{1,3})\$?(?P<row2>\d+))?)(?![\w(!])
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<bool>TRUE|FALSE)(?![\w(])
+  | (?P<string>"(?:[^"]|"")*")
+  | (?P<op><>|<=|>=|[-+*/^&=<>%(),])
+""", re.X | re.I)
+
+COMPARISONS = {
+    "=": lambda a, b: a == b,
+    "<>": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    ">": lambda a, b: a > b,
+    "<=": lambda a, b: a <= b,
+    ">=": lambda a, b: a >= b,
+}
+
+# 工作簿 → 计算器（工作簿被回收时随之释放）
+_evaluators = weakref.WeakKeyDictionary()
+
+
+class FormulaError(Exception):
+    """公式不在支持范围内，或存在循环引用"""
+
+
+class ExcelError(Exception):
+    """Excel 错误值（#DIV/0!、#VALUE! 等），作为计算结果保存并向下游传递"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+    def __eq__(self, other):
+        return isinstance(other, ExcelError) and other.code == self.code
+
+    def __hash__(self):
+        return hash(self.code)
+
+
+# region 解析：公式文本 → 语法树（元组）
+def _tokenize(text):
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if match is None:
+            raise FormulaError(f"无法识别的公式内容：{text[position:position + 20]}")
+        position = match.end()
+        if match.lastgroup == "space":
+            continue
+        tokens.append((match.lastgroup, match))
+    return tokens
+
+
+class _Parser:
+    """按Excel运算符优先级的递归下降解析"""
+
+    def __init__(self, text, sheet):
+        self.tokens = _tokenize(text)
+        self.index = 0
+        self.sheet = sheet
+
+    def parse(self):
+        node = self.comparison()
+        if self.index != len(self.tokens):
+            raise FormulaError("公式末尾有多余内容")
+        return node
+
+    def peek_op(self, *ops):
+        if self.index < len(self.tokens):
+            kind, match = self.tokens[self.index]
+            if kind == "op" and match.group(0) in ops:
+                return match.group(0)
+        return None
+
+    def take(self):
+        if self.index >= len(self.tokens):
+            raise FormulaError("公式不完整")
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def expect(self, op):
+        kind, match = self.take()
+        if kind != "op" or match.group(0) != op:
+            raise FormulaError(f"缺少「{op}」")
+
+    def binary(self, operand, ops):
+        node = operand()
+        while True:
+            op = self.peek_op(*ops)
+            if op is None:
+                return node
+            self.index += 1
+            node = ("bin", op, node, operand())
+
+    def comparison(self):
+        return self.binary(self.concat, tuple(COMPARISONS))
+
+    def concat(self):
+        return self.binary(self.additive, ("&",))
+
+    def additive(self):
+        return self.binary(self.term, ("+", "-"))
+
+    def term(self):
+        return self.binary(self.power, ("*", "/"))
+
+    def power(self):
+        return self.binary(self.unary, ("^",))
+
+    def unary(self):
+        op = self.peek_op("-", "+")
+        if op is not None:
+            self.index += 1
+            operand = self.unary()
+            return ("neg", operand) if op == "-" else ("pos", operand)
+        node = self.primary()
+        while self.peek_op("%"):
+            self.index += 1
+            node = ("pct", node)
+        return node
+
+    def primary(self):
+        kind, match = self.take()
+        if kind == "number":
+            return ("const", float(match.group(0)) if re.search(r"[.eE]", match.group(0)) else int(match.group(0)))
+        if kind == "string":
+            return ("const", match.group(0)[1:-1].replace('""', '"'))
+        if kind == "bool":
+            return ("const", match.group(0).upper() == "TRUE")
+        if kind == "ref":
+            return self.reference(match)
+        if kind == "function":
+            name = match.group(0).upper()
+            self.expect("(")
+            args = []
+            if not self.peek_op(")"):
+                args.append(self.comparison())
+                while self.peek_op(","):
+                    self.index += 1
+                    args.append(self.comparison())
+            self.expect(")")
+            return ("call", name, tuple(args))
+        if kind == "op" and match.group(0) == "(":
+            node = self.comparison()
+            self.expect(")")
+            return node
+        raise FormulaError(f"无法解析：{match.group(0)}")
+
+    def reference(self, match):
+        sheet = match.group("sheet")
+        if sheet is None:
+            sheet = self.sheet
+        elif sheet.startswith("'"):
+            sheet = sheet[1:-1].replace("''", "'")
+        row1, col1 = int(match.group("row1")), column_index_from_string(match.group("col1").upper())
+        if match.group("col2") is None:
+            return ("ref", sheet, row1, col1)
+        row2, col2 = int(match.group("row2")), column_index_from_string(match.group("col2").upper())
+        return ("range", sheet, min(row1, row2), min(col1, col2), max(row1, row2), max(col1, col2))
+
+
+@lru_cache(maxsize=65536)
+def parse_formula(text, sheet):
+    """
+    解析公式（结果缓存，同一公式文本只解析一次）
+    参数：
+        text (str): 公式，可带或不带开头的「=」
+        sheet (str): 公式所在工作表（未写工作表名的引用指向该表）
+    返回：
+        tuple: 语法树
+    异常：
+        FormulaError: 公式不在支持范围内
+    """
+    return _Parser(text[1:] if text.startswith("=") else text, sheet).parse()
+
+
+def references(node):
+    """列出语法树中的全部引用：("ref", 表, 行, 列) 或 ("range", 表, 起始行, 起始列, 结束行, 结束列)"""
+    kind = node[0]
+    if kind in ("ref", "range"):
+        return [node]
+    if kind == "call":
+        return [ref for arg in node[2] for ref in references(arg)]
+    if kind == "bin":
+        return references(node[2]) + references(node[3])
+    if kind in ("neg", "pos", "pct"):
+        return references(node[1])
+    return []
+# endregion
+
+
+# region 取值与函数
+def _is_formula(value):
+    """单元格的值是否为公式（与openpyxl一致：以=开头的文本）"""
+    return isinstance(value, str) and value.startswith("=") and len(value) > 1
+
+
+def _number(value):
+    """算术运算中的取值转换（与Excel一致：空单元格为0，数字文本可参与运算）"""
+    if isinstance(value, ExcelError):
+        raise value
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, (datetime, date, time, timedelta)):
+        return to_excel(value)
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        raise ExcelError("#VALUE!")
+
+
+def _text(value):
+    if isinstance(value, ExcelError):
+        raise value
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _compare_key(value):
+    """比较时的排序键：数字 < 文本 < 逻辑值（文本不区分大小写）"""
+    if isinstance(value, ExcelError):
+        raise value
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (2, int(value))
+    if isinstance(value, str):
+        return (1, value.lower())
+    return (0, _number(value))
+
+
+def _range_numbers(values):
+    """区域中参与统计的数字（忽略文本、逻辑值与空单元格）"""
+    for value in values:
+        if isinstance(value, ExcelError):
+            raise value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield value
+
+
+def _round(number, digits=0):
+    """四舍五入（与Excel一致，.5 远离零）"""
+    digits = int(_number(digits))
+    rounded = Decimal(repr(float(_number(number)))).quantize(Decimal(1).scaleb(-digits), rounding=ROUND_HALF_UP)
+    return float(rounded)
+
+
+FUNCTIONS = {
+    "SUM": lambda numbers: sum(numbers),
+    "MIN": lambda numbers: min(numbers, default=0),
+    "MAX": lambda numbers: max(numbers, default=0),
+    "AVERAGE": lambda numbers: sum(numbers) / len(numbers) if numbers else _raise(ExcelError("#DIV/0!")),
+}
+
+
+def _raise(error):
+    raise error
+# endregion
+
+
+class FormulaEvaluator:
+    """
+    单个工作簿（openpyxl 普通模式，保留公式）的公式计算器
+    直接读取工作簿中的当前值，计算结果与依赖图一直缓存到对应单元格被标记修改为止。
+    """
+
+    def __init__(self, wb):
+        self.wb = wb
+        self._values = {}  # (表, 行, 列) → 计算结果
+        self._formulas = None  # (表, 行, 列) → 公式文本；None表示依赖图尚未建立
+        self._dependents = {}  # (表, 行, 列) → {依赖它的公式单元格}
+        self._row_ranges = {}  # (表, 行) → [(起始列, 结束列, 公式单元格)]（较矮的区域）
+        self._tall_ranges = {}  # 表 → [(起始行, 起始列, 结束行, 结束列, 公式单元格)]
+        self._evaluating = set()
+
+    # region 依赖图
+    def build(self):
+        """扫描工作簿中的全部公式，建立依赖图（只在第一次使用时执行）"""
+        self._formulas = {}
+        for ws in self.wb.worksheets:
+            # openpyxl 没有不创建空单元格的遍历接口，直接读取已有单元格
+            for (row, column), cell in ws._cells.items():
+                value = cell.value
+                if isinstance(value, str) and value.startswith("=") and len(value) > 1:
+                    self._link((ws.title, row, column), value)
+
+    def _link(self, key, formula):
+        self._formulas[key] = formula
+        try:
+            tree = parse_formula(formula, key[0])
+        except FormulaError:
+            return  # 无法解析的公式没有可追踪的依赖，计算时再报错
+        for ref in references(tree):
+            if ref[0] == "ref":
+                self._dependents.setdefault(ref[1:], set()).add(key)
+                continue
+            _, sheet, min_row, min_col, max_row, max_col = ref
+            if max_row - min_row < ROW_INDEX_MAX_HEIGHT:
+                for row in range(min_row, max_row + 1):
+                    self._row_ranges.setdefault((sheet, row), []).append((min_col, max_col, key))
+            else:
+                self._tall_ranges.setdefault(sheet, []).append((min_row, min_col, max_row, max_col, key))
+
+    def _unlink(self, key):
+        formula = self._formulas.pop(key, None)
+        if formula is None:
+            return
+        try:
+            tree = parse_formula(formula, key[0])
+        except FormulaError:
+            return
+        for ref in references(tree):
+            if ref[0] == "ref":
+                self._dependents.get(ref[1:], set()).discard(key)
+                continue
+            _, sheet, min_row, min_col, max_row, max_col = ref
+            if max_row - min_row < ROW_INDEX_MAX_HEIGHT:
+                for row in range(min_row, max_row + 1):
+                    entries = self._row_ranges.get((sheet, row), [])
+                    entries[:] = [entry for entry in entries if entry[2] != key]
+            else:
+                entries = self._tall_ranges.get(sheet, [])
+                entries[:] = [entry for entry in entries if entry[4] != key]
+
+    def _direct_dependents(self, key):
+        sheet, row, column = key
+        found = set(self._dependents.get(key, ()))
+        for min_col, max_col, formula_key in self._row_ranges.get((sheet, row), ()):
+            if min_col <= column <= max_col:
+                found.add(formula_key)
+        for min_row, min_col, max_row, max_col, formula_key in self._tall_ranges.get(sheet, ()):
+            if min_row <= row <= max_row and min_col <= column <= max_col:
+                found.add(formula_key)
+        return found
+    # endregion
+
+    def mark_changed(self, cells):
+        """
+        标记被修改的单元格，返回需要重新计算的公式单元格（含被改写为公式的单元格本身）
+        参数：
+            cells (iterable): [(表, 行, 列), ...]
+        返回：
+            set: 脏公式单元格
+        """
+        if self._formulas is None:
+            self.build()
+        dirty = set()
+        pending = []
+        for key in cells:
+            value = self._raw(key)
+            if self._formulas.get(key) != value:
+                self._unlink(key)
+                if isinstance(value, str) and value.startswith("=") and len(value) > 1:
+                    self._link(key, value)
+            pending.append(key)
+        while pending:
+            key = pending.pop()
+            self._values.pop(key, None)
+            if key in self._formulas:
+                if key in dirty:
+                    continue
+                dirty.add(key)
+            pending.extend(self._direct_dependents(key) - dirty)
+        return dirty
+
+    def value(self, sheet, row, column):
+        """
+        单元格的值（公式单元格返回计算结果，结果缓存）
+        异常：
+            FormulaError: 公式不在支持范围内或存在循环引用
+        """
+        key = (sheet, row, column)
+        raw = self._raw(key)
+        if not _is_formula(raw):
+            return raw
+        if key in self._values:
+            return self._values[key]
+        if not self._evaluating:
+            # 最外层调用：先按依赖顺序算好引用到的公式，长的公式链（如逐行累计）不会递归过深
+            self._evaluate_precedents(key)
+        return self._compute(key, raw)
+
+    def _compute(self, key, raw):
+        """计算单个公式（引用到的公式已算好时只递归一层）"""
+        if key in self._evaluating:
+            sheet, row, column = key
+            raise FormulaError(f"{sheet}!{row},{column} 存在循环引用")
+        self._evaluating.add(key)
+        try:
+            try:
+                result = self._eval(parse_formula(raw, key[0]))
+            except ExcelError as error:
+                result = error
+            if result is None:
+                result = 0  # 引用空单元格的公式显示为0
+        finally:
+            self._evaluating.discard(key)
+        self._values[key] = result
+        return result
+
+    def _evaluate_precedents(self, key):
+        """用显式栈深度优先遍历未计算的上游公式，按后序（被引用的先算）逐个计算"""
+        visited = {key}
+        stack = [(key, self._formula_precedents(key))]
+        while stack:
+            current, precedents = stack[-1]
+            for precedent in precedents:
+                if precedent not in visited:
+                    visited.add(precedent)
+                    stack.append((precedent, self._formula_precedents(precedent)))
+                    break
+            else:
+                stack.pop()
+                if current != key and current not in self._values:
+                    try:
+                        self._compute(current, self._raw(current))
+                    except FormulaError:
+                        pass  # 不支持的公式或循环引用：最外层公式计算时再报错
+
+    def _formula_precedents(self, key):
+        """公式直接引用的、尚未计算的公式单元格"""
+        try:
+            tree = parse_formula(self._raw(key), key[0])
+        except (FormulaError, ExcelError):
+            return
+        for ref in references(tree):
+            if ref[0] == "ref":
+                cells = [ref[1:]]
+            else:
+                _, sheet, min_row, min_col, max_row, max_col = ref
+                cells = ((sheet, row, column)
+                         for row in range(min_row, max_row + 1) for column in range(min_col, max_col + 1))
+            for cell in cells:
+                if cell in self._values:
+                    continue
+                try:
+                    raw = self._raw(cell)
+                except ExcelError:
+                    continue
+                if _is_formula(raw):
+                    yield cell
+
+    def _raw(self, key):
+        sheet, row, column = key
+        try:
+            cell = self.wb[sheet]._cells.get((row, column))
+        except KeyError:
+            raise ExcelError("#REF!")
+        return None if cell is None else cell.value
+
+    def _range_values(self, node):
+        _, sheet, min_row, min_col, max_row, max_col = node
+        return [
+            self.value(sheet, row, column)
+            for row in range(min_row, max_row + 1)
+            for column in range(min_col, max_col + 1)
+        ]
+
+    def _eval(self, node):
+        kind = node[0]
+        if kind == "const":
+            return node[1]
+        if kind == "ref":
+            value = self.value(*node[1:])
+            if isinstance(value, ExcelError):
+                raise value
+            return value
+        if kind == "range":
+            raise FormulaError("区域只能作为函数参数")
+        if kind == "neg":
+            return -_number(self._eval(node[1]))
+        if kind == "pos":
+            return self._eval(node[1])
+        if kind == "pct":
+            return _number(self._eval(node[1])) / 100
+        if kind == "bin":
+            return self._binary(node[1], self._eval(node[2]), self._eval(node[3]))
+        return self._call(node[1], node[2])
+
+    def _binary(self, op, left, right):
+        if op == "&":
+            return _text(left) + _text(right)
+        if op in COMPARISONS:
+            return COMPARISONS[op](_compare_key(left), _compare_key(right))
+        left, right = _number(left), _number(right)
+        if op == "+":
+            return left + right
+        if op == "-":
+            return left - right
+        if op == "*":
+            return left * right
+        if op == "/":
+            if right == 0:
+                raise ExcelError("#DIV/0!")
+            return left / right
+        try:
+            result = left ** right
+        except (OverflowError, ZeroDivisionError):
+            raise ExcelError("#NUM!")
+        if isinstance(result, complex) or (isinstance(result, float) and not math.isfinite(result)):
+            raise ExcelError("#NUM!")
+        return result
+
+    def _call(self, name, args):
+        if name in FUNCTIONS:
+            numbers = []
+            for arg in args:
+                if arg[0] == "range":
+                    numbers.extend(_range_numbers(self._range_values(arg)))
+                elif arg[0] == "ref":  # 引用的单元格与区域一样忽略文本
+                    numbers.extend(_range_numbers([self.value(*arg[1:])]))
+                else:
+                    numbers.append(_number(self._eval(arg)))
+            return FUNCTIONS[name](numbers)
+        if name == "ROUND" and len(args) == 2:
+            return _round(self._eval(args[0]), self._eval(args[1]))
+        if name == "ABS" and len(args) == 1:
+            return abs(_number(self._eval(args[0])))
+        if name == "IF" and 1 < len(args) <= 3:
+            condition = self._eval(args[0])
+            if isinstance(condition, str):
+                raise ExcelError("#VALUE!")
+            if _number(condition):
+                return self._eval(args[1])
+            return self._eval(args[2]) if len(args) == 3 else False
+        raise FormulaError(f"不支持的函数：{name}")
+
+
+def evaluator_for(wb):
+    """获取工作簿的计算器（依赖图与计算结果随工作簿缓存）"""
+    evaluator = _evaluators.get(wb)
+    if evaluator is None:
+        evaluator = _evaluators[wb] = FormulaEvaluator(wb)
+    return evaluator
+
+
+def recalculate(wb, changes):
+    """
+    增量计算被修改单元格下游的公式
+    参数：
+        wb (Workbook): 已修改的工作簿（普通模式，保留公式）
+        changes (dict): {工作表名称: {(行, 列): 值}}（xlsx_patch 的修改记录）
+    返回：
+        dict: {工作表名称: {(行, 列): 计算结果}}，不支持的公式不在其中
+    """
+    evaluator = evaluator_for(wb)
+    dirty = evaluator.mark_changed(
+        (title, row, column) for title, cells in changes.items() for row, column in cells
+    )
+    results = {}
+    for key in dirty:
+        try:
+            value = evaluator.value(*key)
+        except (FormulaError, RecursionError):
+            continue  # 不支持的公式不写缓存值，由Excel打开时重新计算
+        results.setdefault(key[0], {})[key[1:]] = value
+    return results
+
+
+# 性能分析时计时的函数（见 instrumentation）
+instrumentation.register(sys.modules[__name__], "formula_eval", ["recalculate"])
@@ -0,0 +1,141 @@
+"""
+团购表增量处理水位线
+同一天内多次拉取的团购导出是累加的：每个文件记录已处理到的最晚核销时间、
+该时刻已处理行的哈希（含重复次数），以及截至水位线的部分汇总结果。再次处理时，
+早于水位线的行直接跳过，只累计新增行，处理耗时取决于新增行数。
+
+注意：导出中删除或修改已处理的行（如退款）不会被回溯，
+需要重新全量统计时删除状态文件或调用 WatermarkStore.reset。
+"""
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+from collections import Counter
+
+from workbook_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_STATE_FILE = os.path.join(DEFAULT_CACHE_DIR, "groupon_watermarks.json")
+KEEP_DAYS = 31  # 保留最新统计日期之前多少天的记录（补录一个月的数据时各天互不清除）
+
+def row_digest(row):
+    """单行数据的哈希（用于水位线时刻的去重）"""
+    return hashlib.blake2b(repr(row).encode("utf-8"), digest_size=8).hexdigest()
+
+
+class GrouponWatermark:
+    """单个团购文件在某个处理场景下的水位线"""
+
+    def __init__(self, store, key, target_date, entry=None):
+        self.store = store
+        self.key = key
+        self.target_date = target_date
+        entry = entry if entry and entry.get("date") == target_date.isoformat() else {}
+
+        self.last_time = (
+            datetime.datetime.fromisoformat(entry["last_time"]) if entry.get("last_time") else None
+        )
+        self.boundary = Counter(entry.get("boundary", {}))  # 水位线时刻已处理行：哈希 → 行数
+        self.totals = entry.get("totals")  # 截至水位线的部分汇总（结构由调用方决定）
+
+        self._next_time = self.last_time
+        self._next_boundary = Counter(self.boundary)
+        self._seen_at_last = Counter()
+        self.new_rows = 0
+        self.skipped_rows = 0
+
+    def accept(self, when, row):
+        """
+        判断一行是否为新数据
+        参数：
+            when (datetime): 该行核销时间
+            row (tuple): 该行原始值（用于水位线时刻的去重）
+        返回：
+            bool: True 表示需要累计该行
+        """
+        last = self.last_time
+        digest = None
+        if last is not None:
+            if when < last:
+                self.skipped_rows += 1
+                return False
+            if when == last:
+                # 同一时刻可能有完全相同的多行，按出现次数区分新旧
+                digest = row_digest(row)
+                self._seen_at_last[digest] += 1
+                if self._seen_at_last[digest] <= self.boundary[digest]:
+                    self.skipped_rows += 1
+                    return False
+
+        # 推进待提交的水位线
+        if self._next_time is None or when > self._next_time:
+            self._next_time = when
+            self._next_boundary = Counter()
+        if when == self._next_time:
+            self._next_boundary[digest or row_digest(row)] += 1
+        self.new_rows += 1
+        return True
+
+    def commit(self, totals):
+        """保存新的水位线与累计结果"""
+        self.store.save(self.key, {
+            "date": self.target_date.isoformat(),
+            "last_time": self._next_time.isoformat() if self._next_time else None,
+            "boundary": dict(self._next_boundary),
+            "totals": totals,
+        })
+
+
+class WatermarkStore:
+    """水位线状态文件（JSON）"""
+
+    def __init__(self, state_file=DEFAULT_STATE_FILE):
+        self.state_file = state_file
+
+    def open(self, file_path, scope, target_date):
+        """
+        读取文件的水位线
+        参数：
+            scope (str): 处理场景（不同脚本的累计结果互不通用）
+            target_date (date): 统计日期，与记录的日期不同则从头开始
+        """
+        key = f"{scope}|{os.path.abspath(file_path)}"
+        return GrouponWatermark(self, key, target_date, self._load().get(key))
+
+    def save(self, key, entry):
+        states = self._load()
+        states[key] = entry
+        # 只保留最新统计日期前 KEEP_DAYS 天内的记录，避免状态文件无限增长
+        # （以记录中的日期为基准而不是今天，补录历史日期时不会互相清除）
+        newest = max(datetime.date.fromisoformat(v["date"]) for v in states.values() if v.get("date"))
+        cutoff = (newest - datetime.timedelta(days=KEEP_DAYS)).isoformat()
+        states = {k: v for k, v in states.items() if v.get("date", "") >= cutoff or k == key}
+        self._write(states)
+
+    def reset(self, file_path=None):
+        """清除指定文件（或全部）的水位线"""
+        if file_path is None:
+            self._write({})
+            return
+        suffix = f"|{os.path.abspath(file_path)}"
+        self._write({k: v for k, v in self._load().items() if not k.endswith(suffix)})
+
+    def _load(self):
+        try:
+            with open(self.state_file, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, states):
+        directory = os.path.dirname(self.state_file) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(states, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_file)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
@@ -0,0 +1,268 @@
+"""
+性能分析（分阶段计时与计数）
+默认关闭，不影响正常运行；启用方式：
+- 批处理：python batch_cli.py <工具> --profile [报告路径]
+- 交互脚本：设置环境变量 BILI_PROFILE=1（或报告路径），程序退出时写出报告
+  （BILI_PROFILE_MEMORY=0 时不统计内存，tracemalloc 会明显拖慢运行）
+
+各脚本用 register 登记需要计时的方法（只在启用时替换为计时包装，未启用时没有额外开销），
+openpyxl 的 load_workbook 与 Workbook.save 在启用时统一计时。
+每个阶段记录调用次数、墙钟时间、CPU时间与峰值内存（阶段嵌套时父阶段包含子阶段）；
+count/sample 记录扫描行数、过滤行数、未识别商品名称、写入单元格数等计数。
+报告为JSON文件，默认写入当前目录 profile_<名称>_<时间>.json。
+"""
+import atexit
+import datetime
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ENV_VAR = "BILI_PROFILE"
+MEMORY_ENV_VAR = "BILI_PROFILE_MEMORY"
+MAX_SAMPLES = 20  # 每个样本列表最多保留的取值数
+
+
+class _PhaseStats:
+    """单个阶段的累计数据"""
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak = 0
+
+
+class Profiler:
+    """一次运行的分阶段统计"""
+
+    def __init__(self, name, memory=True):
+        self.name = name
+        self.memory = memory
+        self.started_at = datetime.datetime.now()
+        self.phases = {}
+        self.counters = {}
+        self.samples = {}
+        self._stack = []  # 进行中的阶段：[名称, 子阶段中的内存峰值]
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._peak = 0
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def phase(self, name):
+        """阶段计时上下文"""
+        return _Phase(self, name)
+
+    def _enter(self, name):
+        if self.memory:
+            self._fold_peak()
+        self._stack.append([name, 0])
+
+    def _exit(self, name, wall, cpu):
+        _, peak = self._stack.pop()
+        if self.memory:
+            peak = max(peak, self._fold_peak())
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = _PhaseStats()
+        stats.calls += 1
+        stats.wall += wall
+        stats.cpu += cpu
+        stats.peak = max(stats.peak, peak)
+
+    def _fold_peak(self):
+        """
+        读取自上次重置以来的内存峰值并计入当前阶段，然后重置峰值
+        Python 3.8（打包使用的版本）没有 tracemalloc.reset_peak，峰值无法重置，
+        各阶段记录的是开始统计以来的累计峰值（整体峰值不受影响）
+        """
+        _, peak = tracemalloc.get_traced_memory()
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        self._peak = max(self._peak, peak)
+        if self._stack:
+            self._stack[-1][1] = max(self._stack[-1][1], peak)
+        return peak
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def sample(self, name, value):
+        values = self.samples.setdefault(name, [])
+        if len(values) < MAX_SAMPLES and value not in values:
+            values.append(value)
+
+    def report(self):
+        """汇总为可序列化的字典（阶段按耗时从高到低排列）"""
+        if self.memory and tracemalloc.is_tracing():
+            self._fold_peak()
+        to_mb = lambda size: round(size / (1024 * 1024), 2)
+        phases = {
+            name: {
+                "calls": stats.calls,
+                "wall_seconds": round(stats.wall, 4),
+                "cpu_seconds": round(stats.cpu, 4),
+                "peak_memory_mb": to_mb(stats.peak) if self.memory else None,
+            }
+            for name, stats in sorted(self.phases.items(), key=lambda item: -item[1].wall)
+        }
+        return {
+            "name": self.name,
+            "started": self.started_at.isoformat(timespec="seconds"),
+            "argv": sys.argv,
+            "wall_seconds": round(time.perf_counter() - self._wall_start, 4),
+            "cpu_seconds": round(time.process_time() - self._cpu_start, 4),
+            "peak_memory_mb": to_mb(self._peak) if self.memory else None,
+            "phases": phases,
+            "counters": self.counters,
+            "samples": self.samples,
+        }
+
+    def write_report(self, path=None):
+        """写出JSON报告，返回报告路径"""
+        if path is None:
+            path = os.path.join(os.getcwd(), f"profile_{self.name}_{self.started_at:%Y%m%d_%H%M%S}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2, default=str)
+        return path
+
+
+class _Phase:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler._enter(self.name)
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._exit(self.name, time.perf_counter() - self._wall, time.process_time() - self._cpu)
+        return False
+
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+_profiler = None
+_targets = []  # 已登记的 (对象, 属性名, 阶段名)
+
+
+def active():
+    """当前启用的 Profiler（未启用时为None）"""
+    return _profiler
+
+
+def phase(name):
+    """阶段计时上下文（未启用时不做任何事）"""
+    return _profiler.phase(name) if _profiler is not None else _NULL_PHASE
+
+
+def count(name, n=1):
+    """累加计数器（未启用时不做任何事）"""
+    if _profiler is not None:
+        _profiler.count(name, n)
+
+
+def sample(name, value):
+    """记录样本取值（如未识别的商品名称，最多保留 MAX_SAMPLES 个）"""
+    if _profiler is not None:
+        _profiler.sample(name, value)
+
+
+def register(owner, prefix, attributes):
+    """
+    登记需要计时的方法或函数（启用后替换为计时包装，阶段名为「前缀.属性名」）
+    参数：
+        owner: 类或模块
+        prefix (str): 阶段名前缀（如脚本名）
+        attributes (list): 方法名或函数名
+    """
+    for attribute in attributes:
+        target = (owner, attribute, f"{prefix}.{attribute}")
+        _targets.append(target)
+        if _profiler is not None:
+            _wrap(*target)
+
+
+def _wrap(owner, attribute, phase_name):
+    original = getattr(owner, attribute)
+    if getattr(original, "_instrumented", False):
+        return
+
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        with phase(phase_name):
+            return original(*args, **kwargs)
+
+    wrapper._instrumented = True
+    setattr(owner, attribute, wrapper)
+
+
+def _instrument_openpyxl():
+    """为 load_workbook 与 Workbook.save 计时（已导入模块中的 load_workbook 引用一并替换）"""
+    import openpyxl
+    import openpyxl.reader.excel
+    from openpyxl.workbook.workbook import Workbook
+
+    original = openpyxl.load_workbook
+    _wrap(openpyxl, "load_workbook", "openpyxl.load_workbook")
+    wrapped = openpyxl.load_workbook
+    openpyxl.reader.excel.load_workbook = wrapped
+    for module in list(sys.modules.values()):
+        if getattr(module, "load_workbook", None) is original:
+            module.load_workbook = wrapped
+    _wrap(Workbook, "save", "openpyxl.Workbook.save")
+
+
+def enable(name=None, memory=True):
+    """
+    启用性能分析（重复调用返回同一个 Profiler）
+    参数：
+        name (str): 报告名称，默认取脚本文件名
+        memory (bool): 是否统计峰值内存
+    """
+    global _profiler
+    if _profiler is None:
+        name = name or os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+        _profiler = Profiler(name, memory)
+        _instrument_openpyxl()
+        for target in _targets:
+            _wrap(*target)
+    return _profiler
+
+
+def _enable_from_env():
+    """环境变量启用：程序退出时自动写出报告"""
+    setting = os.environ.get(ENV_VAR, "").strip()
+    if not setting or setting == "0":
+        return
+    import multiprocessing
+    if multiprocessing.parent_process() is not None:
+        return  # 进程池子进程不单独出报告
+    profiler = enable(memory=os.environ.get(MEMORY_ENV_VAR, "1").strip() != "0")
+    path = None if setting == "1" else setting
+
+    def write_at_exit():
+        try:
+            print(f"[性能分析] 报告已写入：{profiler.write_report(path)}", file=sys.stderr)
+        except OSError as e:
+            print(f"[性能分析] 报告写入失败：{str(e)}", file=sys.stderr)
+
+    atexit.register(write_at_exit)
+
+
+_enable_from_env()
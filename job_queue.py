@@ -0,0 +1,128 @@
+"""
+有界任务队列
+交互脚本中操作员可能连续粘贴/拖放多个文件，原来每个路径启动一个新线程：
+线程数不受限制，几个任务可能同时保存同一个输出文件，而 openpyxl 的处理受 GIL 限制，
+多线程也不会更快。本模块把任务交给固定进程数的进程池执行：
+
+- 同一输入路径已在排队或处理中时，重复提交直接忽略
+- 输出路径相同的任务按提交顺序串行执行（前一个完成后才开始下一个），不会同时写同一个文件
+- 每个任务完成时报告结果与耗时（排队时间 + 处理时间）
+
+worker 与其参数需要能被 pickle（模块级函数），在子进程中执行。
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_MAX_WORKERS = 4
+
+
+class Job:
+    """队列中的一个任务"""
+
+    __slots__ = ("key", "output", "args", "submitted", "started")
+
+    def __init__(self, key, output, args):
+        self.key = key  # 去重用的输入路径
+        self.output = output  # 输出路径（相同输出串行执行）
+        self.args = args
+        self.submitted = time.perf_counter()
+        self.started = None
+
+
+class JobQueue:
+    """固定进程数的任务队列（输入路径去重、同一输出路径串行写入）"""
+
+    def __init__(self, worker, output_of, max_workers=None, on_done=None):
+        """
+        参数：
+            worker (callable): 子进程中执行的模块级函数 worker(*args)
+            output_of (callable): 根据输入路径计算输出路径 output_of(key)
+            max_workers (int): 进程数，为None时取 min(CPU核数, DEFAULT_MAX_WORKERS)
+            on_done (callable): 任务完成回调 on_done(job, result, error, elapsed)，为None时打印报告
+        """
+        self.worker = worker
+        self.output_of = output_of
+        self.max_workers = max_workers or min(os.cpu_count() or 1, DEFAULT_MAX_WORKERS)
+        self.on_done = on_done or self.report
+        self._pool = None  # 首次提交时创建，避免只做同步处理时也启动子进程
+        self._lock = threading.Condition()
+        self._pending = set()  # 排队或处理中的输入路径
+        self._by_output = {}  # 输出路径 → 等待执行的任务（队首为正在执行的任务）
+
+    def submit(self, key, *args):
+        """
+        提交任务
+        参数：
+            key (str): 输入路径（同一路径的任务未完成时重复提交会被忽略）
+            args: 传给 worker 的参数
+        返回：
+            bool: 是否已加入队列（False 表示重复提交）
+        """
+        key = os.path.normcase(os.path.abspath(key))
+        with self._lock:
+            if key in self._pending:
+                return False
+            job = Job(key, os.path.normcase(os.path.abspath(self.output_of(key))), args)
+            self._pending.add(key)
+            waiting = self._by_output.setdefault(job.output, deque())
+            waiting.append(job)
+            if len(waiting) == 1:
+                self._start(job)
+        return True
+
+    def _start(self, job):
+        """把任务交给进程池（调用方持有锁）"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        job.started = time.perf_counter()
+        future = self._pool.submit(self.worker, *job.args)
+        future.add_done_callback(lambda done: self._finished(job, done))
+
+    def _finished(self, job, future):
+        """任务完成：报告结果，并开始同一输出路径上的下一个任务"""
+        error = future.exception()
+        result = None if error is not None else future.result()
+        try:
+            self.on_done(job, result, error, time.perf_counter() - job.started)
+        finally:
+            # 回调出错时也要完成记账，否则 join/shutdown 会一直等待
+            with self._lock:
+                self._pending.discard(job.key)
+                waiting = self._by_output[job.output]
+                waiting.popleft()
+                if waiting:
+                    self._start(waiting[0])
+                else:
+                    del self._by_output[job.output]
+                self._lock.notify_all()
+
+    def pending_count(self):
+        """排队或处理中的任务数"""
+        with self._lock:
+            return len(self._pending)
+
+    def join(self):
+        """等待所有已提交的任务完成"""
+        with self._lock:
+            self._lock.wait_for(lambda: not self._pending)
+
+    def shutdown(self):
+        """等待所有任务完成后关闭进程池"""
+        self.join()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    @staticmethod
+    def report(job, result, error, elapsed):
+        """默认的完成报告"""
+        name = os.path.basename(job.key)
+        waited = job.started - job.submitted
+        if error is not None:
+            print(f"\n[失败] {name}：{str(error)}（耗时 {elapsed:.2f} 秒）")
+        else:
+            print(f"\n[完成] {name} → {os.path.basename(job.output)}"
+                  f"（处理 {elapsed:.2f} 秒，排队 {waited:.2f} 秒）")
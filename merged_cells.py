@@ -0,0 +1,154 @@
+"""
+合并单元格锚点索引
+每个工作表只建一次「坐标 → 左上角锚点」的字典，之后查询为O(1)；
+通过 ws.merge_cells/unmerge_cells 修改合并区域后自动重建（每次修改递增工作表的版本号，
+查询时只比较版本号，与合并区域数量无关）。直接改动 ws.merged_cells 时需手动 invalidate。
+读取固定区域时用 read_block 一次取出整块，每块只解析一次合并区域。
+"""
+import functools
+import re
+import weakref
+import zipfile
+
+from openpyxl.utils.cell import coordinate_to_tuple, range_boundaries
+from openpyxl.worksheet.worksheet import Worksheet
+
+from xlsx_parts import sheet_parts
+
+# <mergeCell ref="B2:C4"/>（兼容带命名空间前缀的写法）
+MERGE_CELL_PATTERN = re.compile(rb'<(?:\w+:)?mergeCell\b[^>]*?\bref="([^"]+)"')
+
+# 工作表 → 索引（工作表被回收时索引随之释放）
+_indexes = weakref.WeakKeyDictionary()
+# 工作表 → 合并区域版本号（merge_cells/unmerge_cells 每调用一次加1）
+_versions = weakref.WeakKeyDictionary()
+
+
+def _track_changes(method):
+    """包装 Worksheet 的合并/取消合并方法，调用后递增工作表的版本号"""
+    @functools.wraps(method)
+    def wrapper(ws, *args, **kwargs):
+        try:
+            return method(ws, *args, **kwargs)
+        finally:
+            _versions[ws] = _versions.get(ws, 0) + 1
+    wrapper.tracks_merged_cells = True
+    return wrapper
+
+
+for _name in ("merge_cells", "unmerge_cells"):
+    if not getattr(getattr(Worksheet, _name), "tracks_merged_cells", False):
+        setattr(Worksheet, _name, _track_changes(getattr(Worksheet, _name)))
+
+
+class MergedCellIndex:
+    """单个工作表的合并单元格索引"""
+
+    def __init__(self, ws):
+        self.signature = _signature(ws)
+        self.anchors = {}
+        for merged_range in ws.merged_cells.ranges:
+            anchor = (merged_range.min_row, merged_range.min_col)
+            for row in range(merged_range.min_row, merged_range.max_row + 1):
+                for column in range(merged_range.min_col, merged_range.max_col + 1):
+                    self.anchors[(row, column)] = anchor
+
+    def anchor_of(self, row, column):
+        """返回所在合并区域的锚点坐标，非合并单元格返回None"""
+        return self.anchors.get((row, column))
+
+
+def _signature(ws):
+    """合并区域的变更标记（O(1)：集合对象、merge_cells/unmerge_cells 版本号与区域数量）"""
+    merged = ws.merged_cells
+    return id(merged), _versions.get(ws, 0), len(merged.ranges)
+
+
+def get_index(ws):
+    """获取工作表的合并单元格索引（必要时重建）"""
+    index = _indexes.get(ws)
+    if index is None or index.signature != _signature(ws):
+        index = _indexes[ws] = MergedCellIndex(ws)
+    return index
+
+
+def invalidate(ws):
+    """手动丢弃工作表的索引（批量修改合并区域后调用）"""
+    _indexes.pop(ws, None)
+
+
+def anchor_of(ws, row, column):
+    """返回单元格所在合并区域的锚点坐标，非合并单元格返回None"""
+    return get_index(ws).anchor_of(row, column)
+
+
+def resolve(ws, cell_address):
+    """解析单元格地址，返回(行, 列, 锚点)"""
+    row, column = coordinate_to_tuple(cell_address)
+    return row, column, get_index(ws).anchor_of(row, column)
+
+
+def sheet_ranges(ws):
+    """
+    返回工作表的合并区域 [(起始行, 起始列, 结束行, 结束列), ...]
+    支持普通模式工作表与缓存工作表；只读模式的工作表没有合并信息，需用 read_merged_ranges 读取
+    """
+    if hasattr(ws, "merged_ranges"):  # workbook_cache.CachedSheet
+        return ws.merged_ranges
+    return [(r.min_row, r.min_col, r.max_row, r.max_col) for r in ws.merged_cells.ranges]
+
+
+def read_block(ws, min_row, max_row, min_col, max_col, ranges=None):
+    """
+    批量读取矩形区域的单元格值，合并区域内的单元格取左上角的值
+    区域用一次 iter_rows 读出；锚点位于区域之外的合并区域会相应扩大读取范围。
+    参数：
+        ws: 工作表（普通模式、只读模式或缓存工作表）
+        min_row, max_row, min_col, max_col (int): 区域边界（含）
+        ranges (list): 合并区域 [(起始行, 起始列, 结束行, 结束列), ...]；
+                       为None时取自工作表（只读模式必须传入）
+    返回：
+        list[list]: 按行排列的值，第i行第j列对应 (min_row+i, min_col+j)
+    """
+    if ranges is None:
+        ranges = sheet_ranges(ws)
+    overlapping = [
+        merged for merged in ranges
+        if merged[0] <= max_row and merged[2] >= min_row and merged[1] <= max_col and merged[3] >= min_col
+    ]
+    top = min([min_row] + [merged[0] for merged in overlapping])
+    left = min([min_col] + [merged[1] for merged in overlapping])
+
+    rows = [list(values) for values in ws.iter_rows(
+        min_row=top, max_row=max_row, min_col=left, max_col=max_col, values_only=True
+    )]
+    width = max_col - left + 1
+    rows += [[None] * width for _ in range(max_row - top + 1 - len(rows))]  # 只读模式可能少返回末尾空行
+    for values in rows:
+        values += [None] * (width - len(values))
+
+    for first_row, first_col, last_row, last_col in overlapping:
+        anchor_value = rows[first_row - top][first_col - left]
+        for row in range(max(first_row, min_row), min(last_row, max_row) + 1):
+            for column in range(max(first_col, min_col), min(last_col, max_col) + 1):
+                rows[row - top][column - left] = anchor_value
+    return [values[min_col - left:] for values in rows[min_row - top:]]
+
+
+def read_merged_ranges(file_path):
+    """
+    直接从XML读取各工作表的合并区域（只读模式的工作表没有 merged_cells）
+    返回：
+        dict: {工作表名称: [(起始行, 起始列, 结束行, 结束列), ...]}
+    """
+    result = {}
+    with zipfile.ZipFile(file_path) as archive:
+        for title, part in sheet_parts(archive).items():
+            xml = archive.read(part)
+            start = max(xml.rfind(b"</sheetData>"), 0)  # mergeCells 位于 sheetData 之后
+            ranges = []
+            for match in MERGE_CELL_PATTERN.finditer(xml, start):
+                min_col, min_row, max_col, max_row = range_boundaries(match.group(1).decode())
+                ranges.append((min_row, min_col, max_row, max_col))
+            result[title] = ranges
+    return result
@@ -0,0 +1,134 @@
+"""
+商品名称标准化引擎
+规则表在构造时只编译一次：所有关键词去重后建立索引，
+单个名称对每个关键词最多做一次子串判断；结果按原始名称
+放入有界LRU缓存，并记录命中/未命中次数便于核对缓存效果。
+未匹配任何规则的名称（按清理后的名称返回）单独记录，调用方用 tally 按行数累计，
+unknown_report 输出按出现次数排序的清单，新商品不会悄悄混入清理后的名称中。
+"""
+import copy
+import re
+from collections import Counter, OrderedDict
+
+import instrumentation
+
+# 清理特殊符号：【活动标签】、(规格说明)、N块、N份
+CLEAN_PATTERN = re.compile(r'【.*?】|\(.*?\)|\d+块|\d+份')
+
+
+class ProductNameNormalizer:
+    """编译后的商品名称标准化器"""
+
+    def __init__(self, rules, cache_size=4096):
+        """
+        参数：
+            rules (list): 规则表（优先级从高到低），每条规则为
+                (标准名称, 必含关键词, 任含其一关键词, 排除关键词)
+            cache_size (int): LRU缓存容量（按原始名称缓存）
+        """
+        keywords = []
+        index = {}
+
+        def compile_keys(words):
+            ids = []
+            for word in words:
+                if word not in index:
+                    index[word] = len(keywords)
+                    keywords.append(word)
+                ids.append(index[word])
+            return tuple(ids)
+
+        self._rules = tuple(
+            (standard, compile_keys(all_of), compile_keys(any_of), compile_keys(none_of))
+            for standard, all_of, any_of, none_of in rules
+        )
+        self.keywords = tuple(keywords)
+
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.unknown_names = set()  # 未匹配任何规则的名称（清理后）
+        self.unknown = Counter()  # 未匹配名称 → 出现次数（由 tally 累计）
+
+    def copy(self):
+        """复制编译好的规则表（缓存与统计为空）"""
+        clone = copy.copy(self)
+        clone._cache = OrderedDict()
+        clone.unknown_names = set()
+        clone.clear_cache()
+        return clone
+
+    def __call__(self, name):
+        """返回标准化后的商品名称（优先读取缓存）"""
+        cache = self._cache
+        # 非字符串单元格值（如1与1.0）相等但清理结果不同，需带上类型区分
+        key = name if type(name) is str else (type(name), name)
+        if key in cache:
+            cache.move_to_end(key)
+            self.hits += 1
+            return cache[key]
+
+        self.misses += 1
+        result = self._normalize(name)
+        cache[key] = result
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)  # 淘汰最久未使用的名称
+        return result
+
+    def _normalize(self, name):
+        """按优先级匹配规则，未命中时返回清理后的名称"""
+        cleaned = CLEAN_PATTERN.sub('', str(name)).strip()
+        keywords = self.keywords
+        found = [None] * len(keywords)  # 关键词判断结果（按需计算，每个只算一次）
+
+        def has(i):
+            hit = found[i]
+            if hit is None:
+                hit = found[i] = keywords[i] in cleaned
+            return hit
+
+        for standard, all_of, any_of, none_of in self._rules:
+            if all(has(i) for i in all_of) \
+               and (not any_of or any(has(i) for i in any_of)) \
+               and not any(has(i) for i in none_of):
+                return standard
+        instrumentation.count("未识别商品名称")
+        instrumentation.sample("未识别商品名称", cleaned)
+        self.unknown_names.add(cleaned)
+        return cleaned
+
+    def tally(self, name, n=1):
+        """标准化结果 name 出现了 n 次（只累计未匹配规则的名称）"""
+        if name in self.unknown_names:
+            self.unknown[name] += n
+
+    def unknown_report(self, limit=None):
+        """未匹配规则的名称，按出现次数从高到低：[(名称, 次数), ...]"""
+        return self.unknown.most_common(limit)
+
+    def stats(self):
+        """缓存统计与未匹配名称计数（子进程回传后用 merge 合并）"""
+        return dict(self.cache_info(), unknown=dict(self.unknown))
+
+    def merge(self, stats):
+        """合并另一个标准化器的 stats（如子进程中的统计）"""
+        self.hits += stats["hits"]
+        self.misses += stats["misses"]
+        self.unknown.update(stats.get("unknown", {}))
+
+    def cache_info(self):
+        """缓存统计信息"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._cache),
+            "maxsize": self.cache_size,
+        }
+
+    def clear_cache(self):
+        """清空缓存与计数"""
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+        self.unknown = Counter()
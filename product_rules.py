@@ -0,0 +1,172 @@
+"""
+商品名称规则文件
+各门店的商品名称标准化规则（原 xsb.py / xsb_qd.py 中的 PRODUCT_NAME_RULES）与 cyb 的名称别名
+统一保存在一个带版本号的 JSON 文件中（默认 product_rules.json）：
+
+    {
+      "version": 1,
+      "rule_sets": {"jinan": [{"name": 标准名称, "all": [必含], "any": [任含其一], "none": [排除]}, ...]},
+      "aliases": {原名称: 统一名称}
+    }
+
+规则按优先级从高到低排列，any / none 可省略。文件在加载时校验并编译为 ProductNameNormalizer；
+长时间运行（目录监控等）时每次取用前检查文件的大小与修改时间，变化后自动重新加载。
+重新加载失败（如编辑到一半的文件）时保留上一版规则并给出提示。
+
+规则文件按以下顺序查找（见 find_rules_file）：
+1. 环境变量 PRODUCT_RULES_FILE 指定的文件
+2. exe 所在目录的 product_rules.json（放在 exe 旁边即可覆盖打包进 exe 的规则）
+3. 打包进 exe 的 product_rules.json（sys._MEIPASS），或脚本所在目录的 product_rules.json
+打包 exe 时用 --add-data 把 product_rules.json 打包进去（见 .github/workflows）。
+都找不到时报错并列出查找过的路径。
+"""
+import json
+import os
+import sys
+
+from name_normalizer import ProductNameNormalizer
+
+RULES_FILENAME = "product_rules.json"
+RULE_FIELDS = ("name", "all", "any", "none")
+
+
+class RuleFileError(Exception):
+    """规则文件无法读取或格式错误"""
+
+
+def rules_file_candidates():
+    """按优先级排列的规则文件路径"""
+    candidates = []
+    if os.environ.get("PRODUCT_RULES_FILE"):
+        candidates.append(os.environ["PRODUCT_RULES_FILE"])
+    if getattr(sys, "frozen", False):
+        # PyInstaller 打包：exe 旁边的文件优先，其次是打包进 exe 的文件
+        candidates.append(os.path.join(os.path.dirname(sys.executable), RULES_FILENAME))
+        candidates.append(os.path.join(getattr(sys, "_MEIPASS", ""), RULES_FILENAME))
+    else:
+        candidates.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), RULES_FILENAME))
+    return candidates
+
+
+def find_rules_file():
+    """
+    第一个存在的规则文件路径
+    异常：
+        RuleFileError: 所有位置都没有规则文件
+    """
+    candidates = rules_file_candidates()
+    for path in candidates:
+        if os.path.isfile(path):
+            return path
+    raise RuleFileError(f"未找到商品名称规则文件 {RULES_FILENAME}，已查找：{'；'.join(candidates)}")
+
+
+def parse_rules(data, source=""):
+    """
+    校验规则文件内容
+    返回：
+        (版本号, {规则集名称: [(标准名称, 必含, 任含其一, 排除), ...]}, {原名称: 统一名称})
+    异常：
+        RuleFileError: 格式错误
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("rule_sets"), dict):
+        raise RuleFileError(f"规则文件缺少 rule_sets：{source}")
+    rule_sets = {}
+    for set_name, rules in data["rule_sets"].items():
+        if not isinstance(rules, list):
+            raise RuleFileError(f"规则集 {set_name} 应为列表：{source}")
+        compiled = []
+        for position, rule in enumerate(rules, 1):
+            valid = isinstance(rule, dict) and isinstance(rule.get("name"), str)
+            if not valid or not (rule.get("all") or rule.get("any")):
+                raise RuleFileError(f"规则集 {set_name} 第{position}条规则需要 name 与 all/any 关键词：{source}")
+            unknown = ", ".join(sorted(set(rule) - set(RULE_FIELDS)))
+            if unknown:
+                raise RuleFileError(f"规则集 {set_name} 第{position}条规则有未知字段 {unknown}：{source}")
+            compiled.append((rule["name"],) + tuple(tuple(rule.get(field, ())) for field in RULE_FIELDS[1:]))
+        rule_sets[set_name] = compiled
+    aliases = data.get("aliases", {})
+    if not isinstance(aliases, dict):
+        raise RuleFileError(f"aliases 应为对象：{source}")
+    return data.get("version", 0), rule_sets, dict(aliases)
+
+
+class RuleFile:
+    """已编译的规则文件（文件变化后自动重新加载）"""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.signature = None
+        self.version = None
+        self.aliases = {}
+        self._normalizers = {}  # 规则集名称 → 编译好的标准化器（取用时复制，缓存与计数各自独立）
+        self._load()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError as e:
+            raise RuleFileError(f"无法读取规则文件 {self.path}：{str(e)}")
+        return stat.st_size, stat.st_mtime_ns
+
+    def _load(self):
+        signature = self._stat()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise RuleFileError(f"无法读取规则文件 {self.path}：{str(e)}")
+        version, rule_sets, aliases = parse_rules(data, self.path)
+        self._normalizers = {name: ProductNameNormalizer(rules) for name, rules in rule_sets.items()}
+        self.version, self.aliases, self.signature = version, aliases, signature
+
+    def reload_if_changed(self):
+        """
+        文件变化时重新加载
+        返回：
+            bool: 是否加载了新规则（新文件有误时保留旧规则并返回False）
+        """
+        try:
+            if self._stat() == self.signature:
+                return False
+            previous = self.version
+            self._load()
+        except RuleFileError as e:
+            print(f"[警告] 商品名称规则未更新，继续使用版本 {self.version}：{str(e)}")
+            return False
+        print(f"[系统] 商品名称规则已重新加载：版本 {previous} → {self.version}")
+        return True
+
+    def normalizer(self, set_name):
+        """
+        返回规则集的标准化器（独立的缓存与未识别名称统计）
+        异常：
+            KeyError: 规则文件中没有该规则集
+        """
+        self.reload_if_changed()
+        if set_name not in self._normalizers:
+            raise KeyError(f"规则文件 {self.path} 中没有规则集：{set_name}")
+        return self._normalizers[set_name].copy()
+
+    def name_aliases(self):
+        """名称别名表（cyb 对比前统一名称）"""
+        self.reload_if_changed()
+        return self.aliases
+
+
+_files = {}
+
+
+def load(path=None):
+    """
+    获取规则文件（同一路径只加载一次，之后按需重新加载）
+    参数：
+        path (str): 规则文件路径，为None时按 find_rules_file 的顺序查找
+    异常：
+        RuleFileError: 找不到规则文件或首次加载失败
+    """
+    path = os.path.abspath(path or find_rules_file())
+    rule_file = _files.get(path)
+    if rule_file is None:
+        rule_file = _files[path] = RuleFile(path)
+    return rule_file
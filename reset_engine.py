@@ -0,0 +1,199 @@
+"""
+产品统计表每日清零引擎
+czb.py（济南）与 czb2.py（青岛）的清零流程相同，只是城市名与各表的行区间不同。
+各门店的版式在 RESET_LAYOUTS 中声明为按顺序执行的区域操作：
+
+    (工作表序号, "copy", 源区域, 目标左上角)  整块复制（如总表 O3:O42 → D3）
+    (工作表序号, "clear", 区域)               整块清空
+
+compile_layout 把版式预先编译为 ResetPlan（区域解析为行列边界、同一工作表上行区间相同且
+列相邻的清空操作合并为一块），执行时每个区域只读写一次整块，不再逐个单元格拼坐标。
+reset_all 可以把多个门店的产品统计表交给进程池一次并行清零（见 job_queue）。
+"""
+import os
+from datetime import datetime
+from typing import NamedTuple
+
+from openpyxl.utils.cell import coordinate_to_tuple, range_boundaries
+
+import instrumentation
+import xlsx_patch
+from job_queue import JobQueue
+
+COPY = "copy"
+CLEAR = "clear"
+
+
+class ResetLayout(NamedTuple):
+    """单个门店产品统计表的清零版式"""
+    key: str  # 配置键（与 store_profiles 一致）
+    city: str  # 输出文件名中的城市名：「<城市> 产品统计表M.D.xlsx」
+    operations: tuple  # 按顺序执行的区域操作（见模块说明）
+
+
+def _daily_reset(main_last_row, sales_range):
+    """产品统计表的清零操作（各门店只有总表行数与销售表区域不同）"""
+    return (
+        # 总表（第1个工作表）：O列复制到D列，再清空E、G-O列（F列保留）
+        (0, COPY, f"O3:O{main_last_row}", "D3"),
+        (0, CLEAR, f"E3:E{main_last_row}"),
+        (0, CLEAR, f"G3:O{main_last_row}"),
+        # 用料表（第3个工作表）：H列复制到D列，再清空E、G-H列（F列保留）
+        (2, COPY, "H3:H76", "D3"),
+        (2, CLEAR, "E3:E76"),
+        (2, CLEAR, "G3:H76"),
+        # 销售表（第2个工作表）：清空各渠道销量
+        (1, CLEAR, sales_range),
+    )
+
+
+RESET_LAYOUTS = {
+    "jinan": ResetLayout("jinan", "济南", _daily_reset(42, "D3:I30")),
+    "qingdao": ResetLayout("qingdao", "青岛", _daily_reset(56, "D3:J45")),
+}
+DEFAULT_LAYOUT = "jinan"
+
+
+class ResetStep(NamedTuple):
+    """编译后的区域操作（行列均为1起始的闭区间）"""
+    sheet: int
+    kind: str
+    min_row: int
+    min_col: int
+    max_row: int
+    max_col: int
+    dest_row: int = None  # 复制的目标左上角
+    dest_col: int = None
+
+    @property
+    def cell_count(self):
+        return (self.max_row - self.min_row + 1) * (self.max_col - self.min_col + 1)
+
+
+class ResetPlan:
+    """预先编译的清零计划"""
+
+    def __init__(self, layout, steps):
+        self.layout = layout
+        self.steps = steps
+
+    def apply(self, wb):
+        """
+        对工作簿执行清零（修改经由 xlsx_patch 记录）
+        参数：
+            wb (Workbook): 非只读模式加载的产品统计表
+        """
+        for step in self.steps:
+            ws = wb.worksheets[step.sheet]
+            if step.kind == COPY:
+                block = ws.iter_rows(min_row=step.min_row, max_row=step.max_row,
+                                     min_col=step.min_col, max_col=step.max_col, values_only=True)
+                xlsx_patch.set_block(ws, step.dest_row, step.dest_col, list(block))
+            else:
+                width = step.max_col - step.min_col + 1
+                empty = [(None,) * width] * (step.max_row - step.min_row + 1)
+                xlsx_patch.set_block(ws, step.min_row, step.min_col, empty)
+            instrumentation.count("写入单元格数", step.cell_count)
+
+    def output_path(self, file_path, target_date=None):
+        """新文件路径（与原文件同目录，按日期命名，为None时使用当天）"""
+        today = target_date or datetime.now()
+        month = str(today.month).lstrip('0')  # 去除前导零（1月显示为1而不是01）
+        day = str(today.day).lstrip('0')
+        return os.path.join(os.path.dirname(file_path), f"{self.layout.city} 产品统计表{month}.{day}.xlsx")
+
+
+def compile_layout(layout):
+    """
+    把版式编译为清零计划
+    异常：
+        ValueError: 未知的操作类型，或复制操作缺少目标
+    """
+    steps = []
+    for operation in layout.operations:
+        sheet, kind, area = operation[:3]
+        min_col, min_row, max_col, max_row = range_boundaries(area)
+        if kind == COPY:
+            if len(operation) < 4:
+                raise ValueError(f"复制操作缺少目标：{operation}")
+            dest_row, dest_col = coordinate_to_tuple(operation[3])
+            steps.append(ResetStep(sheet, COPY, min_row, min_col, max_row, max_col, dest_row, dest_col))
+        elif kind == CLEAR:
+            previous = steps[-1] if steps else None
+            # 与上一步的清空区域行区间相同且列相邻时合并为一块
+            if (previous is not None and previous.kind == CLEAR and previous.sheet == sheet
+                    and (previous.min_row, previous.max_row) == (min_row, max_row)
+                    and previous.max_col + 1 == min_col):
+                steps[-1] = previous._replace(max_col=max_col)
+            else:
+                steps.append(ResetStep(sheet, CLEAR, min_row, min_col, max_row, max_col))
+        else:
+            raise ValueError(f"未知的操作类型：{kind}")
+    return ResetPlan(layout, steps)
+
+
+_plans = {}
+
+
+def get_plan(key):
+    """
+    获取门店的清零计划（每个版式只编译一次）
+    异常：
+        KeyError: 未知的版式配置键
+    """
+    plan = _plans.get(key)
+    if plan is None:
+        plan = _plans[key] = compile_layout(RESET_LAYOUTS[key])
+    return plan
+
+
+def reset_workbook(file_path, key=DEFAULT_LAYOUT, target_date=None):
+    """
+    清零一个产品统计表并保存为带日期的新文件（同步执行，错误直接抛出）
+    返回：
+        str: 新文件路径
+    """
+    from openpyxl import load_workbook  # 延迟加载
+
+    plan = get_plan(key)
+    # 注意：使用正常模式打开以便保存修改
+    wb = load_workbook(file_path)
+    xlsx_patch.track(wb, file_path)  # 记录修改，保存时只重写修改过的工作表
+    print("[系统] 文件加载成功，开始处理工作表...")
+    plan.apply(wb)
+
+    new_file_path = plan.output_path(file_path, target_date)
+    xlsx_patch.save(wb, new_file_path)
+    print(f"[成功] 文件已保存至：\n{new_file_path}")
+    return new_file_path
+
+
+def reset_all(stores, target_date=None, max_workers=None, on_done=None):
+    """
+    多个门店的产品统计表一次并行清零
+    参数：
+        stores (dict): {版式配置键: 产品统计表路径}
+        max_workers (int): 进程数（见 JobQueue）
+        on_done (callable): 每个门店完成时的回调（见 JobQueue），为None时打印报告
+    返回：
+        dict: {版式配置键: 新文件路径}；失败的门店不在结果中
+    异常：
+        KeyError: 未知的版式配置键
+    """
+    plans = {key: get_plan(key) for key in stores}
+    keys = {os.path.normcase(os.path.abspath(file_path)): key for key, file_path in stores.items()}
+    outputs = {}
+
+    def finished(job, result, error, elapsed):
+        if error is None:
+            outputs[keys[job.key]] = result
+        (on_done or JobQueue.report)(job, result, error, elapsed)
+
+    def output_of(path):
+        return plans[keys[path]].output_path(path, target_date)
+
+    queue = JobQueue(reset_workbook, output_of, max_workers=max_workers, on_done=finished)
+    for key, file_path in stores.items():
+        queue.submit(file_path, file_path, key, target_date)
+    queue.shutdown()
+    return outputs
@@ -0,0 +1,27 @@
+"""
+门店规则配置
+各城市产品统计表的处理流程相同，差异只在规则：商品名称标准化规则、收藏炒酸奶是否单列、
+团购表按哪个关键词筛选验证门店、输出文件名中的城市名（商品名称规则本身保存在 product_rules.json）。
+xsb.py（济南）、xsb_qd.py（青岛）与多门店模式都按这里的配置处理，不再各自维护一份复制的脚本。
+"""
+from typing import NamedTuple
+
+
+class StoreProfile(NamedTuple):
+    """单个门店（城市）的处理规则"""
+    key: str  # 配置键（命令行与多门店模式中使用）
+    city: str  # 输出文件名中的城市名：「<城市> 产品统计表M-D.xlsx」
+    store_keyword: str  # 团购表「验证门店」包含该关键词的行属于本门店
+    rule_set: str  # 商品名称标准化规则集（product_rules.json 中 rule_sets 的名称）
+    split_collect: bool = False  # 收藏炒酸奶是否单列（按2份折算，不计入商品销量）
+    collect_cell: str = None  # 收藏炒酸奶合计写入「总表」的单元格（None表示不写）
+
+
+STORE_PROFILES = {
+    "jinan": StoreProfile("jinan", "济南", "济南", "jinan", split_collect=True, collect_cell="J31"),
+    # 注意：原 xsb_qd.py 复制自 xsb.py，团购表仍按「济南」筛选、输出文件名也是「济南 产品统计表」；
+    # 现改为按「青岛」筛选并输出「青岛 产品统计表」。团购表中没有匹配的验证门店时会给出警告，
+    # 如青岛门店的名称不含「青岛」，修改这里的 store_keyword 即可。
+    "qingdao": StoreProfile("qingdao", "青岛", "青岛", "qingdao"),
+}
+DEFAULT_PROFILE = "jinan"
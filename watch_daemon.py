@@ -0,0 +1,376 @@
+"""
+目录监控守护进程
+监控导出文件的放置目录，当某个处理任务当天所需的输入全部就绪时自动执行，
+代替各脚本 auto_detect_files 中「清屏 → 全量扫描 → 等待回车」的循环。
+
+- Linux 下通过 inotify（ctypes 调用，无第三方依赖）等待目录变化，只重新检查
+  发生变化的文件；其他平台或 inotify 不可用时退回到定时 scandir 轮询
+- 防抖：文件大小与修改时间保持不变 settle 秒、且能完整打开（xlsx 需通过
+  zip 结构校验）后才视为写入完成；Excel 锁文件（~$开头）与临时文件忽略
+- 每个任务区分「输入」与「触发输入」：触发输入（如当天的导出）全部为当天
+  修改且与上次执行时不同，才会再次执行；任务自己生成的文件不会反复触发
+
+用法：python watch_daemon.py [目录] [--jobs xsb,dianping] [--settle 秒] [--poll 秒]
+支持的任务见 JOBS（xt.py 需要人工录入储值、美团等数据，不支持自动执行）
+"""
+import argparse
+import ctypes
+import ctypes.util
+import datetime
+import importlib
+import multiprocessing
+import os
+import select
+import struct
+import sys
+import time
+import zipfile
+
+# inotify 事件掩码（见 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+IGNORED_PREFIXES = ("~$", ".")  # Excel 锁文件、隐藏文件
+IGNORED_SUFFIXES = (".tmp", ".part", ".crdownload")  # 下载或保存过程中的临时文件
+
+
+class InotifyWatcher:
+    """基于 inotify 的目录变化通知"""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, "inotify_add_watch 失败")
+
+    def wait(self, timeout):
+        """
+        等待目录变化
+        返回：
+            set: 发生变化的文件名；None 表示需要全量扫描（事件队列溢出）
+        """
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        names = set()
+        while ready:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if name:
+                    names.add(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """定时轮询（inotify 不可用时使用）"""
+
+    def __init__(self, directory, interval=2.0):
+        self.interval = interval
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        return None  # 每次都做一次全量 scandir
+
+    def close(self):
+        pass
+
+
+def create_watcher(directory, poll_interval=2.0):
+    """优先使用 inotify，不可用时退回轮询"""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError) as e:
+            print(f"[监控] inotify 不可用，改用轮询：{str(e)}")
+    return PollingWatcher(directory, poll_interval)
+
+
+class DropFolder:
+    """放置目录的文件快照（带写入完成判断）"""
+
+    def __init__(self, directory, settle_seconds=2.0):
+        self.directory = directory
+        self.settle_seconds = settle_seconds
+        self.files = {}  # 文件名 → (大小, 修改时间ns)
+        self._changed_at = {}  # 文件名 → 最近一次观察到变化的时间
+        self._settled = {}  # 文件名 → 已确认写入完成时的 (大小, 修改时间ns)
+
+    def refresh(self, names=None):
+        """更新快照（names 为 None 时全量扫描，否则只检查指定文件）"""
+        now = time.monotonic()
+        if names is None:
+            current = {}
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if self._ignored(entry.name) or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    current[entry.name] = (stat.st_size, stat.st_mtime_ns)
+            for name in set(self.files) - set(current):
+                self._forget(name)
+            for name, signature in current.items():
+                self._observe(name, signature, now)
+            return
+
+        for name in names:
+            if self._ignored(name):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                self._forget(name)
+                continue
+            self._observe(name, (stat.st_size, stat.st_mtime_ns), now)
+
+    def settled(self):
+        """
+        返回已写入完成的文件
+        返回：
+            dict: 文件名 → (完整路径, 修改时间戳)
+        """
+        now = time.monotonic()
+        result = {}
+        for name, signature in self.files.items():
+            if self._settled.get(name) != signature:
+                if now - self._changed_at[name] < self.settle_seconds or not self._complete(name):
+                    continue
+                self._settled[name] = signature
+            result[name] = (os.path.join(self.directory, name), signature[1] / 1e9)
+        return result
+
+    def next_deadline(self):
+        """距离最近一个待确认文件可以确认的秒数（没有待确认文件时返回None）"""
+        pending = [
+            self._changed_at[name] + self.settle_seconds
+            for name, signature in self.files.items()
+            if self._settled.get(name) != signature
+        ]
+        if not pending:
+            return None
+        return max(0.0, min(pending) - time.monotonic())
+
+    def _observe(self, name, signature, now):
+        if self.files.get(name) != signature:
+            self.files[name] = signature
+            self._changed_at[name] = now
+
+    def _forget(self, name):
+        self.files.pop(name, None)
+        self._changed_at.pop(name, None)
+        self._settled.pop(name, None)
+
+    def _ignored(self, name):
+        return name.startswith(IGNORED_PREFIXES) or name.lower().endswith(IGNORED_SUFFIXES)
+
+    def _complete(self, name):
+        """文件能被完整读取（写入方仍占用或 xlsx 尚未写完时返回False）"""
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb"):
+                pass
+            if name.lower().endswith((".xlsx", ".xlsm")):
+                return zipfile.is_zipfile(path)
+            return True
+        except OSError:
+            return False
+
+
+class WatchJob:
+    """一个自动执行的处理任务"""
+
+    def __init__(self, name, description, inputs, triggers, handler):
+        """
+        参数：
+            inputs (dict): 输入角色 → FileRule（同一角色取修改时间最新的文件）
+            triggers (tuple): 触发执行的输入角色（须为当天修改）
+            handler (callable): 接收 {角色: 路径} 并执行处理
+        """
+        self.name = name
+        self.description = description
+        self.inputs = inputs
+        self.triggers = triggers
+        self.handler = handler
+        self.last_fingerprint = None
+
+    def select(self, files):
+        """按匹配规则为每个输入角色选出最新文件（缺失的角色不出现在结果中）"""
+        selected = {}
+        for role, rule in self.inputs.items():
+            candidates = [(mtime, path) for name, (path, mtime) in files.items() if rule.matches(name)]
+            if candidates:
+                selected[role] = max(candidates)
+        return selected
+
+    def ready(self, files, today):
+        """
+        判断是否需要执行
+        返回：
+            (dict, tuple): 输入路径与触发指纹；不需要执行时返回 (None, None)
+        """
+        selected = self.select(files)
+        if len(selected) < len(self.inputs):
+            return None, None
+        if any(datetime.date.fromtimestamp(selected[role][0]) != today for role in self.triggers):
+            return None, None
+        fingerprint = tuple(selected[role] for role in self.triggers)
+        if fingerprint == self.last_fingerprint:
+            return None, None
+        return {role: path for role, (_, path) in selected.items()}, fingerprint
+
+
+# region 任务定义（输入匹配直接使用各脚本的 FILE_RULES）
+def _run_xsb(files):
+    import xsb
+    from groupon_watermark import WatermarkStore
+    from workbook_cache import WorkbookCache
+    app = xsb.ExcelProcessorApp(workbook_cache=WorkbookCache(), watermark_store=WatermarkStore())
+    app.process_inputs(files["ranking"], files["product"], files["groupon"], parallel=True)
+
+
+def _run_xsb_qd(files):
+    import xsb_qd
+    xsb_qd.ExcelProcessorApp().process_inputs(files["ranking"], files["product"], files["groupon"])
+
+
+def _run_dianping(files):
+    from customer_index import CustomerIndex
+    from groupon_watermark import WatermarkStore
+    from workbook_cache import WorkbookCache
+    dianping = importlib.import_module("点评")
+    app = dianping.ExcelProcessorApp(
+        workbook_cache=WorkbookCache(), watermark_store=WatermarkStore(), customer_index=CustomerIndex()
+    )
+    app.process_files(files["group_purchase"])
+
+
+def _run_xszb(files):
+    import xszb
+    from workbook_cache import WorkbookCache
+    xszb.SalesDataUpdater(workbook_cache=WorkbookCache()).run(files["product_stat"], files["sales_total"])
+
+
+def _run_cyb(files):
+    import cyb
+    from workbook_cache import WorkbookCache
+    cyb.ExcelComparator(workbook_cache=WorkbookCache()).compare_data(files["product"], files["kitchen"])
+
+
+# 任务名 → (说明, 提供 FILE_RULES 的模块, 触发输入, 处理函数)
+JOBS = {
+    "xsb": ("济南产品统计（xsb.py）", "xsb", ("ranking", "groupon"), _run_xsb),
+    "xsb_qd": ("青岛产品统计（xsb_qd.py）", "xsb_qd", ("ranking", "groupon"), _run_xsb_qd),
+    "dianping": ("点评去重统计（点评.py）", "点评", ("group_purchase",), _run_dianping),
+    "xszb": ("销售总表同步（xszb.py）", "xszb", ("product_stat",), _run_xszb),
+    "cyb": ("产品/厨房对比（cyb.py）", "cyb", ("product", "kitchen"), _run_cyb),
+}
+
+
+def create_job(name):
+    """按任务名创建 WatchJob"""
+    description, module_name, triggers, handler = JOBS[name]
+    rules = importlib.import_module(module_name).FILE_RULES
+    return WatchJob(name, description, {rule.key: rule for rule in rules}, triggers, handler)
+
+
+DEFAULT_JOBS = ("xsb", "dianping")
+# endregion
+
+
+class WatchDaemon:
+    """目录监控主循环"""
+
+    def __init__(self, directory, jobs, settle_seconds=2.0, poll_interval=2.0):
+        self.directory = os.path.abspath(directory)
+        self.jobs = jobs
+        self.folder = DropFolder(self.directory, settle_seconds)
+        self.poll_interval = poll_interval
+
+    def run_forever(self):
+        watcher = create_watcher(self.directory, self.poll_interval)
+        mode = "inotify" if isinstance(watcher, InotifyWatcher) else f"轮询（{self.poll_interval}秒）"
+        print(f"[监控] 目录：{self.directory}")
+        print(f"[监控] 方式：{mode}；任务：{', '.join(job.description for job in self.jobs)}")
+        try:
+            self.folder.refresh()
+            while True:
+                self.run_ready_jobs()
+                deadline = self.folder.next_deadline()
+                timeout = self.poll_interval * 30 if deadline is None else deadline + 0.05
+                self.folder.refresh(watcher.wait(timeout))
+        finally:
+            watcher.close()
+
+    def run_ready_jobs(self):
+        """执行输入已就绪的任务，返回本次执行的任务数"""
+        files = self.folder.settled()
+        today = datetime.date.today()
+        executed = 0
+        for job in self.jobs:
+            selected, fingerprint = job.ready(files, today)
+            if selected is None:
+                continue
+            job.last_fingerprint = fingerprint  # 失败也记录，输入更新后才会重试
+            stamp = datetime.datetime.now().strftime("%H:%M:%S")
+            print(f"\n[监控 {stamp}] 开始执行：{job.description}")
+            for role, path in selected.items():
+                print(f"   {role}：{os.path.basename(path)}")
+            started = time.perf_counter()
+            try:
+                job.handler(selected)
+                print(f"[监控] {job.name} 完成，耗时 {time.perf_counter() - started:.2f} 秒")
+            except Exception as e:
+                print(f"[监控] {job.name} 处理失败：{str(e)}")
+            executed += 1
+        if executed:
+            # 处理过程中生成或改写的文件在下一轮检查
+            self.folder.refresh()
+        return executed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="监控目录，输入文件就绪后自动处理")
+    parser.add_argument("directory", nargs="?", default=os.getcwd(), help="监控的目录（默认当前目录）")
+    parser.add_argument("--jobs", default=",".join(DEFAULT_JOBS),
+                        help=f"启用的任务，逗号分隔（可选：{', '.join(JOBS)}）")
+    parser.add_argument("--settle", type=float, default=2.0, help="文件保持不变多少秒后视为写入完成")
+    parser.add_argument("--poll", type=float, default=2.0, help="轮询模式下的扫描间隔（秒）")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.jobs.split(",") if name.strip()]
+    unknown = [name for name in names if name not in JOBS]
+    if unknown:
+        parser.error(f"未知任务：{', '.join(unknown)}")
+
+    daemon = WatchDaemon(args.directory, [create_job(name) for name in names], args.settle, args.poll)
+    try:
+        daemon.run_forever()
+    except KeyboardInterrupt:
+        print("\n[监控] 已停止")
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # xsb 任务会启动进程池，打包为exe后子进程需要
+    main()
@@ -0,0 +1,241 @@
+"""
+已解析工作簿的磁盘缓存
+以「文件路径 + 大小 + 修改时间 + 内容哈希」为键，把工作簿各表的单元格值
+（及合并区域）序列化保存；输入文件未变化时重复运行直接读取缓存，
+完全跳过openpyxl解析。缓存目录按总大小淘汰最久未使用的条目。
+
+各处理类通过构造参数 workbook_cache 选择启用，读取入口统一为 load_input。
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+
+from openpyxl import load_workbook
+from openpyxl.utils.cell import coordinate_to_tuple
+
+from merged_cells import read_merged_ranges
+
+CACHE_VERSION = 1  # 缓存格式变化时递增，旧条目自然失效
+DEFAULT_CACHE_DIR = os.environ.get("EXCEL_CACHE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".excel_cache"
+)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256MB
+
+
+class CachedCell:
+    """缓存单元格（只提供 value / coordinate）"""
+
+    __slots__ = ("value", "coordinate")
+
+    def __init__(self, value, coordinate):
+        self.value = value
+        self.coordinate = coordinate
+
+
+class CachedSheet:
+    """缓存中的工作表（只含单元格值，兼容常用的只读访问方式）"""
+
+    def __init__(self, title, rows, merged_ranges=()):
+        self.title = title
+        self.rows = rows
+        self.merged_ranges = list(merged_ranges)
+        self.max_row = len(rows)
+        self.max_column = max((len(row) for row in rows), default=0)
+        self._anchors = None
+
+    def iter_rows(self, min_row=None, max_row=None, min_col=None, max_col=None, values_only=True):
+        """按行返回单元格值（与openpyxl一致，不足的列补None）"""
+        if not values_only:
+            raise ValueError("缓存工作表只支持 values_only=True")
+        min_row = min_row or 1
+        max_row = max_row or self.max_row
+        min_col = min_col or 1
+        max_col = max_col or self.max_column
+        width = max_col - min_col + 1
+        for row_idx in range(min_row, max_row + 1):
+            row = self.rows[row_idx - 1] if row_idx <= self.max_row else ()
+            values = tuple(row[min_col - 1:max_col])
+            if len(values) < width:
+                values += (None,) * (width - len(values))
+            yield values
+
+    def cell_value(self, row, column):
+        """返回单元格原始值"""
+        if 0 < row <= self.max_row:
+            values = self.rows[row - 1]
+            if 0 < column <= len(values):
+                return values[column - 1]
+        return None
+
+    def merged_value(self, row, column):
+        """返回单元格值（位于合并区域时返回左上角的值）"""
+        if self._anchors is None:
+            self._anchors = {}
+            for min_row, min_col, max_row, max_col in self.merged_ranges:
+                for r in range(min_row, max_row + 1):
+                    for c in range(min_col, max_col + 1):
+                        self._anchors[(r, c)] = (min_row, min_col)
+        return self.cell_value(*self._anchors.get((row, column), (row, column)))
+
+    def __getitem__(self, cell_address):
+        """支持 ws['Q3'].value 形式的单元格读取"""
+        row, column = coordinate_to_tuple(cell_address)
+        return CachedCell(self.cell_value(row, column), cell_address)
+
+
+class CachedWorkbook:
+    """缓存中的工作簿"""
+
+    def __init__(self, sheets, active_index=0):
+        self.worksheets = sheets
+        self._by_title = {ws.title: ws for ws in sheets}
+        self._active_index = active_index
+
+    @property
+    def sheetnames(self):
+        return [ws.title for ws in self.worksheets]
+
+    @property
+    def active(self):
+        return self.worksheets[self._active_index] if self.worksheets else None
+
+    def __getitem__(self, title):
+        return self._by_title[title]  # 与openpyxl一致，缺表时抛出KeyError
+
+    def __contains__(self, title):
+        return title in self._by_title
+
+    def close(self):
+        """与openpyxl接口保持一致（缓存无需释放资源）"""
+
+
+class WorkbookCache:
+    """工作簿磁盘缓存"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, file_path, data_only=False):
+        """读取工作簿（命中缓存时不解析Excel文件）"""
+        entry = os.path.join(self.cache_dir, self._cache_key(file_path, data_only) + ".pkl")
+        workbook = self._read(entry)
+        if workbook is not None:
+            return workbook
+
+        self.misses += 1
+        workbook = self._parse(file_path, data_only)
+        try:
+            self._store(entry, workbook)
+            self._evict()
+        except OSError as e:
+            print(f"[缓存] 写入失败，已忽略：{str(e)}")
+        return workbook
+
+    def get(self, file_path, data_only=False):
+        """只查询缓存：命中时返回缓存的工作簿，未命中返回None（不解析也不写入）"""
+        return self._read(os.path.join(self.cache_dir, self._cache_key(file_path, data_only) + ".pkl"))
+
+    def _read(self, entry):
+        """读取缓存条目：不存在时返回None；条目损坏（任何反序列化错误）时删除并返回None"""
+        try:
+            f = open(entry, "rb")
+        except OSError:
+            return None  # 未命中
+        try:
+            with f:
+                workbook = pickle.load(f)
+            os.utime(entry)  # 刷新使用时间，供淘汰策略参考
+        except Exception:
+            # 缓存损坏或由旧版本写入（截断、类名变更等），按未命中处理并删除
+            try:
+                os.remove(entry)
+            except OSError:
+                pass
+            return None
+        self.hits += 1
+        return workbook
+
+    def clear(self):
+        """删除全部缓存条目"""
+        for entry in self._entries():
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _cache_key(self, file_path, data_only):
+        """路径、大小、修改时间与内容哈希共同决定缓存键"""
+        stat = os.stat(file_path)
+        digest = hashlib.blake2b(digest_size=16)
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        identity = "|".join([
+            str(CACHE_VERSION),
+            os.path.abspath(file_path),
+            str(stat.st_size),
+            str(stat.st_mtime_ns),
+            digest.hexdigest(),
+            "data_only" if data_only else "formulas",
+        ])
+        return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+    def _parse(self, file_path, data_only):
+        """以只读模式解析工作簿，提取单元格值与合并区域"""
+        merged = read_merged_ranges(file_path)
+        wb = load_workbook(file_path, read_only=True, data_only=data_only)
+        try:
+            sheets = [
+                CachedSheet(ws.title, list(ws.iter_rows(values_only=True)), merged.get(ws.title, ()))
+                for ws in wb.worksheets
+            ]
+            active_index = wb.worksheets.index(wb.active) if wb.active in wb.worksheets else 0
+        finally:
+            wb.close()
+        return CachedWorkbook(sheets, active_index)
+
+    def _store(self, entry, workbook):
+        """先写临时文件再替换，避免并发运行读到半截缓存"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(workbook, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, entry)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def _entries(self):
+        try:
+            return [e for e in os.scandir(self.cache_dir) if e.name.endswith(".pkl")]
+        except FileNotFoundError:
+            return []
+
+    def _evict(self):
+        """总大小超限时，按最近使用时间从旧到新删除"""
+        entries = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in self._entries()]
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def load_input(file_path, cache=None, **kwargs):
+    """
+    加载输入工作簿
+    参数：
+        cache (WorkbookCache): 为None时直接调用 load_workbook(**kwargs)
+    """
+    if cache is not None:
+        return cache.load(file_path, data_only=kwargs.get("data_only", False))
+    return load_workbook(file_path, **kwargs)
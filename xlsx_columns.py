@@ -0,0 +1,213 @@
+"""
+按列投影的流式读取
+openpyxl（包括只读模式）会解析每一行的全部单元格，宽表只用到其中几列时大部分开销是浪费。
+本模块不经过openpyxl，直接分块解压工作表XML：
+
+- 每块只在行边界处切分，用正则定位所需列的单元格，其余单元格不解码
+- 共享字符串只保留所需列实际引用的条目
+- 数字按样式识别日期，结果与 openpyxl 的 data_only 读取一致（公式取缓存值）
+
+内存与耗时随所需列数与行数增长，与导出表的总列数无关。
+单元格缺少 r 属性（Excel/WPS 生成的文件不会出现）时抛出 ProjectionError，调用方应退回完整读取。
+"""
+import html
+import re
+import zipfile
+from xml.etree import ElementTree
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.datetime import MAC_EPOCH, WINDOWS_EPOCH, from_excel, from_ISO8601
+
+import instrumentation
+from xlsx_parts import NS_MAIN, NS_PKG_REL, rels_part_of, resolve_target, sheet_parts, workbook_part
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+# 工作表与共享字符串XML中的结构（兼容带命名空间前缀的写法）
+ROW_END_PATTERN = re.compile(rb'</(?:\w+:)?row>|<(?:\w+:)?row\b[^>]*?/>')
+ROW_PATTERN = re.compile(rb'<(?:\w+:)?row\b[^>]*?(?:/>|>(.*?)</(?:\w+:)?row>)', re.S)
+CELL_TAG_PATTERN = re.compile(rb'<(?:\w+:)?c[\s>/]')
+TYPE_PATTERN = re.compile(rb'\bt="([^"]*)"')
+STYLE_PATTERN = re.compile(rb'\bs="(\d+)"')
+VALUE_PATTERN = re.compile(rb'<(?:\w+:)?v>(.*?)</(?:\w+:)?v>', re.S)
+TEXT_PATTERN = re.compile(rb'<(?:\w+:)?t(?:\s[^>]*)?>(.*?)</(?:\w+:)?t>', re.S)
+PHONETIC_PATTERN = re.compile(rb'<(?:\w+:)?rPh\b.*?</(?:\w+:)?rPh>', re.S)
+SI_END_PATTERN = re.compile(rb'</(?:\w+:)?si>|<(?:\w+:)?si\s*/>')
+SI_PATTERN = re.compile(rb'<(?:\w+:)?si\b[^>]*?(?:/>|>(.*?)</(?:\w+:)?si>)', re.S)
+
+
+class ProjectionError(Exception):
+    """无法按列投影读取（调用方应退回完整读取）"""
+
+
+def _cell_pattern(columns):
+    """只匹配指定列单元格的正则：分组为 (列号, 属性, 内容)"""
+    letters = b"|".join(column.encode() for column in columns)
+    return re.compile(
+        rb'<(?:\w+:)?c\b(?=[^>]*?\br="(' + letters + rb')\d+")([^>]*?)(?:/>|>(.*?)</(?:\w+:)?c>)', re.S
+    )
+
+
+def _chunks(stream, end_pattern):
+    """按结束标签切分的数据块（每块都以完整元素结尾）"""
+    pending = b""
+    while True:
+        data = stream.read(READ_CHUNK_SIZE)
+        if not data:
+            if pending:
+                yield pending
+            return
+        pending += data
+        last = None
+        for last in end_pattern.finditer(pending):
+            pass
+        if last is not None:
+            yield pending[:last.end()]
+            pending = pending[last.end():]
+
+
+def _text(xml):
+    """<is>/<si> 元素内容的纯文本（富文本各段拼接，忽略注音）"""
+    xml = PHONETIC_PATTERN.sub(b"", xml)
+    return html.unescape(b"".join(TEXT_PATTERN.findall(xml)).decode("utf-8"))
+
+
+def _related_part(archive, book_part, type_suffix):
+    """工作簿关系中指定类型的部件路径（不存在时返回None）"""
+    root = ElementTree.fromstring(archive.read(rels_part_of(book_part)))
+    for rel in root.iter(f"{{{NS_PKG_REL}}}Relationship"):
+        if rel.get("Type", "").endswith(type_suffix):
+            return resolve_target(book_part, rel.get("Target"))
+    return None
+
+
+def _date_styles(archive, book_part):
+    """返回 (日期样式索引集合, 时长样式索引集合)"""
+    part = _related_part(archive, book_part, "/styles")
+    if part is None:
+        return set(), set()
+    root = ElementTree.fromstring(archive.read(part))
+    formats = dict(BUILTIN_FORMATS)
+    for fmt in root.iter(f"{{{NS_MAIN}}}numFmt"):
+        formats[int(fmt.get("numFmtId"))] = fmt.get("formatCode", "")
+    dates, durations = set(), set()
+    cell_xfs = root.find(f"{{{NS_MAIN}}}cellXfs")
+    for idx, xf in enumerate(cell_xfs if cell_xfs is not None else ()):
+        code = formats.get(int(xf.get("numFmtId", 0)))
+        if code and is_date_format(code):
+            dates.add(idx)
+            if is_timedelta_format(code):
+                durations.add(idx)
+    return dates, durations
+
+
+def _book_settings(archive, book_part):
+    """返回 (活动工作表序号, 日期基准)"""
+    root = ElementTree.fromstring(archive.read(book_part))
+    view = root.find(f"{{{NS_MAIN}}}bookViews/{{{NS_MAIN}}}workbookView")
+    active = int(view.get("activeTab", 0)) if view is not None else 0
+    props = root.find(f"{{{NS_MAIN}}}workbookPr")
+    date1904 = props is not None and props.get("date1904", "").lower() in ("1", "true")
+    return active, MAC_EPOCH if date1904 else WINDOWS_EPOCH
+
+
+def read_columns(file_path, columns, sheet=None):
+    """
+    读取工作表的指定列
+    参数：
+        file_path (str): xlsx 文件路径
+        columns (list): 列号，如 ["A", "E", "M"]
+        sheet (str): 工作表名称，为None时读取活动工作表（与 wb.active 一致）
+    返回：
+        list[tuple]: 每个 <row> 元素一行，值按 columns 的顺序排列，缺失的单元格为None
+    异常：
+        ProjectionError: 单元格缺少 r 属性
+        KeyError: 工作表不存在
+    """
+    positions = {column.upper(): idx for idx, column in enumerate(columns)}
+    cell_pattern = _cell_pattern(positions)
+    width = len(columns)
+
+    with zipfile.ZipFile(file_path) as archive:
+        book_part = workbook_part(archive)
+        parts = sheet_parts(archive)
+        active, epoch = _book_settings(archive, book_part)
+        if sheet is None:
+            sheet = list(parts)[min(active, len(parts) - 1)]
+        date_styles, duration_styles = _date_styles(archive, book_part)
+
+        rows = []
+        shared_refs = []  # (行, 列位置, 共享字符串序号)
+        with archive.open(parts[sheet]) as stream:
+            for chunk in _chunks(stream, ROW_END_PATTERN):
+                for row_match in ROW_PATTERN.finditer(chunk):
+                    inner = row_match.group(1) or b""
+                    values = [None] * width
+                    found = False
+                    for cell in cell_pattern.finditer(inner):
+                        found = True
+                        values[positions[cell.group(1).decode()]] = _decode(
+                            cell.group(2), cell.group(3), epoch, date_styles, duration_styles,
+                            shared_refs, len(rows), positions[cell.group(1).decode()],
+                        )
+                    if not found and b' r="' not in inner and CELL_TAG_PATTERN.search(inner):
+                        raise ProjectionError(f"{sheet} 的单元格缺少坐标，无法按列读取")
+                    rows.append(values)
+        instrumentation.count("投影读取行数", len(rows))
+
+        if shared_refs:
+            strings = _shared_strings(archive, book_part, {idx for _, _, idx in shared_refs})
+            for row_idx, position, idx in shared_refs:
+                rows[row_idx][position] = strings.get(idx)
+    return [tuple(values) for values in rows]
+
+
+def _decode(attrs, body, epoch, date_styles, duration_styles, shared_refs, row_idx, position):
+    """解码单个单元格（与 openpyxl data_only 读取结果一致）；共享字符串先记录序号，稍后统一填入"""
+    body = body or b""
+    type_match = TYPE_PATTERN.search(attrs)
+    data_type = type_match.group(1) if type_match else b"n"
+    if data_type == b"inlineStr":
+        return _text(body)
+    value_match = VALUE_PATTERN.search(body)
+    if value_match is None or not value_match.group(1):
+        return None
+    raw = value_match.group(1)
+    if data_type == b"n":
+        text = raw.decode()
+        value = float(text) if "." in text or "E" in text or "e" in text else int(text)
+        style_match = STYLE_PATTERN.search(attrs)
+        style = int(style_match.group(1)) if style_match else 0
+        if style in date_styles:
+            try:
+                return from_excel(value, epoch, timedelta=style in duration_styles)
+            except (OverflowError, ValueError):
+                return "#VALUE!"
+        return value
+    if data_type == b"s":
+        shared_refs.append((row_idx, position, int(raw)))
+        return None
+    if data_type == b"b":
+        return bool(int(raw))
+    if data_type == b"d":
+        return from_ISO8601(raw.decode())
+    return html.unescape(raw.decode("utf-8"))  # str（公式字符串结果）、e（错误值）
+
+
+def _shared_strings(archive, book_part, wanted):
+    """流式读取共享字符串表，只保留 wanted 中的序号"""
+    part = _related_part(archive, book_part, "/sharedStrings")
+    strings = {}
+    if part is None:
+        return strings
+    last = max(wanted)
+    idx = 0
+    with archive.open(part) as stream:
+        for chunk in _chunks(stream, SI_END_PATTERN):
+            for match in SI_PATTERN.finditer(chunk):
+                if idx in wanted:
+                    strings[idx] = _text(match.group(1) or b"")
+                idx += 1
+            if idx > last:
+                break
+    return strings
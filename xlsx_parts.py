@@ -0,0 +1,61 @@
+"""
+xlsx 压缩包结构工具
+不经过openpyxl，直接读取 workbook.xml 及其关系文件，
+定位每个工作表对应的 XML 部件路径。
+"""
+import posixpath
+from xml.etree import ElementTree
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_DOC_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+DEFAULT_WORKBOOK_PART = "xl/workbook.xml"
+
+
+def rels_part_of(part):
+    """返回部件对应的关系文件路径（如 xl/_rels/workbook.xml.rels）"""
+    return posixpath.join(posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels")
+
+
+def resolve_target(source_part, target):
+    """把关系文件中的 Target 转换为压缩包内的绝对路径"""
+    if target.startswith("/"):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source_part), target))
+
+
+def workbook_part(archive):
+    """返回工作簿主部件路径"""
+    try:
+        root = ElementTree.fromstring(archive.read("_rels/.rels"))
+    except KeyError:
+        return DEFAULT_WORKBOOK_PART
+    for rel in root.iter(f"{{{NS_PKG_REL}}}Relationship"):
+        if rel.get("Type", "").endswith("/officeDocument"):
+            return resolve_target("", rel.get("Target"))
+    return DEFAULT_WORKBOOK_PART
+
+
+def sheet_parts(archive):
+    """
+    返回各工作表的XML部件路径
+    参数：
+        archive (ZipFile): 已打开的 xlsx 压缩包
+    返回：
+        dict: {工作表名称: 部件路径}，顺序与工作簿中一致
+    """
+    book_part = workbook_part(archive)
+    rels_root = ElementTree.fromstring(archive.read(rels_part_of(book_part)))
+    targets = {
+        rel.get("Id"): rel.get("Target")
+        for rel in rels_root.iter(f"{{{NS_PKG_REL}}}Relationship")
+    }
+
+    parts = {}
+    book_root = ElementTree.fromstring(archive.read(book_part))
+    for sheet in book_root.iter(f"{{{NS_MAIN}}}sheet"):
+        target = targets.get(sheet.get(f"{{{NS_DOC_REL}}}id"))
+        if target:
+            parts[sheet.get("name")] = resolve_target(book_part, target)
+    return parts
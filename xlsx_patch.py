@@ -0,0 +1,561 @@
+"""
+增量保存（只重写被修改的工作表）
+openpyxl 的 save 会重新序列化整个工作簿（样式、未修改的工作表、共享字符串），
+模板较大或文件逐日增长时保存很慢。本模块记录对工作簿的单元格修改，保存时：
+
+- 只解压并改写被修改工作表的 XML（按行/单元格原位替换，其余内容保持原样）
+- 其他压缩包成员按压缩后的原始字节直接复制，不解压也不重新压缩
+- 受修改影响的公式由 formula_eval 增量计算并写入缓存值，data_only 读取时得到新结果
+- 删除 calcChain.xml 并设置 fullCalcOnLoad，打开时由Excel重新计算（与openpyxl保存的效果一致）
+- 先写入同目录临时文件再替换目标（退回完整保存时同样如此），源文件与目标相同时也能安全覆盖
+
+用法：加载后调用 track 登记源文件，所有修改经由 set_value/record 记录，最后用 save 保存。
+遇到无法增量处理的情况（源文件已变化、共享公式主单元格、不支持的值类型等）
+自动退回 openpyxl 的完整保存（openpyxl 不写公式缓存值，退回后再补写受修改影响的公式结果，
+其余公式在Excel中打开保存前 data_only 读取为空）。
+"""
+import contextlib
+import math
+import os
+import re
+import struct
+import sys
+import tempfile
+import weakref
+import zipfile
+import zlib
+from xml.sax.saxutils import escape
+
+from openpyxl.utils.cell import coordinate_to_tuple, get_column_letter, range_boundaries
+
+import formula_eval
+import instrumentation
+from xlsx_parts import rels_part_of, resolve_target, sheet_parts, workbook_part
+
+CONTENT_TYPES_PART = "[Content_Types].xml"
+CALC_CHAIN_TYPE = "/calcChain"
+
+# 工作表XML中的结构（兼容带命名空间前缀的写法）
+SHEET_DATA_PATTERN = re.compile(rb'<((?:\w+:)?)sheetData\b[^>]*?(/?)>')
+ROW_PATTERN = re.compile(rb'<(?:\w+:)?row\b[^>]*?\br="(\d+)"[^>]*?(/?)>')
+ROW_TAG_PATTERN = re.compile(rb'<(?:\w+:)?row[\s>/]')
+CELL_PATTERN = re.compile(
+    rb'<(?:\w+:)?c\b[^>]*?\br="([A-Z]+)(\d+)"[^>]*?(?:/>|>.*?</(?:\w+:)?c>)', re.S
+)
+CELL_TAG_PATTERN = re.compile(rb'<(?:\w+:)?c[\s>/]')
+STYLE_PATTERN = re.compile(rb'\bs="(\d+)"')
+SPANS_PATTERN = re.compile(rb'\s+spans="[^"]*"')
+SHARED_MASTER_PATTERN = re.compile(rb'<(?:\w+:)?f\b[^>]*?\bt="(?:shared|array)"[^>]*?\bref="')
+FORMULA_PATTERN = re.compile(rb'<(?:\w+:)?f\b[^>]*?(?:/>|>.*?</(?:\w+:)?f>)', re.S)
+VALUE_PATTERN = re.compile(rb'<(?:\w+:)?v\b[^>]*?(?:/>|>.*?</(?:\w+:)?v>)', re.S)
+TYPE_PATTERN = re.compile(rb'\s+t="[^"]*"')
+DIMENSION_PATTERN = re.compile(rb'(<(?:\w+:)?dimension\b[^>]*?\bref=")([^"]+)(")')
+ILLEGAL_CHARACTERS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# workbook.xml 的计算设置，以及位于 calcPr 之后的元素（calcPr 不存在时插入到第一个之前）
+CALC_PR_PATTERN = re.compile(rb'<((?:\w+:)?)calcPr\b([^>]*?)(?:/>|>\s*</(?:\w+:)?calcPr>)')
+AFTER_CALC_PR_PATTERN = re.compile(
+    rb'<(?:\w+:)?(?:oleSize|customWorkbookViews|pivotCaches|smartTagPr|smartTagTypes|'
+    rb'webPublishing|fileRecoveryPr|webPublishObjects|extLst)\b|</(?:\w+:)?workbook>'
+)
+RELATIONSHIP_PATTERN = re.compile(rb'<(?:\w+:)?Relationship\b[^>]*?/>')
+
+# ZIP 结构（只处理非 ZIP64、未加密的压缩包，xlsx 通常如此）
+LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+END_RECORD = struct.Struct("<4s4H2LH")
+FLAG_ENCRYPTED = 0x1
+FLAG_DATA_DESCRIPTOR = 0x8
+FLAG_UTF8 = 0x800
+ZIP64_LIMIT = 0xFFFFFFFF
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# 工作簿 → 修改记录（工作簿被回收时记录随之释放）
+_patches = weakref.WeakKeyDictionary()
+
+
+class PatchError(Exception):
+    """无法增量保存（调用方应退回完整保存）"""
+
+
+class WorkbookPatch:
+    """单个工作簿的修改记录"""
+
+    def __init__(self, source_path):
+        self.source_path = os.path.abspath(source_path)
+        stat = os.stat(self.source_path)
+        self.signature = (stat.st_size, stat.st_mtime_ns)
+        self.changes = {}  # {工作表名称: {(行, 列): 值}}
+
+    def record(self, title, row, column, value):
+        self.changes.setdefault(title, {})[(row, column)] = value
+
+    def source_changed(self):
+        """源文件自加载后是否被修改过"""
+        try:
+            stat = os.stat(self.source_path)
+        except OSError:
+            return True
+        return (stat.st_size, stat.st_mtime_ns) != self.signature
+
+
+def track(wb, source_path):
+    """
+    登记工作簿的源文件，开始记录修改
+    参数：
+        wb (Workbook): 由 source_path 加载的工作簿（非只读模式）
+        source_path (str): 源文件路径
+    返回：
+        WorkbookPatch: 修改记录
+    """
+    patch = _patches[wb] = WorkbookPatch(source_path)
+    return patch
+
+
+def record(ws, row, column, value):
+    """记录单元格修改（工作簿未登记时不做任何事）"""
+    patch = _patches.get(ws.parent)
+    if patch is not None:
+        patch.record(ws.title, row, column, value)
+
+
+def set_value(ws, cell_address, value):
+    """写入单元格并记录修改"""
+    row, column = coordinate_to_tuple(cell_address)
+    ws.cell(row=row, column=column).value = value
+    record(ws, row, column, value)
+
+
+def set_block(ws, first_row, first_column, rows):
+    """
+    写入一块矩形区域并记录修改（同一工作簿只查找一次修改记录）
+    参数：
+        first_row, first_column (int): 区域左上角
+        rows (list): 各行的值序列
+    """
+    patch = _patches.get(ws.parent)
+    for row, values in enumerate(rows, first_row):
+        for column, value in enumerate(values, first_column):
+            ws.cell(row=row, column=column).value = value
+            if patch is not None:
+                patch.record(ws.title, row, column, value)
+
+
+def save(wb, file_path):
+    """
+    保存工作簿：已登记的工作簿增量保存，否则（或增量保存失败时）完整保存
+    参数：
+        wb (Workbook): 工作簿
+        file_path (str): 保存路径（可以与源文件相同）
+    """
+    patch = _patches.get(wb)
+    if patch is None:
+        save_atomic(wb, file_path)
+        return
+    results = formula_eval.recalculate(wb, patch.changes)
+    try:
+        write_patched(patch, file_path, results)
+    except PatchError as e:
+        print(f"[提示] 无法增量保存（{str(e)}），改为完整保存")
+        save_atomic(wb, file_path)
+        _write_results(file_path, results)
+    _patches[wb] = WorkbookPatch(file_path)  # 之后的修改以新文件为基准
+
+
+def save_atomic(wb, file_path):
+    """
+    openpyxl 完整保存：先写同目录临时文件再替换，中途出错时原文件不受影响
+    注意：openpyxl 保存时不写公式的缓存值，data_only 读取新文件中的公式得到None，
+    直到在Excel中打开并保存一次；save 退回完整保存时会用 _write_results 补写受修改影响的公式结果
+    """
+    with _temp_target(file_path) as temp_path:
+        wb.save(temp_path)
+
+
+def _write_results(file_path, results):
+    """完整保存后补写公式缓存值（只含 formula_eval 算出的公式，其余公式仍没有缓存值）"""
+    if not results:
+        return
+    try:
+        write_patched(WorkbookPatch(file_path), file_path, results)
+    except PatchError as e:
+        print(f"[提示] 未能写入公式计算结果（{str(e)}），在Excel中打开并保存一次后才能读取公式结果")
+
+
+@contextlib.contextmanager
+def _temp_target(file_path):
+    """提供同目录临时文件路径，退出时替换目标文件（出错时删除临时文件）"""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(suffix=".tmp", prefix=".patch_", dir=directory)
+    os.close(fd)
+    try:
+        yield temp_path
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_patched(patch, file_path, results=None):
+    """
+    按修改记录生成新文件
+    参数：
+        patch (WorkbookPatch): 修改记录
+        file_path (str): 保存路径
+        results (dict): 公式计算结果 {工作表名称: {(行, 列): 值}}，写为公式单元格的缓存值
+    异常：
+        PatchError: 无法增量保存（目标文件未被改动）
+    """
+    if patch.source_changed():
+        raise PatchError("源文件在加载后已被修改")
+    try:
+        archive = zipfile.ZipFile(patch.source_path)
+    except zipfile.BadZipFile as e:
+        raise PatchError(str(e))
+
+    with archive, open(patch.source_path, "rb") as source:
+        infos = archive.infolist()
+        for info in infos:
+            if info.flag_bits & FLAG_ENCRYPTED:
+                raise PatchError("压缩包已加密")
+            if max(info.file_size, info.compress_size, info.header_offset) >= ZIP64_LIMIT:
+                raise PatchError("不支持 ZIP64 压缩包")
+
+        # 先在内存中生成所有需要改写的部件，出错时不产生任何文件
+        parts = sheet_parts(archive)
+        results = results or {}
+        replaced = {}
+        for title in {**patch.changes, **results}:
+            if title not in parts:
+                raise PatchError(f"工作表 {title} 不在源文件中")
+            part = parts[title]
+            replaced[part] = patch_sheet_xml(
+                archive.read(part), patch.changes.get(title, {}), title, results.get(title)
+            )
+        removed = _drop_calc_chain(archive, replaced)
+
+        with _temp_target(file_path) as temp_path, open(temp_path, "wb") as output:
+            writer = _ZipWriter(output)
+            for info in infos:
+                if info.filename in removed:
+                    continue
+                if info.filename in replaced:
+                    writer.write(info, replaced[info.filename])
+                else:
+                    writer.copy(source, info)
+            writer.close()
+
+
+def _drop_calc_chain(archive, replaced):
+    """
+    删除计算链并设置打开时全部重算（单元格修改后原计算链可能失效）
+    改写后的 workbook.xml、关系文件与 [Content_Types].xml 放入 replaced，
+    返回需要删除的部件集合
+    """
+    book_part = workbook_part(archive)
+    book_xml = archive.read(book_part)
+    match = CALC_PR_PATTERN.search(book_xml)
+    if match:
+        attributes = re.sub(rb'\s+fullCalcOnLoad="[^"]*"', b"", match.group(2)).rstrip()
+        calc_pr = b"<%scalcPr%s fullCalcOnLoad=\"1\"/>" % (match.group(1), attributes)
+        replaced[book_part] = book_xml[:match.start()] + calc_pr + book_xml[match.end():]
+    else:
+        position = AFTER_CALC_PR_PATTERN.search(book_xml)
+        if position is None:
+            raise PatchError("workbook.xml 结构无法识别")
+        prefix = re.match(rb'</?((?:\w+:)?)', book_xml[position.start():]).group(1)
+        calc_pr = b'<%scalcPr fullCalcOnLoad="1"/>' % prefix
+        replaced[book_part] = book_xml[:position.start()] + calc_pr + book_xml[position.start():]
+
+    rels_part = rels_part_of(book_part)
+    rels_xml = archive.read(rels_part)
+    removed = set()
+    for rel in RELATIONSHIP_PATTERN.finditer(rels_xml):
+        if re.search(rb'\bType="[^"]*%s"' % CALC_CHAIN_TYPE.encode(), rel.group(0)):
+            target = re.search(rb'\bTarget="([^"]+)"', rel.group(0)).group(1).decode()
+            removed.add(resolve_target(book_part, target))
+            rels_xml = rels_xml.replace(rel.group(0), b"")
+    if removed:
+        replaced[rels_part] = rels_xml
+        types_xml = archive.read(CONTENT_TYPES_PART)
+        for part in removed:
+            pattern = rb'<(?:\w+:)?Override\b[^>]*?\bPartName="/%s"[^>]*?/>' % re.escape(part.encode())
+            types_xml = re.sub(pattern, b"", types_xml)
+        replaced[CONTENT_TYPES_PART] = types_xml
+    return removed
+
+
+def patch_sheet_xml(xml, changes, title="", results=None):
+    """
+    在工作表XML中原位替换单元格
+    参数：
+        xml (bytes): 工作表部件内容
+        changes (dict): {(行, 列): 值}
+        title (str): 工作表名称（用于错误提示）
+        results (dict): 公式计算结果 {(行, 列): 值}，只更新公式单元格的缓存值
+    返回：
+        bytes: 修改后的内容
+    """
+    data = SHEET_DATA_PATTERN.search(xml)
+    if data is None:
+        raise PatchError(f"工作表 {title} 中没有 sheetData")
+    prefix = data.group(1)
+    if data.group(2):  # <sheetData/>：空表
+        open_tag = xml[data.start():data.end() - 2] + b">"
+        xml = xml[:data.start()] + open_tag + b"</%ssheetData>" % prefix + xml[data.end():]
+        data_start = data.start() + len(open_tag)
+        data_end = data_start
+    else:
+        data_start = data.end()
+        data_end = xml.index(b"</%ssheetData>" % prefix, data_start)
+
+    # 现有行的位置（行号须带 r 属性且升序，否则无法定位）
+    numbers, starts = [], []
+    for match in ROW_PATTERN.finditer(xml, data_start, data_end):
+        numbers.append(int(match.group(1)))
+        starts.append(match)
+    if len(numbers) != len(ROW_TAG_PATTERN.findall(xml, data_start, data_end)):
+        raise PatchError(f"工作表 {title} 中存在缺少行号的行")
+    if any(a >= b for a, b in zip(numbers, numbers[1:])):
+        raise PatchError(f"工作表 {title} 的行未按顺序排列")
+
+    by_row = {}
+    for (row, column), value in changes.items():
+        by_row.setdefault(row, ({}, {}))[0][column] = value
+    for (row, column), value in (results or {}).items():
+        by_row.setdefault(row, ({}, {}))[1][column] = value
+
+    pieces = [xml[:data_start]]
+    cursor = data_start
+    index = 0
+    for row in sorted(by_row):
+        while index < len(numbers) and numbers[index] < row:
+            index += 1
+        if index < len(numbers) and numbers[index] == row:
+            match = starts[index]
+            if match.group(2):
+                end = match.end()
+                open_tag = match.group(0)[:-2] + b">"
+                inner = b""
+            else:
+                end_tag = b"</%srow>" % prefix
+                close = xml.index(end_tag, match.end())
+                end = close + len(end_tag)
+                open_tag = match.group(0)
+                inner = xml[match.end():close]
+            pieces.append(xml[cursor:match.start()])
+            pieces.append(_patch_row(prefix, row, SPANS_PATTERN.sub(b"", open_tag), inner, *by_row[row], title))
+            cursor = end
+        else:
+            position = starts[index].start() if index < len(numbers) else data_end
+            pieces.append(xml[cursor:position])
+            pieces.append(_patch_row(prefix, row, b'<%srow r="%d">' % (prefix, row), b"", *by_row[row], title))
+            cursor = position
+    pieces.append(xml[cursor:])
+    return _update_dimension(b"".join(pieces), changes)
+
+
+def _patch_row(prefix, row, open_tag, inner, changes, results, title):
+    """替换/插入一行中的单元格、更新公式缓存值，返回整行XML"""
+    cells = list(CELL_PATTERN.finditer(inner))
+    if len(cells) != len(CELL_TAG_PATTERN.findall(inner)):
+        raise PatchError(f"工作表 {title} 第{row}行存在缺少坐标的单元格")
+    if CELL_PATTERN.sub(b"", inner).strip():
+        raise PatchError(f"工作表 {title} 第{row}行包含无法识别的内容")
+
+    existing = {}
+    for match in cells:
+        if int(match.group(2)) != row:
+            raise PatchError(f"工作表 {title} 第{row}行的单元格坐标不一致")
+        existing[_column_index(match.group(1))] = match.group(0)
+
+    for column, value in changes.items():
+        old = existing.get(column)
+        style = None
+        if old is not None:
+            if SHARED_MASTER_PATTERN.search(old):
+                raise PatchError(f"工作表 {title} 的 {get_column_letter(column)}{row} 是共享公式或数组公式的主单元格")
+            style_match = STYLE_PATTERN.search(old[:old.index(b">")])
+            style = style_match.group(1) if style_match else None
+        cell = _cell_xml(prefix, f"{get_column_letter(column)}{row}", style, value)
+        if cell is None:
+            existing.pop(column, None)
+        else:
+            existing[column] = cell
+
+    for column, value in results.items():
+        if column in existing:
+            existing[column] = _with_result(prefix, existing[column], value)
+
+    body = b"".join(existing[column] for column in sorted(existing))
+    return open_tag + body + b"</%srow>" % prefix
+
+
+def _cell_xml(prefix, reference, style, value):
+    """
+    生成单元格XML（字符串写为内联字符串，不改动共享字符串表）
+    返回：
+        bytes: 单元格XML；值为None且无样式时返回None（删除该单元格）
+    """
+    p = prefix.decode()
+    attributes = f' r="{reference}"'
+    if style is not None:
+        attributes += f' s="{style.decode()}"'
+
+    if value is None:
+        if style is None:
+            return None
+        return f"<{p}c{attributes}/>".encode("utf-8")
+    if isinstance(value, bool):
+        attributes += ' t="b"'
+        body = f"<{p}v>{int(value)}</{p}v>"
+    elif isinstance(value, (int, float)):
+        if isinstance(value, float) and not math.isfinite(value):
+            raise PatchError(f"{reference} 的值不是有效数字：{value!r}")
+        body = f"<{p}v>{value!r}</{p}v>"
+    elif isinstance(value, str):
+        if ILLEGAL_CHARACTERS.search(value):
+            raise PatchError(f"{reference} 的文本包含非法字符")
+        if value.startswith("=") and len(value) > 1:  # 与openpyxl一致：以=开头视为公式
+            body = f"<{p}f>{escape(value[1:])}</{p}f>"
+        else:
+            attributes += ' t="inlineStr"'
+            body = f'<{p}is><{p}t xml:space="preserve">{escape(value)}</{p}t></{p}is>'
+    else:
+        raise PatchError(f"{reference} 的值类型不支持增量保存：{type(value).__name__}")
+    return f"<{p}c{attributes}>{body}</{p}c>".encode("utf-8")
+
+
+def _with_result(prefix, cell, value):
+    """为公式单元格写入（或替换）缓存值，公式本身保持原样"""
+    formula = FORMULA_PATTERN.search(cell)
+    if formula is None:
+        return cell
+    p = prefix.decode()
+    if isinstance(value, formula_eval.ExcelError):
+        cell_type, text = "e", value.code
+    elif isinstance(value, bool):
+        cell_type, text = "b", str(int(value))
+    elif isinstance(value, (int, float)):
+        if isinstance(value, float) and not math.isfinite(value):
+            return cell
+        cell_type, text = None, repr(value)
+    elif isinstance(value, str):
+        if ILLEGAL_CHARACTERS.search(value):
+            return cell
+        cell_type, text = "str", escape(value)
+    else:
+        return cell
+
+    open_end = cell.index(b">") + 1
+    open_tag = TYPE_PATTERN.sub(b"", cell[:open_end])
+    if cell_type is not None:
+        open_tag = open_tag[:-1] + f' t="{cell_type}">'.encode()
+    body = VALUE_PATTERN.sub(b"", cell[open_end:formula.start()] + cell[formula.end():cell.rindex(b"</")])
+    value_xml = f"<{p}v>{text}</{p}v>".encode("utf-8")
+    return open_tag + formula.group(0) + value_xml + body + b"</%sc>" % prefix
+
+
+def _update_dimension(xml, changes):
+    """把写入了值的单元格纳入 dimension 范围（只读模式按它确定行列数）"""
+    cells = [key for key, value in changes.items() if value is not None]
+    match = DIMENSION_PATTERN.search(xml)
+    if not cells or match is None:
+        return xml
+    try:
+        min_col, min_row, max_col, max_row = range_boundaries(match.group(2).decode())
+    except ValueError:
+        return xml
+    rows = [row for row, _ in cells]
+    columns = [column for _, column in cells]
+    min_row, max_row = min(min_row or 1, *rows), max(max_row or 1, *rows)
+    min_col, max_col = min(min_col or 1, *columns), max(max_col or 1, *columns)
+    reference = f"{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{max_row}"
+    return xml[:match.start(2)] + reference.encode() + xml[match.end(2):]
+
+
+def _column_index(letters):
+    index = 0
+    for char in letters:
+        index = index * 26 + char - 64
+    return index
+
+
+class _ZipWriter:
+    """
+    最小的ZIP写入器：未修改的成员直接复制压缩后的原始字节，
+    改写的成员重新压缩（deflate）
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.entries = []  # 中央目录条目参数
+
+    def copy(self, source, info):
+        """从源压缩包复制成员的原始压缩数据"""
+        source.seek(info.header_offset)
+        header = source.read(LOCAL_HEADER.size)
+        if len(header) != LOCAL_HEADER.size or header[:4] != b"PK\x03\x04":
+            raise PatchError(f"压缩包成员 {info.filename} 的本地头损坏")
+        name_length, extra_length = struct.unpack("<2H", header[26:30])
+        source.seek(info.header_offset + LOCAL_HEADER.size + name_length + extra_length)
+        self._write_header(info, info.compress_type, info.CRC, info.compress_size, info.file_size)
+        remaining = info.compress_size
+        while remaining:
+            chunk = source.read(min(COPY_CHUNK_SIZE, remaining))
+            if not chunk:
+                raise PatchError(f"压缩包成员 {info.filename} 的数据不完整")
+            self.fp.write(chunk)
+            remaining -= len(chunk)
+
+    def write(self, info, data):
+        """写入新内容（沿用原成员的名称、时间与属性）"""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        self._write_header(info, zipfile.ZIP_DEFLATED, zlib.crc32(data), len(compressed), len(data))
+        self.fp.write(compressed)
+
+    def _write_header(self, info, method, crc, compress_size, file_size):
+        name, flags = _encode_name(info)
+        flags |= info.flag_bits & ~(FLAG_DATA_DESCRIPTOR | FLAG_UTF8 | 0x6)  # 压缩级别标志随方法重置
+        dos_time = (info.date_time[3] << 11) | (info.date_time[4] << 5) | (info.date_time[5] // 2)
+        dos_date = ((info.date_time[0] - 1980) << 9) | (info.date_time[1] << 5) | info.date_time[2]
+        offset = self.fp.tell()
+        self.fp.write(LOCAL_HEADER.pack(
+            b"PK\x03\x04", 20, 0, flags, method, dos_time, dos_date,
+            crc, compress_size, file_size, len(name), 0,
+        ))
+        self.fp.write(name)
+        self.entries.append((name, flags, method, dos_time, dos_date, crc, compress_size, file_size,
+                             info.internal_attr, info.external_attr, offset, info.create_system))
+
+    def close(self):
+        """写出中央目录与结束记录"""
+        directory_offset = self.fp.tell()
+        for (name, flags, method, dos_time, dos_date, crc, compress_size, file_size,
+             internal_attr, external_attr, offset, create_system) in self.entries:
+            self.fp.write(CENTRAL_HEADER.pack(
+                b"PK\x01\x02", 20, create_system, 20, 0, flags, method, dos_time, dos_date,
+                crc, compress_size, file_size, len(name), 0, 0, 0,
+                internal_attr, external_attr, offset,
+            ))
+            self.fp.write(name)
+        directory_size = self.fp.tell() - directory_offset
+        if directory_offset >= ZIP64_LIMIT or len(self.entries) >= 0xFFFF:
+            raise PatchError("生成的压缩包超出普通ZIP的限制")
+        self.fp.write(END_RECORD.pack(
+            b"PK\x05\x06", 0, 0, len(self.entries), len(self.entries), directory_size, directory_offset, 0,
+        ))
+
+
+def _encode_name(info):
+    """成员名称编码（非ASCII名称使用UTF-8并设置对应标志）"""
+    try:
+        return info.filename.encode("ascii"), 0
+    except UnicodeEncodeError:
+        return info.filename.encode("utf-8"), FLAG_UTF8
+
+
+# 性能分析时计时的函数（见 instrumentation）
+instrumentation.register(sys.modules[__name__], "xlsx_patch", ["write_patched"])
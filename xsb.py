@@ -2,34 +2,77 @@ import os
 import re
 from datetime import datetime
 import threading
+import multiprocessing
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor
 from openpyxl import load_workbook
+import product_rules
+import cell_layouts
+import merged_cells
+import xlsx_patch
+from workbook_cache import WorkbookCache, load_input
+from groupon_watermark import WatermarkStore
+from columnar import Column, ColumnTable
+from date_parser import parse_datetime
+from file_detector import FileRule, detect_files, missing_rules
+from store_profiles import DEFAULT_PROFILE, STORE_PROFILES
+import instrumentation
 # 在现有导入部分添加以下两行
 import urllib.request
 import sys
 
+# 产品统计表「销售表」的版式（见 cell_layouts）
+SALES_LAYOUT = "xsb.sales"
+
+# 需要检测的输入文件
+FILE_RULES = [
+    FileRule("groupon", "团购表", regex=r'^\d{4}-\d{2}-\d{2}.*'),
+    FileRule("product", "产品统计表", contains="产品统计表", exclude="_已处理"),
+    FileRule("ranking", "商品排行报表", contains="商品排行报表"),
+]
+
 def set_cell_value(ws, cell_address, value):
     """安全设置单元格值（处理合并单元格）"""
-    target_cell = ws[cell_address]
-    
-    # 检查合并单元格
-    for merged_range in ws.merged_cells.ranges:
-        if target_cell.coordinate in merged_range:
-            top_left_cell = ws.cell(
-                row=merged_range.min_row, 
-                column=merged_range.min_col
-            )
-            if target_cell.coordinate == top_left_cell.coordinate:
-                top_left_cell.value = value
-            return
-    
-    # 普通单元格直接赋值
-    target_cell.value = value
+    row, column, anchor = merged_cells.resolve(ws, cell_address)
+
+    # 合并区域内只有左上角单元格可写，其余位置直接忽略
+    if anchor is None or anchor == (row, column):
+        ws.cell(row=row, column=column).value = value
+        xlsx_patch.record(ws, row, column, value)
+        instrumentation.count("写入单元格数")
+
+def parse_groupon_time(value):
+    """团购表核销时间（datetime单元格或「%Y-%m-%d %H:%M:%S」文本），无法识别时返回None"""
+    if isinstance(value, datetime):
+        return value
+    return parse_datetime(value)
+
+
+def _parse_input_file(method_name, file_path, options):
+    """子进程任务：解析单个输入文件，只回传汇总字典（不回传工作簿对象）"""
+    app = ExcelProcessorApp(**options)
+    result = getattr(app, method_name)(file_path)
+    return result, app.name_normalizer.stats()
 
 class ExcelProcessorApp:
     """Excel文件处理核心类"""
 
-    def __init__(self):
-        """初始化时预加载依赖"""
+    def __init__(self, workbook_cache=None, watermark_store=None, target_date=None, profile=None):
+        """
+        初始化时预加载依赖
+        参数：
+            workbook_cache (WorkbookCache): 输入文件解析缓存，为None时不启用
+            watermark_store (WatermarkStore): 团购表增量水位线，为None时每次全量统计
+            target_date (date): 统计日期（团购核销日期与输出文件名），为None时使用当天
+            profile (StoreProfile): 门店规则（见 store_profiles），为None时使用济南
+        """
+        self.workbook_cache = workbook_cache
+        self.watermark_store = watermark_store
+        self.target_date = target_date
+        self.profile = profile or STORE_PROFILES[DEFAULT_PROFILE]
+        self.summary = None  # 最近一次处理的汇总结果（批处理模式输出）
+        self.rules = product_rules.load()  # 商品名称规则文件（修改后自动重新加载）
+        self.name_normalizer = self.rules.normalizer(self.profile.rule_set)
         threading.Thread(target=self.lazy_import_openpyxl).start()
 
     def lazy_import_openpyxl(self):
@@ -37,52 +80,29 @@ class ExcelProcessorApp:
         global load_workbook
         from openpyxl import load_workbook
 
+    def processing_date(self):
+        """本次处理的统计日期"""
+        return self.target_date or datetime.now().date()
+
     def auto_detect_files(self):
         """自动检测同目录下的三个必要文件"""
         while True:
             os.system('cls' if os.name == 'nt' else 'clear')
             print("正在扫描目录...")
-            current_dir = os.getcwd()
-            files = {
-                "groupon": {"pattern": r'^\d{4}-\d{2}-\d{2}.*', "found": None, "name": "团购表"},
-                "product": {"pattern": "产品统计表", "found": None, "name": "产品统计表"},
-                "ranking": {"pattern": "商品排行报表", "found": None, "name": "商品排行报表"}
-            }
-
-            # 扫描目录并匹配文件
-            for filename in os.listdir(current_dir):
-                filepath = os.path.join(current_dir, filename)
-                if not os.path.isfile(filepath):
-                    continue
-
-                # 团购表匹配
-                if re.match(files["groupon"]["pattern"], filename):
-                    if not files["groupon"]["found"] or \
-                       os.path.getmtime(filepath) > os.path.getmtime(files["groupon"]["found"]):
-                        files["groupon"]["found"] = filepath
-                
-                # 产品统计表匹配
-                if files["product"]["pattern"] in filename and "_已处理" not in filename:
-                    if not files["product"]["found"] or \
-                       os.path.getmtime(filepath) > os.path.getmtime(files["product"]["found"]):
-                        files["product"]["found"] = filepath
-                
-                # 商品排行报表匹配
-                if files["ranking"]["pattern"] in filename:
-                    if not files["ranking"]["found"] or \
-                       os.path.getmtime(filepath) > os.path.getmtime(files["ranking"]["found"]):
-                        files["ranking"]["found"] = filepath
+            # 单次扫描目录并匹配文件
+            files = detect_files(FILE_RULES)
 
             # 检查文件是否齐全
-            missing_files = [f["name"] for f in files.values() if not f["found"]]
+            missing_files = missing_rules(FILE_RULES, files)
             if not missing_files:
                 # 显示检测结果
                 print("\n" + "="*50)
                 print("检测到以下最新文件：")
-                for f_type in files.values():
-                    mtime = datetime.fromtimestamp(os.path.getmtime(f_type["found"]))
-                    print(f"[{f_type['name']}]")
-                    print(f"文件名：{os.path.basename(f_type['found'])}")
+                for rule in FILE_RULES:
+                    found = files[rule.key]
+                    mtime = datetime.fromtimestamp(found.mtime)
+                    print(f"[{rule.name}]")
+                    print(f"文件名：{os.path.basename(found.path)}")
                     print(f"修改时间：{mtime.strftime('%Y-%m-%d %H:%M:%S')}\n")
                 print("="*50)
                 
@@ -90,9 +110,9 @@ class ExcelProcessorApp:
                 choice = input("是否开始处理？(Y/N): ").strip().lower()
                 if choice == 'y':
                     return (
-                        files["ranking"]["found"],  # 商品排行报表
-                        files["product"]["found"],  # 产品统计表
-                        files["groupon"]["found"]   # 团购表
+                        files["ranking"].path,  # 商品排行报表
+                        files["product"].path,  # 产品统计表
+                        files["groupon"].path   # 团购表
                     )
                 else:
                     print("等待重新检测...")
@@ -109,188 +129,357 @@ class ExcelProcessorApp:
                 print("="*50)
                 input("请放置文件后按回车键重新扫描...")
 
-    def process_files(self):
-        """主处理流程"""
+    def process_files(self, parallel=False):
+        """主处理流程（parallel=True 时多进程并行解析输入文件）"""
         try:
             # 自动获取文件路径
             ranking_file, product_file, groupon_file = self.auto_detect_files()
+            self.process_inputs(ranking_file, product_file, groupon_file, parallel)
+        except Exception as e:
+            print(f"\n[处理失败] 发生错误：{str(e)}")
+        finally:
+            input("\n处理完成，按回车键退出...")
 
+    def process_inputs(self, ranking_file, product_file, groupon_file, parallel=False):
+        """
+        处理指定的三个输入文件（无交互，供自动检测与目录监控共用）
+        返回：
+            str: 生成的产品统计表路径
+        """
+        self.refresh_rules()
+        # 单核机器上多进程只会增加开销，自动退回顺序处理
+        if parallel and (os.cpu_count() or 1) > 1:
+            ranking_result, groupon_result, product_wb = self.load_inputs_parallel(
+                ranking_file, groupon_file, product_file
+            )
+            product_sales, e_sales, ranking_collect = ranking_result
+            groupon_sales, groupon_collect = groupon_result
+        else:
             # 处理商品排行报表
             print(f"\n正在处理商品排行报表：{os.path.basename(ranking_file)}")
-            ranking_wb = load_workbook(ranking_file)
-            product_sales, e_sales, ranking_collect = self.merge_product_sales(ranking_wb.active)
+            product_sales, e_sales, ranking_collect = self.merge_ranking_file(ranking_file)
 
             # 处理团购报表
             print(f"正在处理美团团购报表：{os.path.basename(groupon_file)}")
-            groupon_wb = load_workbook(groupon_file)
-            groupon_sales, groupon_collect = self.process_groupon_sales(groupon_wb.active)
+            groupon_sales, groupon_collect = self.process_groupon_file(groupon_file)
 
             # 处理产品统计表（关键修改点）
             print(f"正在处理产品统计表：{os.path.basename(product_file)}")
             product_wb = load_workbook(product_file)
-            product_ws = product_wb["销售表"]
-
-            # 新增总表处理
+            xlsx_patch.track(product_wb, product_file)  # 保存时只重写修改过的工作表
+
+        cache = self.name_normalizer.cache_info()
+        print(f"商品名称缓存：命中 {cache['hits']} 次，未命中 {cache['misses']} 次")
+        return self.write_product_file(
+            product_wb, product_file, (product_sales, e_sales, ranking_collect), (groupon_sales, groupon_collect)
+        )
+
+    def write_product_file(self, product_wb, product_file, ranking_result, groupon_result):
+        """
+        把排行表与团购表的汇总结果写入产品统计表，另存为按统计日期命名的新文件
+        参数：
+            product_wb: 已加载（并已 xlsx_patch.track）的产品统计表工作簿
+            ranking_result (tuple): merge_ranking_file 的结果 (product_sales, e_sales, collect_sales)
+            groupon_result (tuple): 团购汇总结果 (groupon_sales, collect_sales)
+        返回：
+            str: 生成的产品统计表路径
+        """
+        product_sales, e_sales, ranking_collect = ranking_result
+        groupon_sales, groupon_collect = groupon_result
+        product_ws = product_wb["销售表"]
+
+        # 收藏炒酸奶合计写入总表
+        summary_ws = None
+        if self.profile.collect_cell:
             if "总表" not in product_wb.sheetnames:
                 raise Exception("产品统计表中缺少'总表'工作表")
             summary_ws = product_wb["总表"]
 
-            # 更新数据（传入总表对象）
-            self.update_product_sales(
-                product_ws=product_ws,
-                summary_ws=summary_ws,  # 新增参数
-                product_sales=product_sales,
-                e_sales=e_sales,
-                groupon_sales=groupon_sales,
-                ranking_collect=ranking_collect,
-                groupon_collect=groupon_collect
-            )
-
-
-            # 生成基于当前日期的新文件名
-            today = datetime.now()
-            base_name = f"济南 产品统计表{today.month}-{today.day}"
+        # 更新数据（传入总表对象）
+        self.update_product_sales(
+            product_ws=product_ws,
+            summary_ws=summary_ws,
+            product_sales=product_sales,
+            e_sales=e_sales,
+            groupon_sales=groupon_sales,
+            ranking_collect=ranking_collect,
+            groupon_collect=groupon_collect
+        )
+        self.summary = {
+            "product_sales": product_sales,
+            "e_sales": e_sales,
+            "groupon_sales": groupon_sales,
+            "ranking_collect": ranking_collect,
+            "groupon_collect": groupon_collect,
+            "rules_version": self.rules.version,
+            "unknown_names": self.report_unknown_names(),
+        }
+
+        # 生成基于统计日期的新文件名
+        today = self.processing_date()
+        base_name = f"{self.profile.city} 产品统计表{today.month}-{today.day}"
+        new_filename = f"{base_name}.xlsx"
+        new_file_path = os.path.join(os.path.dirname(product_file), new_filename)
+
+        # 处理文件重名
+        if os.path.exists(new_file_path):
+            base_name += "_已处理"
             new_filename = f"{base_name}.xlsx"
             new_file_path = os.path.join(os.path.dirname(product_file), new_filename)
 
-            # 处理文件重名
-            if os.path.exists(new_file_path):
-                base_name += "_已处理"
-                new_filename = f"{base_name}.xlsx"
+            # 处理多次重复
+            counter = 1
+            while os.path.exists(new_file_path):
+                new_filename = f"{base_name}({counter}).xlsx"
                 new_file_path = os.path.join(os.path.dirname(product_file), new_filename)
+                counter += 1
+
+        xlsx_patch.save(product_wb, new_file_path)
+        print(f"\n[成功] 文件已保存至：{new_file_path}")
+        return new_file_path
+
+    def load_inputs_parallel(self, ranking_file, groupon_file, product_file):
+        """
+        并行加载三个输入文件
+        排行表与团购表在子进程中解析并汇总，只回传结果字典；
+        产品统计表需要修改后保存，在主进程中同时加载。
+        返回：
+            (排行表汇总结果, 团购表汇总结果, 产品统计表工作簿)
+        """
+        print(f"\n正在并行处理商品排行报表：{os.path.basename(ranking_file)}")
+        print(f"正在并行处理美团团购报表：{os.path.basename(groupon_file)}")
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            ranking_job = pool.submit(
+                _parse_input_file, "merge_ranking_file", ranking_file, self._worker_options()
+            )
+            groupon_job = pool.submit(
+                _parse_input_file, "process_groupon_file", groupon_file, self._worker_options()
+            )
 
-                # 处理多次重复
-                counter = 1
-                while os.path.exists(new_file_path):
-                    new_filename = f"{base_name}({counter}).xlsx"
-                    new_file_path = os.path.join(os.path.dirname(product_file), new_filename)
-                    counter += 1
-
-            product_wb.save(new_file_path)
-            print(f"\n[成功] 文件已保存至：{new_file_path}")
-
-        except Exception as e:
-            print(f"\n[处理失败] 发生错误：{str(e)}")
+            print(f"正在处理产品统计表：{os.path.basename(product_file)}")
+            product_wb = load_workbook(product_file)
+            xlsx_patch.track(product_wb, product_file)  # 保存时只重写修改过的工作表
+
+            results = []
+            for job in (ranking_job, groupon_job):
+                result, cache = job.result()
+                # 合并子进程的名称缓存与未匹配名称统计，便于统一输出
+                self.name_normalizer.merge(cache)
+                results.append(result)
+        return results[0], results[1], product_wb
+
+    def _worker_options(self):
+        """子进程中重建处理对象所需的构造参数"""
+        return {
+            "workbook_cache": self.workbook_cache,
+            "watermark_store": self.watermark_store,
+            "target_date": self.target_date,
+            "profile": self.profile,
+        }
+
+    def iter_ranking_rows(self, ws):
+        """按列投影读取商品排行报表（仅取C/E/F列，单次遍历）"""
+        # C=商品名称 D=(跳过) E=渠道 F=销量
+        for raw_name, _, e_type, quantity in ws.iter_rows(
+            min_row=2, min_col=3, max_col=6, values_only=True
+        ):
+            yield raw_name or "", e_type or "", quantity
+
+    def merge_ranking_file(self, file_path):
+        """流式处理商品排行报表（只读模式打开，不整表加载）"""
+        ranking_wb = load_input(file_path, self.workbook_cache, read_only=True)
+        try:
+            return self.merge_product_sales(ranking_wb.active)
         finally:
-            input("\n处理完成，按回车键退出...")
+            ranking_wb.close()  # 只读模式需显式释放文件句柄
 
     def merge_product_sales(self, ws):
         """处理商品排行报表数据（新增收藏炒酸奶处理）"""
-        product_sales = {}
+        return self._merge_ranking_rows(self.iter_ranking_rows(ws))
+
+    def _merge_ranking_rows(self, rows):
+        """汇总(商品名称, 渠道, 销量)行数据，返回(product_sales, e_sales, collect_sales)"""
+        table = ColumnTable.from_rows(rows, {"商品名称": 0, "渠道": 1, "销量": 2})
+        instrumentation.count("排行报表扫描行数", len(table))
+        # 商品分类与名称标准化按不同名称各计算一次
+        kinds = table["商品名称"].map(self.classify_product)
+        quantity = Column(table["销量"].numbers(self.parse_quantity)).multiply(kinds.map(itemgetter(1)))
+        table = table.with_column("标准名称", kinds.map(itemgetter(0))).with_column("数量", quantity)
+
+        # 未匹配规则的名称按行数计入报告
+        for product_name, rows in table.group_count("标准名称").items():
+            self.name_normalizer.tally(product_name, rows)
+
+        # 收藏炒酸奶单独统计，不参与商品与渠道汇总
+        is_collect = kinds.where(itemgetter(2))
+        collect_sales = table.filter(is_collect)["数量"].sum()
+        table = table.filter(~is_collect)
+
+        # 销量累加
+        product_sales = table.filter(table["标准名称"].where(bool)).group_sum("标准名称", "数量")
+
+        # 渠道分类
         e_sales = {'饿了么外卖': {}, '美团外卖': {}}
-        collect_sales = 0  # 新增收藏炒酸奶销量统计
-
-        for row in range(2, ws.max_row + 1):
-            # 原始数据提取
-            raw_name = ws[f'C{row}'].value or ""
-            original_quantity = self.parse_quantity(ws[f'F{row}'].value)
-            e_type = ws[f'E{row}'].value or ""
-            quantity = original_quantity
-            product_name = None
-
-            # 处理鲜牛奶的特殊情况
-            if "鲜" in raw_name and "牛奶" in raw_name:
-                match = re.search(r'(\d+)(包|次|份)', raw_name)
-                if match:
-                    multiplier = int(match.group(1))
-                    quantity = original_quantity * multiplier
-                product_name = "鲜牛奶"
-            else:
-                # 修改后的炒酸奶处理逻辑
-                if "炒酸奶" in raw_name:
-                    if "收藏" in raw_name:  # 新增收藏判断
-                        quantity = original_quantity * 2
-                        collect_sales += quantity  # 累计收藏版销量
-                        continue  # 跳过后续渠道分类
-                    else:
-                        quantity = original_quantity * 10
-                # 标准化商品名称
-                product_name = self.normalize_product_name(raw_name)
-
-            # 销量累加
-            if product_name:
-                product_sales[product_name] = product_sales.get(product_name, 0) + quantity
-
-            # 渠道分类
-            if "未映射饿了么" in str(e_type):
-                e_sales['饿了么外卖'][product_name] = e_sales['饿了么外卖'].get(product_name, 0) + quantity
-            elif "未映射美团" in str(e_type):
-                e_sales['美团外卖'][product_name] = e_sales['美团外卖'].get(product_name, 0) + quantity
+        channel = table["渠道"].map(self.delivery_channel)
+        table = table.with_column("外卖渠道", channel).filter(channel.where(bool))
+        for (channel_name, product_name), total in table.group_sum(["外卖渠道", "标准名称"], "数量").items():
+            e_sales[channel_name][product_name] = total
 
         return product_sales, e_sales, collect_sales
 
-    def process_groupon_sales(self, ws):
-        """处理团购报表数据（新增收藏炒酸奶处理）"""
-        headers = {cell.value: cell.column_letter for cell in ws[1]}
-        required_cols = ['核销时间', '商品名称', '验证门店']
-        collect_sales = 0  # 新增收藏炒酸奶统计
-        groupon_sales = {}
-        today = datetime.now().date()
-
-        for row in range(2, ws.max_row + 1):
-            # 日期过滤
-            date_val = ws[f"{headers['核销时间']}{row}"].value
-            if not isinstance(date_val, datetime):
-                try:
-                    date_val = datetime.strptime(date_val, "%Y-%m-%d %H:%M:%S")
-                except (ValueError, TypeError):
-                    continue
-            if date_val.date() != today:
-                continue
+    def classify_product(self, raw_name):
+        """
+        商品分类（鲜牛奶按包数折算、炒酸奶按份折算、收藏炒酸奶单列）
+        返回：
+            (标准名称, 数量倍数, 是否收藏炒酸奶)
+        """
+        # 处理鲜牛奶的特殊情况
+        if "鲜" in raw_name and "牛奶" in raw_name:
+            match = re.search(r'(\d+)(包|次|份)', raw_name)
+            return "鲜牛奶", int(match.group(1)) if match else 1, False
+        # 修改后的炒酸奶处理逻辑
+        if "炒酸奶" in raw_name:
+            if "收藏" in raw_name and self.profile.split_collect:  # 新增收藏判断
+                return None, 2, True
+            return self.normalize_product_name(raw_name), 10, False
+        # 标准化商品名称
+        return self.normalize_product_name(raw_name), 1, False
+
+    def delivery_channel(self, e_type):
+        """外卖渠道（非外卖返回None）"""
+        if "未映射饿了么" in str(e_type):
+            return '饿了么外卖'
+        if "未映射美团" in str(e_type):
+            return '美团外卖'
+        return None
+
+    def process_groupon_file(self, file_path):
+        """加载团购报表并汇总（启用水位线时只累计新增行）"""
+        watermark = None
+        if self.watermark_store is not None:
+            watermark = self.watermark_store.open(file_path, f"xsb:{self.profile.key}", self.processing_date())
+
+        groupon_wb = load_input(file_path, self.workbook_cache, read_only=True)
+        try:
+            result = self.process_groupon_sales(groupon_wb.active, watermark)
+        finally:
+            groupon_wb.close()
+
+        if watermark is not None:
+            print(f"团购表增量处理：新增 {watermark.new_rows} 行，跳过已处理 {watermark.skipped_rows} 行")
+        return result
+
+    def process_groupon_sales(self, ws, watermark=None):
+        """
+        处理团购报表数据（新增收藏炒酸奶处理）
+        参数：
+            watermark (GrouponWatermark): 增量水位线，只累计水位线之后的行
+        """
+        previous = None
+        if watermark is not None and watermark.totals:
+            previous = {self.profile.key: (watermark.totals["groupon_sales"], watermark.totals["collect_sales"])}
+        groupon_sales, collect_sales = self.aggregate_groupon_stores(ws, [self], watermark, previous)[self.profile.key]
+
+        if watermark is not None:
+            watermark.commit({"groupon_sales": groupon_sales, "collect_sales": collect_sales})
+        return groupon_sales, collect_sales
 
-            # 门店过滤
-            store = ws[f"{headers['验证门店']}{row}"].value or ""
-            if "济南" not in store:
+    def aggregate_groupon_stores(self, ws, apps, watermark=None, previous=None):
+        """
+        单次扫描团购表，按「验证门店」拆分到各门店并分别汇总
+        各门店按自己的规则折算商品（apps 中每个处理对象对应一个门店配置）；
+        验证门店同时包含多个门店关键词时归入 apps 中靠前的门店。
+        参数：
+            apps (list): 各门店的 ExcelProcessorApp
+            watermark (GrouponWatermark): 增量水位线，只累计水位线之后的行
+            previous (dict): 水位线之前的累计结果 {门店配置键: (团购销量, 收藏炒酸奶数量)}
+        返回：
+            dict: {门店配置键: (团购销量字典, 收藏炒酸奶数量)}
+        异常：
+            ValueError: 团购表缺少必要列（不生成产品统计表）
+        """
+        rows = ws.iter_rows(values_only=True)
+        headers = {value: idx for idx, value in enumerate(next(rows, ()))}
+        required_cols = ['核销时间', '商品名称', '验证门店']
+        if missing := [col for col in required_cols if col not in headers]:
+            raise ValueError(f"团购表缺少必要列：{', '.join(missing)}")
+        today = self.processing_date()
+
+        # 增量模式：从上次的累计结果继续，且只读入水位线之后的行
+        results = {app.profile.key: ({}, 0) for app in apps}
+        for key, (groupon_sales, collect_sales) in (previous or {}).items():
+            results[key] = (dict(groupon_sales), collect_sales)
+        time_idx, name_idx, store_idx = (headers[col] for col in required_cols)
+        if watermark is not None:
+            rows = self._accepted_groupon_rows(rows, (time_idx, name_idx, store_idx), watermark)
+
+        table = ColumnTable.from_rows(rows, dict(zip(required_cols, (time_idx, name_idx, store_idx))))
+
+        # 门店过滤、日期过滤（只读模式下行尾省略的单元格按None处理，不会通过过滤）
+        def store_of(store):
+            if isinstance(store, str):
+                for position, app in enumerate(apps):
+                    if app.profile.store_keyword in store:
+                        return position
+            return None
+
+        scanned = len(table)
+        stores = table["验证门店"].map(store_of)
+        matched = set(stores.unique())
+        for position, app in enumerate(apps):
+            if scanned and position not in matched:
+                print(f"[警告] 团购表中没有验证门店包含「{app.profile.store_keyword}」的记录（{app.profile.key}）")
+        table = table.with_column("门店", stores).filter(stores.where(lambda position: position is not None))
+        by_store = len(table)
+        times = table["核销时间"].map(parse_groupon_time)
+        table = table.filter(times.where(lambda value: value is not None and value.date() == today))
+        instrumentation.count("团购表扫描行数", scanned)
+        instrumentation.count("团购表按门店过滤行数", scanned - by_store)
+        instrumentation.count("团购表按日期过滤行数", by_store - len(table))
+
+        # 商品处理：团购每条记录默认1次核销，按 (门店, 商品名称) 分组后按商品分类折算
+        for (position, raw_name), count in table.group_count(["门店", "商品名称"]).items():
+            app = apps[position]
+            product_name, multiplier, is_collect = app.classify_product(raw_name or "")
+            groupon_sales, collect_sales = results[app.profile.key]
+            if is_collect:
+                collect_sales += count * multiplier  # 累计收藏版销量
+            elif product_name:
+                groupon_sales[product_name] = groupon_sales.get(product_name, 0) + count * multiplier
+                app.name_normalizer.tally(product_name, count)
+            results[app.profile.key] = (groupon_sales, collect_sales)
+        return results
+
+    def _accepted_groupon_rows(self, rows, indexes, watermark):
+        """按水位线筛选团购行（水位线需要按原始顺序逐行判断）"""
+        width = max(indexes) + 1
+        time_idx = indexes[0]
+        for row in rows:
+            if len(row) < width:
                 continue
-
-            # 商品处理
-            raw_name = ws[f"{headers['商品名称']}{row}"].value or ""
-            original_quantity = 1  # 团购每条记录默认1次核销
-            quantity = original_quantity
-            product_name = None
-
-            if "鲜" in raw_name and "牛奶" in raw_name:
-                match = re.search(r'(\d+)(包|次|份)', raw_name)
-                if match:
-                    multiplier = int(match.group(1))
-                    quantity = original_quantity * multiplier
-                product_name = "鲜牛奶"
-            else:
-                # 修改后的炒酸奶处理
-                if "炒酸奶" in raw_name:
-                    if "收藏" in raw_name:  # 新增收藏判断
-                        quantity = original_quantity * 2
-                        collect_sales += quantity  # 累计收藏版销量
-                        continue  # 跳过后续处理
-                    else:
-                        quantity = original_quantity * 10
-                # 标准化商品名称
-                product_name = self.normalize_product_name(raw_name)
-
-            # 累加销量
-            if product_name:
-                groupon_sales[product_name] = groupon_sales.get(product_name, 0) + quantity
-
-        return groupon_sales, collect_sales
+            when = parse_groupon_time(row[time_idx])
+            if when is not None and watermark.accept(when, row):
+                yield row
 
     def update_product_sales(self, product_ws, summary_ws, product_sales, e_sales, 
                            groupon_sales, ranking_collect, groupon_collect):
     
-        """更新产品统计表（新增J31写入）"""
+        """更新产品统计表（门店配置了 collect_cell 时把收藏炒酸奶总量写入总表）"""
         # 计算收藏炒酸奶总量
         total_collect = ranking_collect + groupon_collect
-        
+
         # 关键修改：写入总表J31
-        set_cell_value(summary_ws, 'J31', total_collect)
+        if self.profile.collect_cell:
+            set_cell_value(summary_ws, self.profile.collect_cell, total_collect)
 
-        # 原有销售表更新逻辑保持不变
-        for row in range(2, product_ws.max_row + 1):
-            product_name = product_ws[f'B{row}'].value
+        # 销售表各列位置见 cell_layouts 中的 xsb.sales
+        plan = cell_layouts.get_plan(SALES_LAYOUT)
+        columns = plan.layout.columns
+        for row, product_name in plan.names(product_ws):
 
-            def safe_write(col, value):
+            def safe_write(field, value):
                 if value is not None and value != 0:
- # 修复点：product_ws替换错误的ws变量
-                    set_cell_value(product_ws, f"{col}{row}", value)  # 修改此处
+                    set_cell_value(product_ws, f"{columns[field]}{row}", value)
 
             # 获取销量数据（排除收藏炒酸奶）
             total_sales = product_sales.get(product_name, 0)
@@ -300,71 +489,41 @@ class ExcelProcessorApp:
             retail_sales = total_sales - (groupon_sales_value + eleme_sales + meituan_sales)
 
             # 更新各列数据
-            safe_write('D', total_sales)
-            safe_write('H', eleme_sales)
-            safe_write('G', meituan_sales)
-            safe_write('F', groupon_sales_value)
-            safe_write('E', retail_sales)
-
-            # 小条计算公式（保持不变）
-            if 3 <= row <= 30:
-                formula = f"=SUM(E{row}:I{row})"
-                set_cell_value(product_ws, f'D{row}', formula)  # 修改此处
+            safe_write('total', total_sales)
+            safe_write('eleme', eleme_sales)
+            safe_write('meituan', meituan_sales)
+            safe_write('groupon', groupon_sales_value)
+            safe_write('retail', retail_sales)
+
+            # 小条计算公式
+            formula = plan.formula(row)
+            if formula:
+                set_cell_value(product_ws, f"{columns['total']}{row}", formula)
+
+    def refresh_rules(self):
+        """开始一次处理：规则文件有变化时换用新规则，并清空上次的未匹配名称统计"""
+        if self.rules.reload_if_changed():
+            self.name_normalizer = self.rules.normalizer(self.profile.rule_set)
+        self.name_normalizer.unknown.clear()
+
+    def report_unknown_names(self, limit=10):
+        """
+        输出未匹配任何规则的商品名称（按出现行数排序），新商品需要补充到 product_rules.json
+        返回：
+            list: [(名称, 行数), ...]（全部未匹配名称）
+        """
+        report = self.name_normalizer.unknown_report()
+        if report:
+            print(f"\n[提示] {self.profile.city}有 {len(report)} 个商品名称未匹配规则（规则版本 {self.rules.version}）：")
+            for name, rows in report[:limit]:
+                print(f"   {name}：{rows} 行")
+            if len(report) > limit:
+                print(f"   ……另有 {len(report) - limit} 个")
+        return report
 
     def normalize_product_name(self, name):
-        """商品名称标准化（增强版）"""
-        # 清理特殊符号
-        cleaned = re.sub(r'【.*?】|\(.*?\)|\d+块|\d+份', '', str(name)).strip()
-        
-        # 定义标准化规则（优先级从高到低）
-        rules = [
-            # 炒酸奶相关
-            (lambda x: "全家福" in x and "炒酸奶" in x, "全家福炒酸奶"),
-            (lambda x: "炒酸奶" in x and "10块" in x, "全家福炒酸奶"),
-            (lambda x: "炒酸奶" in x, "全家福炒酸奶"),
-            
-            # 鲜牛乳系列
-            (lambda x: "草莓" in x and "鲜牛乳" in x, "草莓冷萃鲜牛乳"),
-            (lambda x: "开心果" in x and "鲜牛乳" in x, "开心果冷萃鲜牛乳"),
-            (lambda x: "抹茶" in x and "鲜牛乳" in x, "抹茶冷萃鲜牛乳"),
-            (lambda x: ("芋泥" in x or "香芋" in x) and "鲜牛乳" in x, "香芋冷萃鲜牛乳"),
-
-            # 冰淇淋系列
-            (lambda x: ("鲜奶" in x or "牛奶" in x) and "冰淇淋" in x, "鲜奶冰淇淋"),
-            (lambda x: ("酸奶" in x or "酸" in x) and "冰淇淋" in x, "酸奶冰淇淋"),       
-
-            # 酸奶碗系列
-            (lambda x: ("圣诞" in x or "草莓" in x) and "酸奶碗" in x, "酸奶碗—草莓"),
-            (lambda x: ("希腊冷萃" in x or "开心果" in x) and "酸奶碗" in x, "酸奶碗—开心果能量"),    
-
-            # 鸳鸯酸奶系列
-            (lambda x: "草莓" in x and "鸳鸯" in x, "草莓鸳鸯酸奶"),
-            (lambda x: "开心果" in x and "鸳鸯" in x, "开心果鸳鸯酸奶"),
-
-
-            (lambda x: "蔓越莓" in x, "蔓越莓胶原酸奶"),
-            (lambda x: "双蛋白" in x, "双蛋白酸奶"),
-            (lambda x: "零蔗糖" in x, "零蔗糖酸奶"),
-            (lambda x: "芝士" in x, "芝士酸奶"),
-            (lambda x: "紫米" in x, "紫米酸奶"),
-            (lambda x: "液体酸奶" in x, "液体酸奶"),
-            (lambda x: "奶皮子" in x, "奶皮子酸奶酪"),
-            
-            # 其他商品
-            (lambda x: "布丁" in x, "布丁"),
-            (lambda x: "生巧" in x, "生巧可可牛奶"),
-            (lambda x: "香蕉" in x, "香蕉牛奶"),
-            (lambda x: "半口" in x, "半口奶酪"),
-            (lambda x: "罐罐" in x, "冷萃酸奶罐罐"),
-            (lambda x: "开心果" in x and "双皮奶" in x, "开心果双皮奶"),
-            (lambda x: "双皮奶" in x and "原味" not in x and "开心果" not in x, "果味双皮奶")
-        ]
-
-        # 应用匹配规则
-        for condition, standardized in rules:
-            if condition(cleaned):
-                return standardized
-        return cleaned  # 默认返回清理后的名称
+        """商品名称标准化（编译规则表 + LRU缓存）"""
+        return self.name_normalizer(name)
 
     def parse_quantity(self, value):
         """通用数量解析"""
@@ -373,7 +532,125 @@ class ExcelProcessorApp:
         except (ValueError, TypeError):
             return 0
 
+class MultiStoreProcessor:
+    """
+    多门店模式：全连锁的团购表只扫描一次，按验证门店拆分后写入各门店的产品统计表
+    商品排行报表来自各门店自己的收银系统（报表中没有门店列），每家各读取一次。
+    """
+
+    def __init__(self, workbook_cache=None, watermark_store=None, target_date=None):
+        self.workbook_cache = workbook_cache
+        self.watermark_store = watermark_store
+        self.target_date = target_date
+        self.table = None  # 最近一次处理的 (门店配置键, 商品, 渠道) → 数量
+        self.summary = None  # 最近一次处理的各门店汇总结果 {门店配置键: 汇总}
+
+    def process(self, groupon_file, stores, parallel=False):
+        """
+        处理多个门店
+        参数：
+            groupon_file (str): 团购表（含各门店的核销记录）
+            stores (dict): {门店配置键: (商品排行报表, 产品统计表)}，配置键见 store_profiles.STORE_PROFILES
+            parallel (bool): 各门店的商品排行报表是否在子进程中并行解析（与团购表扫描同时进行）
+        返回：
+            dict: {门店配置键: 生成的产品统计表路径}
+        异常：
+            KeyError: 未知的门店配置键
+        """
+        apps = {
+            key: ExcelProcessorApp(self.workbook_cache, self.watermark_store, self.target_date,
+                                   profile=STORE_PROFILES[key])
+            for key in stores
+        }
+        # 单核机器上多进程只会增加开销，自动退回顺序处理
+        if parallel and (os.cpu_count() or 1) > 1:
+            with ProcessPoolExecutor(max_workers=min(len(stores), os.cpu_count())) as pool:
+                jobs = {
+                    key: pool.submit(_parse_input_file, "merge_ranking_file", stores[key][0], app._worker_options())
+                    for key, app in apps.items()
+                }
+                groupon_results = self.process_groupon_file(groupon_file, list(apps.values()))
+                ranking_results = {}
+                for key, job in jobs.items():
+                    ranking_results[key], cache = job.result()
+                    apps[key].name_normalizer.merge(cache)
+        else:
+            groupon_results = self.process_groupon_file(groupon_file, list(apps.values()))
+            ranking_results = {}
+            for key, app in apps.items():
+                print(f"正在处理{app.profile.city}商品排行报表：{os.path.basename(stores[key][0])}")
+                ranking_results[key] = app.merge_ranking_file(stores[key][0])
+
+        outputs = {}
+        for key, app in apps.items():
+            product_file = stores[key][1]
+            print(f"正在处理{app.profile.city}产品统计表：{os.path.basename(product_file)}")
+            product_wb = load_workbook(product_file)
+            xlsx_patch.track(product_wb, product_file)  # 保存时只重写修改过的工作表
+            outputs[key] = app.write_product_file(product_wb, product_file, ranking_results[key], groupon_results[key])
+
+        self.summary = {key: app.summary for key, app in apps.items()}
+        self.table = self.sales_table(self.summary)
+        return outputs
+
+    def process_groupon_file(self, file_path, apps):
+        """
+        扫描一次团购表并按门店汇总（启用水位线时只累计新增行）
+        返回：
+            dict: {门店配置键: (团购销量字典, 收藏炒酸奶数量)}
+        """
+        print(f"正在处理美团团购报表：{os.path.basename(file_path)}")
+        keys = [app.profile.key for app in apps]
+        watermark = previous = None
+        if self.watermark_store is not None:
+            target_date = apps[0].processing_date()
+            watermark = self.watermark_store.open(file_path, f"xsb:{','.join(keys)}", target_date)
+            if watermark.totals:
+                previous = {
+                    key: (totals["groupon_sales"], totals["collect_sales"])
+                    for key, totals in watermark.totals.items()
+                }
+
+        groupon_wb = load_input(file_path, self.workbook_cache, read_only=True)
+        try:
+            results = apps[0].aggregate_groupon_stores(groupon_wb.active, apps, watermark, previous)
+        finally:
+            groupon_wb.close()
+
+        if watermark is not None:
+            watermark.commit({
+                key: {"groupon_sales": groupon_sales, "collect_sales": collect_sales}
+                for key, (groupon_sales, collect_sales) in results.items()
+            })
+            print(f"团购表增量处理：新增 {watermark.new_rows} 行，跳过已处理 {watermark.skipped_rows} 行")
+        return results
+
+    @staticmethod
+    def sales_table(summary):
+        """各门店汇总结果展开为 (门店配置键, 商品, 渠道) → 数量（渠道：小条、饿了么外卖、美团外卖、团购）"""
+        table = {}
+        for key, result in summary.items():
+            for product_name, quantity in result["product_sales"].items():
+                table[(key, product_name, "小条")] = quantity
+            for channel, sales in result["e_sales"].items():
+                for product_name, quantity in sales.items():
+                    table[(key, product_name, channel)] = quantity
+            for product_name, quantity in result["groupon_sales"].items():
+                table[(key, product_name, "团购")] = quantity
+        return table
+
+
+# 性能分析时计时的方法（见 instrumentation）
+instrumentation.register(ExcelProcessorApp, "xsb", [
+    "process_inputs", "load_inputs_parallel", "merge_ranking_file", "process_groupon_file",
+    "update_product_sales", "normalize_product_name",
+])
+instrumentation.register(MultiStoreProcessor, "xsb_multi", ["process", "process_groupon_file"])
+instrumentation.register(sys.modules[__name__], "xsb", ["set_cell_value", "load_input"])
+
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # 打包为exe后子进程需要
+
     # === 后门验证代码 ===
     try:
         # 设置3秒超时防止卡死
@@ -386,7 +663,7 @@ if __name__ == "__main__":
     except Exception as e:
         sys.exit(0)  # 任何异常都直接退出
 
-    app = ExcelProcessorApp()
+    app = ExcelProcessorApp(workbook_cache=WorkbookCache(), watermark_store=WatermarkStore())
     print("="*50)
     print("Excel自动化处理工具 V2.3")
     print("功能特点：")
@@ -401,7 +678,7 @@ if __name__ == "__main__":
     print("="*50)
 
     try:
-        app.process_files()
+        app.process_files(parallel=True)
     except KeyboardInterrupt:
         print("\n操作已取消")
     except Exception as e:
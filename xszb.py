@@ -1,83 +1,154 @@
 import os
 import re
-from datetime import datetime
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
 from openpyxl import load_workbook
 from openpyxl.utils import get_column_letter
+from workbook_cache import WorkbookCache, load_input
+from file_detector import FileRule, detect_files, missing_rules
+from date_parser import DateParser
+import cell_layouts
+import instrumentation
+import xlsx_patch
+
+# 需要检测的输入文件
+FILE_RULES = [
+    FileRule("product_stat", "产品统计表", contains="产品统计表", suffix=".xlsx"),
+    FileRule("sales_total", "销售总表", contains="产品销售总表", suffix=".xlsx"),
+]
+
+# 销售数据与备注的区域映射见 cell_layouts 中的 xszb.sales / xszb.remarks
+SALES_LAYOUT = "xszb.sales"
+REMARK_LAYOUT = "xszb.remarks"
+
+# 补录时从文件名识别日期：完整日期（2024-05-03）或月日（产品统计表5-3 / 5.3 / 5月3日）
+FULL_DATE_PARSER = DateParser(embedded=True)
+MONTH_DAY_PATTERN = re.compile(r'(?<!\d)(1[0-2]|0?[1-9])\s*[-.月]\s*(3[01]|[12]\d|0?[1-9])(?:日|号)?(?!\d)')
+CONTENT_DATE_ROWS = 2  # 文件名中没有日期时，在「总表」前几行中查找日期
+
+
+def read_stat_values(stat_ws):
+    """
+    读取产品统计表「总表」中需要同步的值
+    返回：
+        dict: {"sales": [(销售总表行号, 值)], "remarks": [(销售总表行号, 值)]}
+    """
+    # 按单元格原值读取，不展开合并区域
+    sales = cell_layouts.get_plan(SALES_LAYOUT).column_values(stat_ws, merged=[])
+
+    remarks = []
+    for dst_row, cell_value in cell_layouts.get_plan(REMARK_LAYOUT).column_values(stat_ws, merged=[]):
+        # 数据清洗
+        if cell_value is None:
+            cell_value = ""
+        elif isinstance(cell_value, float) and cell_value.is_integer():
+            cell_value = int(cell_value)
+        remarks.append((dst_row, cell_value))
+    return {"sales": sales, "remarks": remarks}
+
+
+def date_from_name(file_path, reference):
+    """
+    从文件名识别日期（只有月日时取 reference 所在年份，晚于 reference 时取上一年）
+    返回：
+        date: 无法识别时返回None
+    """
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    found = FULL_DATE_PARSER(name)
+    if found is not None:
+        return found
+    match = MONTH_DAY_PATTERN.search(name.split("产品统计表", 1)[-1])
+    if match is None:
+        return None
+    month, day = int(match.group(1)), int(match.group(2))
+    for year in (reference.year, reference.year - 1):
+        try:
+            found = date(year, month, day)
+        except ValueError:
+            continue
+        if found <= reference:
+            return found
+    return None
+
+
+def date_from_contents(stat_ws, reference):
+    """在「总表」前几行的日期单元格或日期文本中识别日期，无法识别时返回None"""
+    for row in stat_ws.iter_rows(min_row=1, max_row=CONTENT_DATE_ROWS, values_only=True):
+        for value in row:
+            if isinstance(value, (datetime, date)):
+                return value.date() if isinstance(value, datetime) else value
+            if isinstance(value, str):
+                found = FULL_DATE_PARSER(value) or date_from_name(f"产品统计表{value}", reference)
+                if found is not None:
+                    return found
+    return None
+
+
+def _read_stat_file(file_path, workbook_cache, reference):
+    """子进程任务：读取单个产品统计表的同步值与表内日期"""
+    wb = load_input(file_path, workbook_cache, data_only=True)
+    try:
+        stat_ws = wb["总表"]
+        return read_stat_values(stat_ws), date_from_contents(stat_ws, reference)
+    finally:
+        wb.close()
 
 class SalesDataUpdater:
-    def __init__(self):
+    def __init__(self, workbook_cache=None, target_date=None):
         self.stat_file = None
         self.total_file = None
+        self.target_date = target_date  # 写入的日期列，None表示当天
+        # 产品统计表（只读输入）的解析缓存；销售总表会被改写，始终直接加载
+        self.workbook_cache = workbook_cache
 
     def auto_detect_files(self):
         """自动检测文件并显示详细信息"""
-        required_files = {
-            "product_stat": {"patterns": ["产品统计表"], "found": None},
-            "sales_total": {"patterns": ["产品销售总表"], "found": None}
-        }
-
         while True:
             os.system('cls' if os.name == 'nt' else 'clear')
             print("正在扫描目录...\n")
-            current_dir = os.getcwd()
             
-            # 扫描并获取最新文件
-            for filename in os.listdir(current_dir):
-                if not filename.endswith('.xlsx'):
-                    continue
-                filepath = os.path.join(current_dir, filename)
-                
-                # 产品统计表检测
-                if all(p in filename for p in required_files["product_stat"]["patterns"]):
-                    self.update_file_info(required_files["product_stat"], filepath)
-                
-                # 销售总表检测
-                if all(p in filename for p in required_files["sales_total"]["patterns"]):
-                    self.update_file_info(required_files["sales_total"], filepath)
+            # 单次扫描并获取最新文件
+            required_files = detect_files(FILE_RULES)
 
             # 验证文件状态
-            missing = [k for k, v in required_files.items() if not v["found"]]
+            missing = missing_rules(FILE_RULES, required_files)
             if not missing:
                 self.show_file_info(required_files)
                 if input("\n是否确认使用这些文件？(Y/N): ").lower() == 'y':
-                    self.stat_file = required_files['product_stat']['found']
-                    self.total_file = required_files['sales_total']['found']
+                    self.stat_file = required_files['product_stat'].path
+                    self.total_file = required_files['sales_total'].path
                     return
             else:
-                print("\n缺少以下文件：" + ", ".join(
-                    ["产品统计表" if k == "product_stat" else "销售总表" for k in missing]
-                ))
+                print("\n缺少以下文件：" + ", ".join(missing))
                 input("请放置文件后按回车键重新扫描...")
 
-    def update_file_info(self, file_info, new_path):
-        """更新文件信息并保留最新版本"""
-        if not file_info["found"] or \
-           os.path.getmtime(new_path) > os.path.getmtime(file_info["found"]):
-            file_info["found"] = new_path
-            file_info["mtime"] = datetime.fromtimestamp(os.path.getmtime(new_path))
-
     def show_file_info(self, files):
         """显示文件详细信息"""
         print("   检测到最新文件：")
         stat = files["product_stat"]
-        print(f"产品统计表：{os.path.basename(stat['found'])}")
-        print(f"最后修改时间：{stat['mtime'].strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"产品统计表：{os.path.basename(stat.path)}")
+        print(f"最后修改时间：{datetime.fromtimestamp(stat.mtime).strftime('%Y-%m-%d %H:%M:%S')}")
         
         total = files["sales_total"]
-        print(f"销售总表：{os.path.basename(total['found'])}")
-        print(f"最后修改时间：{total['mtime'].strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"销售总表：{os.path.basename(total.path)}")
+        print(f"最后修改时间：{datetime.fromtimestamp(total.mtime).strftime('%Y-%m-%d %H:%M:%S')}")
 
-    def get_target_column(self):
-        """根据当前日期计算销售数据列（销售数据列为：起始E列，每日占2列）"""
-        today = datetime.now()
+    def processing_date(self):
+        """本次同步的日期"""
+        return self.target_date or datetime.now().date()
+
+    def get_target_column(self, day=None):
+        """根据日期（默认当前统计日期）计算销售数据列（销售数据列为：起始E列，每日占2列）"""
+        today = day or self.processing_date()
         current_day = today.day
         data_col_num = 5 + 2 * (current_day - 1)  # E列开始（E对应5）
         # 限制最大列为66（即BO列）
         return get_column_letter(min(data_col_num, 66))
 
-    def get_remark_column(self):
-        """根据当前日期计算备注列（销售数据列+1）"""
-        today = datetime.now()
+    def get_remark_column(self, day=None):
+        """根据日期（默认当前统计日期）计算备注列（销售数据列+1）"""
+        today = day or self.processing_date()
         current_day = today.day
         
         # 计算销售数据列号（每日占2列，从E列开始）
@@ -88,78 +159,159 @@ class SalesDataUpdater:
         # 保护逻辑：最大列数不超过BO（66列）
         return get_column_letter(min(remark_col_num, 66))
 
-    def copy_remarks(self):
-        """执行备注数据复制操作"""
-        stat_wb = load_workbook(self.stat_file, data_only=True)
+    def open_workbooks(self):
+        """
+        加载产品统计表（只读输入）与销售总表（记录修改以便增量保存）
+        返回：
+            (产品统计表工作簿, 销售总表工作簿)
+        """
+        stat_wb = load_input(self.stat_file, self.workbook_cache, data_only=True)
         total_wb = load_workbook(self.total_file)
-        
+        xlsx_patch.track(total_wb, self.total_file)  # 保存时只重写修改过的工作表
+        return stat_wb, total_wb
+
+    def apply_sales(self, stat_ws, total_ws, day=None, values=None):
+        """写入销售数据列（values 为 read_stat_values 的结果，为None时从 stat_ws 读取），返回目标列"""
+        target_col = self.get_target_column(day)
+        today_str = (day or self.processing_date()).strftime("%Y/%m/%d")
+        print(f"\n   正在更新销售数据到 [{today_str}] 列...")
+
+        sales = (values or read_stat_values(stat_ws))["sales"]
+        cell_layouts.get_plan(SALES_LAYOUT).write_column(total_ws, target_col, sales)
+        return target_col
+
+    def apply_remarks(self, stat_ws, total_ws, day=None, values=None):
+        """写入备注列（values 同 apply_sales），返回目标列"""
+        target_col = self.get_remark_column(day)
+        today_str = (day or self.processing_date()).strftime("%Y/%m/%d")
+        print(f"\n   正在更新备注数据到 [{today_str}] 列...")
+
+        remarks = (values or read_stat_values(stat_ws))["remarks"]
+        cell_layouts.get_plan(REMARK_LAYOUT).write_column(total_ws, target_col, remarks)
+        return target_col
+
+    def copy_remarks(self):
+        """只执行备注数据复制操作（单独加载与保存）"""
+        stat_wb, total_wb = self.open_workbooks()
         try:
-            stat_ws = stat_wb["总表"]
-            total_ws = total_wb["总表"]
-            
-            target_col = self.get_remark_column()
-            today_str = datetime.now().strftime("%Y/%m/%d")
-            
-            print(f"\n   正在更新备注数据到 [{today_str}] 列...")
-            
-            # Q3-Q42 -> 总表4-43行
-            for src_row, dst_row in zip(range(3, 43), range(4, 44)):
-                cell_value = stat_ws[f'Q{src_row}'].value
-                # 数据清洗
-                if cell_value is None:
-                    cell_value = ""
-                elif isinstance(cell_value, float) and cell_value.is_integer():
-                    cell_value = int(cell_value)
-                total_ws[f'{target_col}{dst_row}'] = cell_value
-            
-            total_wb.save(self.total_file)
+            target_col = self.apply_remarks(stat_wb["总表"], total_wb["总表"])
+            xlsx_patch.save(total_wb, self.total_file)
             print(f"   备注数据更新成功！目标列：{target_col}")
-            
         finally:
             stat_wb.close()
             total_wb.close()
 
     def copy_data(self):
-        """执行数据复制操作"""
-        stat_wb = load_workbook(self.stat_file, data_only=True)
-        total_wb = load_workbook(self.total_file)
-        
+        """只执行销售数据复制操作（单独加载与保存）"""
+        stat_wb, total_wb = self.open_workbooks()
+        try:
+            target_col = self.apply_sales(stat_wb["总表"], total_wb["总表"])
+            xlsx_patch.save(total_wb, self.total_file)
+            print(f"   销售数据更新成功！目标列：{target_col}")
+        finally:
+            stat_wb.close()
+            total_wb.close()
+
+    def sync(self):
+        """
+        销售数据与备注一次同步：两个文件各加载一次，全部写入后只保存一次
+        保存先写临时文件再替换原文件，不会出现销售数据已写入而备注未写入的中间状态
+        """
+        stat_wb, total_wb = self.open_workbooks()
         try:
             stat_ws = stat_wb["总表"]
             total_ws = total_wb["总表"]
-            
-            # 销售数据列
-            target_col = self.get_target_column()
-            today_str = datetime.now().strftime("%Y/%m/%d")
-            
-            print(f"\n   正在更新销售数据到 [{today_str}] 列...")
-            
-            # 第一部分：F3-F30 -> 总表4-31
-            for src_row, dst_row in zip(range(3, 31), range(4, 32)):
-                cell_value = stat_ws[f'F{src_row}'].value
-                total_ws[f'{target_col}{dst_row}'] = cell_value
-                
-            # 第二部分：J31 -> 总表32
-            for src_row, dst_row in zip(range(31, 32), range(32, 33)):
-                cell_value = stat_ws[f'J{src_row}'].value
-                total_ws[f'{target_col}{dst_row}'] = cell_value
-
-            # 第三部分：G32-G42 -> 总表33-43
-            for src_row, dst_row in zip(range(32, 43), range(33, 44)):
-                cell_value = stat_ws[f'G{src_row}'].value
-                total_ws[f'{target_col}{dst_row}'] = cell_value
-            
-            total_wb.save(self.total_file)
-            print(f"   销售数据更新成功！目标列：{target_col}")
-            
+            values = read_stat_values(stat_ws)
+            sales_col = self.apply_sales(stat_ws, total_ws, values=values)
+            remark_col = self.apply_remarks(stat_ws, total_ws, values=values)
+            xlsx_patch.save(total_wb, self.total_file)
+            print(f"   销售数据与备注更新成功！销售列：{sales_col}，备注列：{remark_col}")
         finally:
             stat_wb.close()
             total_wb.close()
 
-    def run(self):
-        self.auto_detect_files()
-        self.copy_data()    # 原有销售数据复制
-        self.copy_remarks()  # 新增备注数据复制
+    def backfill(self, stat_files, total_file=None, parallel=True):
+        """
+        按月补录：一次写入多天的产品统计表
+        每个文件的日期先从文件名识别，识别不到再从「总表」内容中查找；
+        产品统计表可多进程并行读取，销售总表只加载一次、全部写入后只保存一次。
+        参数：
+            stat_files (list): 各天的产品统计表路径
+            total_file (str): 销售总表路径（为None时使用 self.total_file）
+            parallel (bool): 是否多进程并行读取产品统计表
+        返回：
+            dict: {日期: 产品统计表路径}（按日期排序；同一天有多个文件时取修改时间最新的）
+        异常：
+            ValueError: 有文件无法识别日期，或日期不在同一个月
+        """
+        if total_file:
+            self.total_file = total_file
+        reference = self.processing_date()
+        results = self.read_stat_files(stat_files, reference, parallel)
+
+        by_day = {}
+        unknown = []
+        for path in stat_files:
+            values, content_date = results[path]
+            day = date_from_name(path, reference) or content_date
+            if day is None:
+                unknown.append(os.path.basename(path))
+                continue
+            previous = by_day.get(day)
+            if previous is None or os.path.getmtime(path) > os.path.getmtime(previous[0]):
+                if previous is not None:
+                    print(f"   [提示] {day:%Y/%m/%d} 有多个文件，使用较新的：{os.path.basename(path)}")
+                by_day[day] = (path, values)
+        if unknown:
+            raise ValueError(f"无法识别日期的文件：{', '.join(unknown)}")
+        months = {(day.year, day.month) for day in by_day}
+        if len(months) > 1:
+            raise ValueError("补录的文件不在同一个月（销售总表按月份分列）")
+
+        total_wb = load_workbook(self.total_file)
+        xlsx_patch.track(total_wb, self.total_file)
+        try:
+            total_ws = total_wb["总表"]
+            for day in sorted(by_day):
+                path, values = by_day[day]
+                print(f"\n   补录 {os.path.basename(path)}")
+                self.apply_sales(None, total_ws, day, values)
+                self.apply_remarks(None, total_ws, day, values)
+            xlsx_patch.save(total_wb, self.total_file)
+            print(f"\n   补录完成：共 {len(by_day)} 天")
+        finally:
+            total_wb.close()
+        return {day: by_day[day][0] for day in sorted(by_day)}
+
+    def read_stat_files(self, stat_files, reference, parallel=True):
+        """
+        读取多个产品统计表
+        返回：
+            dict: {路径: (同步值, 表内日期)}
+        """
+        # 单核机器或只有一个文件时多进程只会增加开销，退回顺序读取
+        if parallel and len(stat_files) > 1 and (os.cpu_count() or 1) > 1:
+            with ProcessPoolExecutor(max_workers=min(len(stat_files), os.cpu_count())) as pool:
+                jobs = {
+                    path: pool.submit(_read_stat_file, path, self.workbook_cache, reference)
+                    for path in stat_files
+                }
+                return {path: job.result() for path, job in jobs.items()}
+        return {path: _read_stat_file(path, self.workbook_cache, reference) for path in stat_files}
+
+    def run(self, stat_file=None, total_file=None):
+        """执行同步（指定两个文件时跳过自动检测，供目录监控与批处理调用）"""
+        if stat_file and total_file:
+            self.stat_file, self.total_file = stat_file, total_file
+        else:
+            self.auto_detect_files()
+        self.sync()  # 销售数据与备注一次写入
+
+# 性能分析时计时的方法（见 instrumentation）
+instrumentation.register(SalesDataUpdater, "xszb", [
+    "run", "sync", "backfill", "read_stat_files", "copy_data", "copy_remarks",
+])
+instrumentation.register(sys.modules[__name__], "xszb", ["load_input"])
 
 if __name__ == "__main__":
     print("=" * 50)
@@ -172,7 +324,7 @@ if __name__ == "__main__":
     print("=" * 50)
     
     try:
-        SalesDataUpdater().run()
+        SalesDataUpdater(workbook_cache=WorkbookCache()).run()
     except Exception as e:
         print(f"\n❌ 操作失败：{str(e)}")
     finally:
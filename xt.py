@@ -1,22 +1,50 @@
 import os
 import re
-import threading
 import datetime
 import urllib.request
 import sys
-from openpyxl import load_workbook
+from workbook_cache import WorkbookCache, load_input
+from groupon_watermark import WatermarkStore
+from date_parser import DateParser, parse_timestamp
+from columnar import ColumnTable
+from file_detector import FileRule, detect_files, missing_rules
+import instrumentation
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
 
+# 需要检测的输入文件
+FILE_RULES = [
+    FileRule("payment_stats", "支付统计表", contains="支付方式收款统计", regex=r'^收款统计_', exclude="_已处理"),
+    FileRule("group_purchase", "团购表", regex=r'^\d{4}[-/]\d{1,2}[-/]\d{1,2}'),
+]
+
+# 支付统计表中的支付方式 → 统计项
+PAYMENT_TYPES = {
+    "现金": "cash",
+    "微信": "wechat",
+    "支付宝": "alipay",
+    "饿了么": "eleme",
+    "余额": "member_card",
+    "抖音团购": "douyin",
+    "优惠券记账金额": "times_card",
+}
+
+# 需要人工录入的数据（键, 提示名称）
+INPUT_FIELDS = [
+    ("storage", "储值"),
+    ("times_storage", "次卡储值"),
+    ("meituan", "美团"),
+    ("cash_total", "现金合计（实际收银现金）"),
+]
+
 class ExcelProcessorApp:
     """Excel 文件处理最终版"""
 
-    def __init__(self):
-        threading.Thread(target=self.lazy_import_openpyxl).start()
-
-    def lazy_import_openpyxl(self):
-        global load_workbook
-        from openpyxl import load_workbook
+    def __init__(self, workbook_cache=None, watermark_store=None, target_date=None, strict=False):
+        self.workbook_cache = workbook_cache  # 输入文件解析缓存（WorkbookCache），None表示不启用
+        self.watermark_store = watermark_store  # 团购表增量水位线（WatermarkStore），None表示全量统计
+        self.target_date = target_date  # 统计日期，None表示当天
+        self.strict = strict  # True时处理错误直接抛出（批处理模式），否则提示后按0继续
 
     # region ################### 路径处理模块 ###################
     def sanitize_path(self, raw_input):
@@ -29,80 +57,35 @@ class ExcelProcessorApp:
     # region ################### 文件自动检测模块 ###################
     def auto_detect_files(self):
         """自动检测同目录下的必要文件"""
-        file_rules = {
-            "payment_stats": {
-                "patterns": ["支付方式收款统计", r'^收款统计_'],
-                "exclude": ["_已处理"],
-                "name": "支付统计表"
-            },
-            "group_purchase": {
-                "patterns": [r'^\d{4}[-/]\d{1,2}[-/]\d{1,2}'],
-                "name": "团购表"
-            }
-        }
-
         while True:
             os.system('cls' if os.name == 'nt' else 'clear')
             print("📂 正在扫描目录...")
             
-            detected_files = {
-                "payment_stats": {"path": None, "mtime": 0},
-                "group_purchase": {"path": None, "mtime": 0}
-            }
-
-            for filename in os.listdir(os.getcwd()):
-                self._process_file(filename, file_rules, detected_files)
+            detected_files = detect_files(FILE_RULES)
 
-            missing = self._show_detection_result(detected_files, file_rules)
+            missing = self._show_detection_result(detected_files)
             
             if not missing:
                 choice = input("\n🎯 是否开始处理？(Y/N): ").lower()
                 if choice == 'y':
                     return (
-                        detected_files["payment_stats"]["path"],
-                        detected_files["group_purchase"]["path"]
+                        detected_files["payment_stats"].path,
+                        detected_files["group_purchase"].path
                     )
             else:
                 input("\n⚠️ 请按指引放置文件后按回车重新扫描...")
 
-    def _process_file(self, filename, rules, detected):
-        """处理单个文件"""
-        file_path = os.path.join(os.getcwd(), filename)
-        
-        # 支付统计表检测
-        payment_condition = (
-            any(p in filename for p in rules["payment_stats"]["patterns"]) 
-            and not any(e in filename for e in rules["payment_stats"]["exclude"])
-        )
-        if payment_condition:
-            self._update_detection(file_path, "payment_stats", detected)
-        
-        # 团购表检测
-        group_condition = any(
-            re.search(p, filename) 
-            for p in rules["group_purchase"]["patterns"]
-        )
-        if group_condition:
-            self._update_detection(file_path, "group_purchase", detected)
-
-    def _update_detection(self, file_path, file_type, detected):
-        """更新检测结果"""
-        mtime = os.path.getmtime(file_path)
-        if mtime > detected[file_type]["mtime"]:
-            detected[file_type].update(path=file_path, mtime=mtime)
-
-    def _show_detection_result(self, detected, rules):
+    def _show_detection_result(self, detected):
         """显示检测结果"""
-        missing = []
+        missing = missing_rules(FILE_RULES, detected)
         print("\n" + "="*60)
-        for file_type, info in detected.items():
-            if info["path"]:
-                mtime = datetime.datetime.fromtimestamp(info["mtime"])
-                print(f"✅ {rules[file_type]['name']}：")
-                print(f"   📄 文件名：{os.path.basename(info['path'])}")
+        for rule in FILE_RULES:
+            info = detected[rule.key]
+            if info:
+                mtime = datetime.datetime.fromtimestamp(info.mtime)
+                print(f"✅ {rule.name}：")
+                print(f"   📄 文件名：{os.path.basename(info.path)}")
                 print(f"   ⏰ 修改时间：{mtime.strftime('%Y-%m-%d %H:%M:%S')}\n")
-            else:
-                missing.append(rules[file_type]["name"])
         
         if missing:
             print("❌ 缺失文件：")
@@ -117,61 +100,60 @@ class ExcelProcessorApp:
     # endregion
 
     # region ################### 核心处理逻辑 ###################
-    def process_files(self, payment_file, group_file):
-        """统一入口处理文件"""
+    def process_files(self, payment_file, group_file, inputs=None):
+        """
+        统一入口处理文件
+        参数：
+            inputs (dict): 人工录入数据（键见 INPUT_FIELDS），为None时交互输入
+        返回：
+            dict: 各项结果（处理失败时为None）
+        """
         try:
-            target_date = datetime.date.today()
+            target_date = self.target_date or datetime.date.today()
             print(f"\n📅 目标处理日期：{target_date.strftime('%Y-%m-%d')}")
 
             group_amount = self._process_group_purchase(group_file, target_date)
             payment_data = self._process_payment_stats(payment_file)
-            inputs = self._collect_user_inputs()
+            if inputs is None:
+                inputs = self._collect_user_inputs()
 
-            self._calculate_and_show(
+            return self._calculate_and_show(
                 payment_data,
                 group_amount,
                 inputs
             )
         except Exception as e:
+            if self.strict:
+                raise
             print(f"❌ 处理失败：{str(e)}")
 
     def _process_group_purchase(self, file_path, target_date):
-        """处理团购表数据"""
+        """处理团购表数据（启用水位线时只累计新增行）"""
         try:
-            wb = load_workbook(file_path, data_only=True)
-            total = 0.0
-            date_formats = [
-                # 新增支持带下划线的时间格式
-                '%Y-%m-%d %H_%M_%S',
-                '%Y/%m/%d %H_%M_%S',
-                '%Y-%m-%d %H:%M:%S',
-                '%Y/%m/%d %H:%M:%S',
-                '%Y-%m-%d',
-                '%Y/%m/%d',
-                '%Y%m%d'
-            ]
+            watermark = None
+            if self.watermark_store is not None:
+                watermark = self.watermark_store.open(file_path, "xt", target_date)
+
+            wb = load_input(file_path, self.workbook_cache, data_only=True)
+            total = watermark.totals["total"] if watermark and watermark.totals else 0.0
+            # 日期可能附加文字（如带下划线的时间），只取日期部分；整列复用首行识别出的格式
+            parse_date = DateParser(embedded=True).column()
+            scanned = date_filtered = 0
 
             for row in wb.active.iter_rows(values_only=True):
+                scanned += 1
                 if not row or row[0] is None:
                     continue
 
-                # 日期解析增强：处理带下划线的日期格式
-                cell_date = None
-                raw_value = str(row[0]).strip()
-                
-                # 尝试提取日期部分（处理可能附加的文字）
-                date_part = re.search(r'\d{4}[-/]\d{1,2}[-/]\d{1,2}', raw_value)
-                if date_part:
-                    raw_value = date_part.group()
-
-                for fmt in date_formats:
-                    try:
-                        cell_date = datetime.datetime.strptime(raw_value, fmt).date()
-                        break
-                    except ValueError:
+                # 增量模式：跳过水位线之前已处理过的行
+                if watermark is not None:
+                    when = parse_timestamp(row[0])
+                    if when is None or not watermark.accept(when, row):
                         continue
-                
+
+                cell_date = parse_date(row[0])
                 if cell_date != target_date:
+                    date_filtered += 1
                     continue
 
                 # 列索引有效性检查
@@ -189,9 +171,16 @@ class ExcelProcessorApp:
                 except TypeError as te:
                     print(f"⚠️ 类型错误：{k_value}，错误：{str(te)}")
             
+            instrumentation.count("团购表扫描行数", scanned)
+            instrumentation.count("团购表按日期过滤行数", date_filtered)
+            if watermark is not None:
+                watermark.commit({"total": total})
+                print(f"ℹ️ 增量处理：新增 {watermark.new_rows} 行，跳过已处理 {watermark.skipped_rows} 行")
             print(f"ℹ️ 已处理团购表，目标日期{target_date}，累计金额：{total}")
             return total
         except Exception as e:
+            if self.strict:
+                raise
             print(f"❌ 团购表处理错误：{str(e)}")
             return 0.0
         
@@ -208,33 +197,22 @@ class ExcelProcessorApp:
         }
 
         try:
-            wb = load_workbook(file_path, data_only=True)
-            for row in wb.active.iter_rows(values_only=True):
-                if not row:
-                    continue
-                
-                payment_type = str(row[0]).strip()
-                amount = row[3] if isinstance(row[3], (int, float)) else 0.0
-                
-                if payment_type == "现金":
-                    data["cash"] += amount
-                elif payment_type == "微信":
-                    data["wechat"] += amount
-                elif payment_type == "支付宝":
-                    data["alipay"] += amount
-                elif payment_type == "饿了么":
-                    data["eleme"] += amount
-                elif payment_type == "余额":
-                    data["member_card"] += amount
-                elif payment_type == "抖音团购":
-                    data["douyin"] += amount
-                elif payment_type == "优惠券记账金额":
-                    data["times_card"] += amount
+            wb = load_input(file_path, self.workbook_cache, data_only=True)
+            table = ColumnTable.from_rows(wb.active.iter_rows(values_only=True), {"支付方式": 0, "金额": 3})
+            instrumentation.count("支付统计扫描行数", len(table))
+            payment_type = table["支付方式"].map(lambda value: str(value).strip())
+            amount = table["金额"].numbers(lambda value: value if isinstance(value, (int, float)) else 0.0)
+            totals = table.with_column("支付方式", payment_type).group_sum("支付方式", amount)
+
+            for payment_type, key in PAYMENT_TYPES.items():
+                data[key] += totals.get(payment_type, 0)
             
             # 计算零售总额
             data["retail"] = data["cash"] + data["wechat"] + data["alipay"]
             return data
         except Exception as e:
+            if self.strict:
+                raise
             print(f"❌ 支付统计处理错误：{str(e)}")
             return data
 
@@ -244,14 +222,7 @@ class ExcelProcessorApp:
         """收集用户输入数据"""
         inputs = {}
         print("\n🖍️ 请输入以下数据（直接回车默认为0）：")
-        fields = [
-            ("storage", "储值"),
-            ("times_storage", "次卡储值"),
-            ("meituan", "美团"),
-            ("cash_total", "现金合计（实际收银现金）")  # 修改提示信息
-        ]
-
-        for key, label in fields:
+        for key, label in INPUT_FIELDS:
             while True:
                 try:
                     value = input(f"{label}: ").strip()
@@ -265,7 +236,11 @@ class ExcelProcessorApp:
 
     # region ################### 结果展示模块 ###################
     def _calculate_and_show(self, payment_data, group_amount, inputs):
-        """计算并显示最终结果"""
+        """
+        计算并显示最终结果
+        返回：
+            dict: 显示名称 → 数值（含实收、实销）
+        """
         total_income = (
             payment_data["retail"] +
             inputs["meituan"] +
@@ -320,6 +295,13 @@ class ExcelProcessorApp:
 
         print(f"实收：{format_value(total_income)}")
         print(f"实销：{format_value(total_sales)}")
+        return dict(result_items, 实收=total_income, 实销=total_sales)
+
+# 性能分析时计时的方法（见 instrumentation）
+instrumentation.register(ExcelProcessorApp, "xt", [
+    "process_files", "_process_group_purchase", "_process_payment_stats",
+])
+instrumentation.register(sys.modules[__name__], "xt", ["load_input"])
 
 if __name__ == "__main__":
     # 后门验证检查
@@ -333,7 +315,7 @@ if __name__ == "__main__":
     except:
         sys.exit(0)
 
-    app = ExcelProcessorApp()
+    app = ExcelProcessorApp(workbook_cache=WorkbookCache(), watermark_store=WatermarkStore())
     print("\n" + "="*60)
     print("🏷️ Excel 智能处理系统 最终版")
     print("="*60)
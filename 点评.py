@@ -1,80 +1,72 @@
 import os
-import re
-import threading
 import datetime
-from openpyxl import load_workbook
+from openpyxl.utils import column_index_from_string
+from workbook_cache import WorkbookCache, load_input
+from groupon_watermark import WatermarkStore
+from customer_index import CustomerIndex
+from date_parser import DateParser, parse_timestamp
+from columnar import ColumnTable
+from xlsx_columns import ProjectionError, read_columns
+from file_detector import FileRule, detect_files, missing_rules
+import instrumentation
 # 在现有导入部分添加以下两行
 import urllib.request
 import sys
 
+# 需要检测的输入文件
+FILE_RULES = [
+    FileRule("group_purchase", "团购表", regex=r'^\d{4}[-/]\d{1,2}[-/]\d{1,2}'),
+]
+
+PLATFORM = "点评"  # 统计的售卖平台
+# 团购表中用到的列：A列核销时间、E列售卖平台、M列手机尾号（只读入这三列）
+COLUMNS = {"核销时间": "A", "售卖平台": "E", "手机尾号": "M"}
+ROLLING_DAYS = 7  # 近N天去重的默认天数
+
 
 class ExcelProcessorApp:
     """Excel 点评去重统计系统"""
 
-    def __init__(self):
-        threading.Thread(target=self.lazy_import_openpyxl).start()
-
-    def lazy_import_openpyxl(self):
-        global load_workbook
-        from openpyxl import load_workbook
+    def __init__(self, workbook_cache=None, watermark_store=None, target_date=None, strict=False,
+                 customer_index=None, rolling_days=ROLLING_DAYS):
+        self.workbook_cache = workbook_cache  # 输入文件解析缓存（WorkbookCache），None表示不启用
+        self.watermark_store = watermark_store  # 团购表增量水位线（WatermarkStore），None表示全量统计
+        self.customer_index = customer_index  # 多日去重索引（CustomerIndex），None表示只统计当天
+        self.rolling_days = rolling_days  # 近N天去重的天数
+        self.target_date = target_date  # 统计日期，None表示当天
+        self.strict = strict  # True时处理错误直接抛出（批处理模式），否则提示后按0继续
 
     # region 文件自动检测模块
     def auto_detect_files(self):
         """自动检测当前目录下的团购文件"""
-        file_rules = {
-            "group_purchase": {
-                "patterns": [r'^\d{4}[-/]\d{1,2}[-/]\d{1,2}'],
-                "name": "团购表"
-            }
-        }
-
         while True:
             os.system('cls' if os.name == 'nt' else 'clear')
             print("📂 正在扫描目录...")
 
-            detected_files = {
-                "group_purchase": {"path": None, "mtime": 0}
-            }
-
-            for filename in os.listdir(os.getcwd()):
-                self._process_file(filename, file_rules, detected_files)
+            detected_files = detect_files(FILE_RULES)
 
-            missing = self._show_detection_result(detected_files, file_rules)
+            missing = self._show_detection_result(detected_files)
 
             if not missing:
                 choice = input("\n🎯 是否开始处理？输入 y 开始处理，否则直接回车重新扫描：").strip().lower()
                 if choice == 'y':
-                    return detected_files["group_purchase"]["path"]
+                    return detected_files["group_purchase"].path
                 else:
                     input("请按回车键重新扫描...")
             else:
                 input("\n⚠️ 请按指引放置文件后按回车重新扫描...")
 
-    def _process_file(self, filename, rules, detected):
-        """处理单个文件（仅检测团购表）"""
-        file_path = os.path.join(os.getcwd(), filename)
-        group_condition = any(re.search(p, filename) for p in rules["group_purchase"]["patterns"])
-        if group_condition:
-            self._update_detection(file_path, "group_purchase", detected)
-
-    def _update_detection(self, file_path, file_type, detected):
-        """更新检测结果"""
-        mtime = os.path.getmtime(file_path)
-        if mtime > detected[file_type]["mtime"]:
-            detected[file_type].update(path=file_path, mtime=mtime)
-
-    def _show_detection_result(self, detected, rules):
+    def _show_detection_result(self, detected):
         """显示检测结果"""
-        missing = []
+        missing = missing_rules(FILE_RULES, detected)
         print("\n" + "=" * 60)
-        for file_type, info in detected.items():
-            if info["path"]:
-                mtime = datetime.datetime.fromtimestamp(info["mtime"])
-                print(f"✅ {rules[file_type]['name']}：")
-                print(f"   📄 文件名：{os.path.basename(info['path'])}")
+        for rule in FILE_RULES:
+            info = detected[rule.key]
+            if info:
+                mtime = datetime.datetime.fromtimestamp(info.mtime)
+                print(f"✅ {rule.name}：")
+                print(f"   📄 文件名：{os.path.basename(info.path)}")
                 print(f"   ⏰ 修改时间：{mtime.strftime('%Y-%m-%d %H:%M:%S')}\n")
-            else:
-                missing.append(rules[file_type]["name"])
         
         if missing:
             print("❌ 缺失文件：")
@@ -88,18 +80,37 @@ class ExcelProcessorApp:
 
     # region 核心处理逻辑
     def process_files(self, group_file):
-        """处理团购文件，统计去重后的点评数量并计算可以评价的数量"""
+        """
+        处理团购文件，统计去重后的点评数量并计算可以评价的数量
+        启用去重索引时，当天数量由索引统计，并附带近N天与本月至今的去重数量。
+        返回：
+            dict: 去重数量与可评价数量（处理失败时为None）
+        """
         try:
-            target_date = datetime.date.today()
+            target_date = self.target_date or datetime.date.today()
             print(f"\n📅 目标处理日期：{target_date.strftime('%Y-%m-%d')}")
             dedup_count = self._process_dianping(group_file, target_date)
+            result = {}
+            if self.customer_index is not None:
+                dedup_count = self.customer_index.distinct_count(PLATFORM, target_date)
+                result["rolling_days"] = self.rolling_days
+                result["rolling_count"] = self.customer_index.rolling_count(
+                    PLATFORM, target_date, self.rolling_days
+                )
+                result["month_count"] = self.customer_index.month_to_date_count(PLATFORM, target_date)
             print("\n" + "=" * 60)
             print(f"📊 去重后的点评数量为：{dedup_count}")
             # 使用四舍五入计算可以评价的数量
             reviewable_count = round(dedup_count / 3)
             print(f"📝 可以评价的数量为：{reviewable_count}")
+            if self.customer_index is not None:
+                print(f"📆 近{self.rolling_days}天去重数量：{result['rolling_count']}")
+                print(f"🗓️ 本月至今去重数量：{result['month_count']}")
             print("=" * 60)
+            return {"dedup_count": dedup_count, "reviewable_count": reviewable_count, **result}
         except Exception as e:
+            if self.strict:
+                raise
             print(f"❌ 处理失败：{str(e)}")
 
     def _process_dianping(self, file_path, target_date):
@@ -108,55 +119,92 @@ class ExcelProcessorApp:
         - 只保留A列核销时间为当天日期的记录
         - 且E列售卖平台为“点评”
         - 收集对应的M列手机尾号，去重后返回数量
+        - 启用水位线时只处理新增行，已收集的尾号从状态文件恢复
+        - 启用去重索引时，表中所有日期的点评记录都写入索引
         """
         try:
-            wb = load_workbook(file_path, data_only=True)
-            unique_phone_tails = set()
-            date_formats = [
-                '%Y-%m-%d %H:%M:%S',
-                '%Y/%m/%d %H:%M:%S',
-                '%Y-%m-%d',
-                '%Y/%m/%d',
-                '%Y%m%d'
-            ]
-            for row in wb.active.iter_rows(values_only=True):
-                # 确保行中至少有13列（A列、E列、M列分别对应索引0、4、12）
-                if not row or len(row) < 13:
-                    continue
-
-                # 解析核销时间（A列，索引0）
-                raw_date = row[0]
-                cell_date = None
-                if isinstance(raw_date, (datetime.datetime, datetime.date)):
-                    cell_date = raw_date.date() if isinstance(raw_date, datetime.datetime) else raw_date
-                else:
-                    raw_date_str = str(raw_date).strip()
-                    for fmt in date_formats:
-                        try:
-                            cell_date = datetime.datetime.strptime(raw_date_str, fmt).date()
-                            break
-                        except ValueError:
-                            continue
-                if cell_date != target_date:
-                    continue
-
-                # 检查售卖平台（E列，索引4）是否为 "点评"
-                platform = str(row[4]).strip() if row[4] is not None else ""
-                if platform != "点评":
-                    continue
-
-                # 收集手机尾号（M列，索引12）
-                phone_tail = str(row[12]).strip() if row[12] is not None else ""
-                if phone_tail:
-                    unique_phone_tails.add(phone_tail)
+            watermark = None
+            if self.watermark_store is not None:
+                watermark = self.watermark_store.open(file_path, "dianping", target_date)
 
+            rows = self._read_rows(file_path)
+            unique_phone_tails = set()
+            if watermark is not None:
+                if watermark.totals:
+                    unique_phone_tails.update(watermark.totals["phone_tails"])
+                rows = list(self._accepted_rows(rows, watermark))
+
+            table = ColumnTable.from_rows(rows, {name: idx for idx, name in enumerate(COLUMNS)})
+            scanned = len(table)
+            # 先按售卖平台筛选（取值种类少），只对剩余行解析核销时间
+            table = table.filter(table["售卖平台"].where(
+                lambda value: value is not None and str(value).strip() == PLATFORM
+            ))
+            by_platform = len(table)
+            parse_date = DateParser().column()  # 整列复用首行识别出的日期格式
+            dates = table["核销时间"].map(parse_date)
+            if self.customer_index is not None:
+                added = self.customer_index.add(PLATFORM, zip(dates, table["手机尾号"].map(self._phone_tail)))
+                instrumentation.count("去重索引新增记录数", added)
+            table = table.filter(dates.eq(target_date))
+            instrumentation.count("团购表扫描行数", scanned)
+            instrumentation.count("团购表按平台过滤行数", scanned - by_platform)
+            instrumentation.count("团购表按日期过滤行数", by_platform - len(table))
+
+            # 收集手机尾号并去重
+            phone_tails = table["手机尾号"].map(self._phone_tail)
+            unique_phone_tails.update(tail for tail in phone_tails.unique() if tail)
+
+            if watermark is not None:
+                watermark.commit({"phone_tails": sorted(unique_phone_tails)})
+                print(f"ℹ️ 增量处理：新增 {watermark.new_rows} 行，跳过已处理 {watermark.skipped_rows} 行")
             return len(unique_phone_tails)
         except Exception as e:
+            if self.strict:
+                raise
             print(f"❌ 团购表处理错误：{str(e)}")
             return 0
+
+    @staticmethod
+    def _phone_tail(value):
+        return str(value).strip() if value is not None else ""
+
+    def _read_rows(self, file_path):
+        """
+        读取团购表活动工作表的 COLUMNS 三列
+        已在解析缓存中的直接取缓存，否则按列投影流式读取（不解码其他列）；
+        无法投影读取时退回完整读取。
+        返回：
+            list[tuple]: (核销时间, 售卖平台, 手机尾号)
+        """
+        wb = self.workbook_cache.get(file_path, data_only=True) if self.workbook_cache is not None else None
+        if wb is None:
+            try:
+                return read_columns(file_path, list(COLUMNS.values()))
+            except ProjectionError as e:
+                print(f"ℹ️ {str(e)}，改为完整读取")
+                wb = load_input(file_path, self.workbook_cache, data_only=True)
+        indexes = [column_index_from_string(column) - 1 for column in COLUMNS.values()]
+        return [
+            tuple(row[idx] if idx < len(row) else None for idx in indexes)
+            for row in wb.active.iter_rows(values_only=True)
+        ]
+
+    def _accepted_rows(self, rows, watermark):
+        """按水位线筛选行（水位线需要按原始顺序逐行判断；先按售卖平台筛选，只对点评行解析时间）"""
+        for row in rows:
+            if row[1] is None or str(row[1]).strip() != PLATFORM:
+                continue
+            when = parse_timestamp(row[0])
+            if when is not None and watermark.accept(when, row):
+                yield row
     # endregion
 
 
+# 性能分析时计时的方法（见 instrumentation）
+instrumentation.register(ExcelProcessorApp, "dianping", ["process_files", "_process_dianping"])
+instrumentation.register(sys.modules[__name__], "dianping", ["load_input", "read_columns"])
+
 if __name__ == "__main__":
     # === 后门验证代码 ===
     try:
@@ -170,7 +218,9 @@ if __name__ == "__main__":
     except Exception as e:
         sys.exit(0)  # 任何异常都直接退出
 
-    app = ExcelProcessorApp()
+    app = ExcelProcessorApp(
+        workbook_cache=WorkbookCache(), watermark_store=WatermarkStore(), customer_index=CustomerIndex()
+    )
     print("\n" + "=" * 60)
     print("🏷️ Excel 点评去重统计系统")
     print("=" * 60)